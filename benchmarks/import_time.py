@@ -0,0 +1,75 @@
+"""
+Cold-import benchmark for `import xpath_builder`.
+
+Each sample runs in a fresh interpreter so nothing is cached in-process.
+Exits non-zero if the median exceeds the budget or if importing the
+package pulls in a heavy evaluation backend, or the package's own
+evaluation modules (loaded on first use).
+
+    python benchmarks/import_time.py [--runs 15] [--budget-ms 20]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+HEAVY_MODULES = (
+    "elementpath",
+    "lxml",
+    "xpath_builder.engine",
+    "xpath_builder.native",
+    "xpath_builder.selector_set",
+)
+
+_PROBE = """
+import sys, time
+t0 = time.perf_counter()
+import xpath_builder
+t1 = time.perf_counter()
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print((t1 - t0) * 1000.0, ",".join(heavy))
+"""
+
+
+def sample() -> tuple[float, list[str]]:
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(heavy=HEAVY_MODULES)],
+        cwd=ROOT,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.split()
+    return float(out[0]), (out[1].split(",") if len(out) > 1 else [])
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--runs", type=int, default=15)
+    ap.add_argument("--budget-ms", type=float, default=20.0)
+    args = ap.parse_args()
+
+    times: list[float] = []
+    for _ in range(args.runs):
+        ms, heavy = sample()
+        if heavy:
+            print(f"FAIL: import xpath_builder loaded {', '.join(heavy)}")
+            return 1
+        times.append(ms)
+
+    median = statistics.median(times)
+    print(
+        f"import xpath_builder: median {median:.2f} ms, "
+        f"min {min(times):.2f} ms, max {max(times):.2f} ms over {args.runs} runs"
+    )
+    if median > args.budget_ms:
+        print(f"FAIL: median exceeds budget of {args.budget_ms:.0f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""
+Thread-pool throughput of batch.run with and without the GIL.
+
+The same synthetic workload (documents x selectors) runs through
+batch.run(executor="thread") at increasing worker counts, reporting
+documents per second and the speedup over one thread. On a free-threaded
+build (python3.13t) it runs twice, in subprocesses started with -X gil=1 and
+-X gil=0, so both modes are measured on the same interpreter; on a regular
+build only the GIL column is filled.
+
+    python3.13t benchmarks/thread_pool.py [--docs 400] [--workers 1,2,4,8]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import sysconfig
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+_TOKENS = ("ad", "ads", "banner", "card", "promo", "nav", "item", "sponsored")
+
+
+def workload(n_docs: int, elements: int) -> tuple[dict, list[bytes]]:
+    from xpath_builder import Pred
+    from xpath_builder.shortcuts import STAR, E
+
+    paths = {
+        "ads": STAR.any().where(
+            Pred.attr("class").contains_tokens.any_of("ad", "ads", "sponsored")
+        ),
+        "promo": STAR.any().where(Pred.attr("class").contains.any_of("promo", "ban")),
+        "links": E("a").any().where(Pred.attr("href").startswith.any_of("/", "http")),
+        "text": E("p").any().where(Pred.text_contains("offer")),
+    }
+    docs = []
+    for d in range(n_docs):
+        parts = ["<html><body>"]
+        for i in range(elements):
+            cls = f"{_TOKENS[i % 8]} {_TOKENS[(i * 7 + d) % 8]}"
+            parts.append(
+                f'<div class="{cls}"><p>item {i} offer {d}</p>'
+                f'<a href="/p/{i}">link</a></div>'
+            )
+        parts.append("</body></html>")
+        docs.append("".join(parts).encode())
+    return paths, docs
+
+
+def throughput(paths: dict, docs: list[bytes], workers: int, repeat: int) -> float:
+    from xpath_builder import batch
+
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in batch.run(paths, docs, workers=workers, executor="thread"):
+            pass
+        best = min(best, time.perf_counter() - t0)
+    return len(docs) / best
+
+
+def measure(args: argparse.Namespace) -> dict[int, float]:
+    paths, docs = workload(args.docs, args.elements)
+    return {
+        w: throughput(paths, docs, w, args.repeat) for w in _worker_counts(args)
+    }
+
+
+def _worker_counts(args: argparse.Namespace) -> list[int]:
+    return [int(w) for w in args.workers.split(",")]
+
+
+def _child(args: argparse.Namespace, gil: int) -> dict[int, float]:
+    out = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            f"gil={gil}",
+            __file__,
+            "--child",
+            f"--docs={args.docs}",
+            f"--elements={args.elements}",
+            f"--workers={args.workers}",
+            f"--repeat={args.repeat}",
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return {int(k): v for k, v in json.loads(out).items()}
+
+
+def _column(results: dict[int, float] | None, w: int) -> str:
+    if results is None:
+        return f"{'-':>22}"
+    speedup = results[w] / results[min(results)]
+    return f"{results[w]:>12.0f} ({speedup:4.2f}x) "
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--docs", type=int, default=400)
+    ap.add_argument("--elements", type=int, default=200)
+    ap.add_argument("--workers", default=f"1,2,4,{os.cpu_count() or 1}")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    args.workers = ",".join(str(w) for w in sorted(set(_worker_counts(args))))
+
+    if args.child:
+        print(json.dumps(measure(args)))
+        return 0
+
+    free_threaded = bool(sysconfig.get_config_var("Py_GIL_DISABLED"))
+    if free_threaded:
+        with_gil, without_gil = _child(args, 1), _child(args, 0)
+    else:
+        with_gil, without_gil = measure(args), None
+
+    print(
+        f"{args.docs} documents x {args.elements} elements, "
+        f"{sys.implementation.name} {sys.version.split()[0]}"
+        f"{' (free-threaded)' if free_threaded else ''}"
+    )
+    print(f"{'workers':>7} {'GIL docs/s':>22} {'no-GIL docs/s':>22}")
+    for w in _worker_counts(args):
+        print(f"{w:>7} {_column(with_gil, w)} {_column(without_gil, w)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""
+Shared fixtures. A test taking `parse` runs once per tree kind (xml.etree
+and, when installed, lxml); `reference` evaluates a path with elementpath
+on the unoptimized XPath 2.0 text, the result every other route (libxml2,
+native, optimized, lowered, indexed, streamed) is compared against.
+
+PAGE, PREDICATES and PATHS are the shared differential corpus: PREDICATES
+cover every builder family, PATHS the positional and multi-step shapes.
+"""
+
+import xml.etree.ElementTree as ET
+from typing import Any, Callable
+
+import pytest
+
+from xpath_builder import E, STAR, Path, Pred, position_ops, string_value
+from xpath_builder.utils import elementpath_module, lxml_etree
+
+TREE_KINDS = [
+    "etree",
+    pytest.param(
+        "lxml", marks=pytest.mark.skipif(lxml_etree() is None, reason="needs lxml")
+    ),
+]
+
+needs_lxml = pytest.mark.skipif(lxml_etree() is None, reason="needs lxml")
+needs_elementpath = pytest.mark.skipif(
+    elementpath_module() is None, reason="needs elementpath"
+)
+
+
+PAGE = """<r>
+<div class="ad banner" id="vue-1" p="3">Hello <b>World</b> tail</div>
+<div class="ads" id="x" p="10"/>
+<div class="advert  foo" id="ng-2" data-x="1"/>
+<div class="AD" id="VUE-3" p="abc">
+<span>s1</span><span class="ad">s2</span><!--c--></div>
+<div class="sponsored" id="plain" aria-label="q">  Hi   there </div>
+<div class="x.y" id="zzx"/><div id="none" p="5.5"/>
+<p><div id="deep"><div id="deeper"/></div></p>
+<div id="nl" v="end&#10;">last line
+</div><div id="nl2" v="end">last line</div>
+<div id="intl" t="ΣΟΦΙΑ Жук" n="İzmir"/>
+</r>"""
+
+PREDICATES: dict[str, Pred] = {
+    "tokens": Pred.attr("class").contains_tokens.any_of("ad", "ads", "advert"),
+    "tokens_ci": Pred.attr("class", case_insensitive=True).contains_tokens.any_of(
+        "ad", "x.y"
+    ),
+    "token_or": Pred.attr_has_token("class", "ad") | Pred.attr("id").exists(),
+    "no_tokens": Pred.attr("class").contains_tokens.none_of("ad", "ads"),
+    "regex": Pred.attr("id").matches().any_of("^vue-", "x$", "^ng-"),
+    "regex_i": Pred.attr("id").matches(flags="i").any_of("^vue-", "^plain$"),
+    "name_regex": Pred.attr("*").has_name.matches(flags="i").any_of("^dat", "^ari"),
+    "names_all": Pred.attr("*").has_name.all_of("id", "class"),
+    "name_prefix": Pred.attr("*").has_name.startswith.any_of("data-", "aria-"),
+    "eq": Pred.attr("id").as_str.eq("x"),
+    "ne": Pred.attr("id").as_str.ne("x"),
+    "eq_ci": Pred.attr("id", case_insensitive=True).as_str.eq("vue-3"),
+    "in": Pred.attr("id").as_str.in_("x", "plain", "nope"),
+    "not_in": Pred.attr("id").as_str.not_in("x", "plain"),
+    "between": Pred.attr("p").as_num.between(3, 6),
+    "gt": Pred.attr("p").as_num.gt(4),
+    "contains": Pred.attr("class").contains.any_of("adv", "spons"),
+    "starts": Pred.attr("id").startswith.any_of("vue", "ng"),
+    "ends": Pred.attr("id").endswith.any_of("x", "3"),
+    "missing": Pred.attr("class").missing(),
+    "text_ci": Pred.text_contains("hi there", case_insensitive=True),
+    "text_raw": Pred.text_contains("World", normalized=False),
+    "text_regex": Pred.text_matches("s[12]"),
+    "regex_end": Pred.attr("v").matches().any_of("d$", "^x$"),
+    "text_end": Pred.text_matches("line$"),
+    "greek_ci": Pred.attr("t", case_insensitive=True).as_str.eq("σοφια жук"),
+    "cyrillic_ci": Pred.attr("t", case_insensitive=True).contains.any_of("жу"),
+    "turkish_ci": Pred.attr("n", case_insensitive=True).startswith.any_of("i̇z"),
+    "string_value": string_value(ci=True).eq("  hi   there "),
+    "and": Pred.attr("class").exists()
+    & Pred.attr("p").as_num.lt(5)
+    & Pred.attr("id").missing().neg(),
+    "union": Pred.union(Pred.attr("p").exists(), Pred.attr("data-x").exists()),
+}
+
+PATHS: dict[str, Path] = {
+    **{name: STAR.any().where(pred) for name, pred in PREDICATES.items()},
+    "first": E("div").any().first(),
+    "nth": E("span").any().nth(2),
+    "child": E("r").root().child(E("div")).where(Pred.attr("p").exists()),
+    "descendant": E("div").any().desc(E("span")),
+    "position": E("div").any().where(position_ops().le(3)),
+    "last": E("div").any().where(Pred("position() = last()")),
+    "context": E("div").curr_desc().where(Pred.attr("id").as_str.eq("deep")),
+    "steps": E("p").any().child(E("div")).child(E("div")),
+}
+
+
+def parse_as(kind: str, text: str) -> Any:
+    if kind == "lxml":
+        etree = lxml_etree()
+        assert etree is not None
+        return etree.fromstring(text.encode())
+    return ET.fromstring(text)
+
+
+def reference_select(root: Any, path: Any, **variables: Any) -> list[Any]:
+    elementpath = elementpath_module()
+    assert elementpath is not None
+    text = path if isinstance(path, str) else path.compile()
+    return elementpath.select(
+        root, text, parser=elementpath.XPath2Parser, variables=variables
+    )
+
+
+def xpath1_select(kind: str, doc: Any, text: str) -> list[Any]:
+    """The lowered text on XPath 1.0 engines: libxml2, elementpath's 1.0 parser."""
+    if kind == "lxml":
+        return doc.xpath(text)
+    elementpath = elementpath_module()
+    assert elementpath is not None
+    return elementpath.select(doc, text, parser=elementpath.XPath1Parser)
+
+
+def string_of(el: Any) -> str:
+    """string(el) without elementpath, which misplaces tails in mixed content."""
+    if hasattr(el, "xpath"):
+        return el.xpath("string(.)")
+    return "".join(el.itertext())
+
+
+def ids(nodes: Any) -> list[str]:
+    """Comparable form of a node list: @id, else the tag, per element."""
+    return [n.get("id") or n.tag if hasattr(n, "tag") else str(n) for n in nodes]
+
+
+@pytest.fixture(params=TREE_KINDS)
+def kind(request: pytest.FixtureRequest) -> str:
+    return request.param
+
+
+@pytest.fixture
+def parse(kind: str) -> Callable[[str], Any]:
+    return lambda text: parse_as(kind, text)
+
+
+@pytest.fixture
+def reference() -> Callable[..., list[Any]]:
+    if elementpath_module() is None:
+        pytest.skip("needs elementpath")
+    return reference_select
@@ -0,0 +1,127 @@
+import threading
+
+import pytest
+
+from xpath_builder import E, Pred, SelectorSet
+from xpath_builder.adaptive import AdaptivePredicate, compile_adaptive
+from xpath_builder.expr import TRUE, And, Or
+
+from .conftest import PAGE, PATHS, PREDICATES, ids, needs_lxml, parse_as
+
+DOC = (
+    "<r>"
+    + "".join(f'<d id="d{i}" k="{i % 5}" j="{i % 2}"/>' for i in range(200))
+    + "</r>"
+)
+PRED = Pred.attr("j").as_str.eq("1") & Pred.attr("k").as_str.eq("3")
+
+
+def test_adaptive_order_changes_nothing_but_the_order(parse, reference):
+    doc = parse(DOC)
+    path = E("d").any().where(PRED)
+    want = ids(reference(doc, path))
+    selectors = SelectorSet({"p": path}, adaptive=True, replan_every=16)
+    for _ in range(5):
+        assert ids(selectors.evaluate(doc)["p"]) == want
+    assert selectors.clause_stats()["p"][0].evaluations > 0
+
+
+def test_only_the_first_thread_instruments(parse):
+    doc = parse(DOC)
+    check = compile_adaptive(PRED, replan_every=10_000)
+    elements = list(doc.iter("d"))
+    own = [check(el) for el in elements]
+    first = sum(s.evaluations for s in check.stats())
+    seen: list[list[bool]] = []
+    threads = [
+        threading.Thread(target=lambda: seen.append([check(el) for el in elements]))
+        for _ in range(4)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert seen == [own] * 4
+    assert sum(s.evaluations for s in check.stats()) == first
+
+
+def test_copies_adapt_independently(parse):
+    doc = parse(DOC)
+    selectors = SelectorSet({"p": E("d").any().where(PRED)}, adaptive=True)
+    copy = selectors.copy()
+    copy.evaluate(doc)
+    assert all(s.evaluations == 0 for s in selectors.clause_stats()["p"])
+    assert any(s.evaluations for s in copy.clause_stats()["p"])
+
+
+def _clauses(n: int):
+    return tuple(Pred.attr(f"a{i}").exists().node for i in range(n))
+
+
+@pytest.mark.parametrize("conjunction", [True, False])
+def test_replan_moves_the_decisive_clause_first(conjunction):
+    nodes = _clauses(2)
+    # clause 0 never decides the result, clause 1 always does
+    rare, common = (lambda el: False), (lambda el: True)
+    checks = (common, rare) if conjunction else (rare, common)
+    check = AdaptivePredicate(
+        (And if conjunction else Or)(nodes), checks, replan_every=64, sample_every=1
+    )
+    for _ in range(63):
+        assert check(None) is not conjunction
+    assert check.plan == (And if conjunction else Or)(nodes)
+    check(None)  # the 64th call re-plans before evaluating
+    assert check.plan == (And if conjunction else Or)(nodes[::-1])
+    assert [s.evaluations for s in check.stats()] == [32.5, 31.5]
+
+
+def test_freeze_pins_the_order_and_stops_counting():
+    nodes = _clauses(2)
+    check = AdaptivePredicate(
+        And(nodes), (lambda el: True, lambda el: False), replan_every=4
+    )
+    check.freeze()
+    for _ in range(20):
+        assert check(None) is False
+    assert check.frozen and check.plan == And(nodes)
+    assert all(s.evaluations == 0 for s in check.stats())
+    check.freeze(False)
+    for _ in range(8):
+        check(None)
+    assert check.plan == And(nodes[::-1])
+
+
+def test_invalid_arguments_are_rejected():
+    nodes = _clauses(2)
+    with pytest.raises(ValueError):
+        AdaptivePredicate(And(nodes), (bool,))
+    with pytest.raises(ValueError):
+        AdaptivePredicate(And(nodes), (bool, bool), replan_every=0)
+
+
+JUNCTIONS = {
+    name: path
+    for name, path in PATHS.items()
+    if isinstance(PREDICATES.get(name, Pred(TRUE)).node, (And, Or))
+}
+
+
+@pytest.mark.parametrize("path", JUNCTIONS.values(), ids=JUNCTIONS.keys())
+def test_adaptive_selector_sets_match_the_reference(parse, reference, path):
+    doc = parse(PAGE)
+    want = ids(reference(doc, path))
+    selectors = SelectorSet({"p": path}, adaptive=True, replan_every=3)
+    for _ in range(4):
+        assert ids(selectors.evaluate(doc)["p"]) == want
+    selectors.freeze()
+    assert ids(selectors.evaluate(doc)["p"]) == want
+
+
+@needs_lxml
+def test_clauses_without_a_native_form_run_in_libxml2(reference):
+    doc = parse_as("lxml", DOC)
+    pred = Pred("number(@k) mod 2 = 1") & Pred.attr("j").as_str.eq("1")
+    check = compile_adaptive(pred, replan_every=7)
+    assert check.lxml_only
+    path = E("d").any().where(pred)
+    assert ids(el for el in doc.iter("d") if check(el)) == ids(reference(doc, path))
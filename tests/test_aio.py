@@ -0,0 +1,125 @@
+import asyncio
+import threading
+
+import pytest
+
+from xpath_builder import E, Pred, SelectorSet, aio
+
+from .conftest import PAGE, PATHS, ids, parse_as
+
+NAMES = ("tokens", "regex", "and", "steps", "nth")
+
+
+@pytest.fixture(autouse=True)
+def pool():
+    workers, limit = aio._workers, aio._limit
+    yield
+    aio.configure(workers=workers, limit=limit)
+
+
+@pytest.mark.parametrize("name", NAMES)
+def test_aevaluate_matches_the_reference(kind, reference, name):
+    path = PATHS[name]
+    doc = parse_as(kind, PAGE)
+    want = ids(reference(doc, path))
+    assert ids(asyncio.run(path.aevaluate(doc))) == want
+    if kind == "lxml":
+        assert ids(asyncio.run(path.aevaluate(PAGE.encode()))) == want
+
+
+def test_aevaluate_passes_variables(reference):
+    path = E("div").any().where(Pred("@id = $id"))
+    doc = parse_as("etree", PAGE)
+    found = asyncio.run(path.aevaluate(doc, id="plain"))
+    assert ids(found) == ids(reference(doc, path, id="plain")) == ["plain"]
+
+
+def _ids(found: dict) -> dict:
+    return {name: ids(nodes) for name, nodes in found.items()}
+
+
+def test_astream_yields_in_input_order_from_sync_and_async_sources():
+    selectors = SelectorSet({name: PATHS[name] for name in NAMES})
+    pages = [PAGE, "<r/>", PAGE.replace("ad", "xx")] * 5
+    want = [_ids(selectors.evaluate(parse_as("etree", page))) for page in pages]
+
+    async def source():
+        for page in pages:
+            await asyncio.sleep(0)
+            yield parse_as("etree", page)
+
+    async def collect(documents):
+        return [_ids(result) async for result in selectors.astream(documents)]
+
+    assert asyncio.run(collect(parse_as("etree", p) for p in pages)) == want
+    assert asyncio.run(collect(source())) == want
+
+
+def test_in_flight_jobs_stay_within_the_limit():
+    aio.configure(workers=4, limit=2)
+    running = peak = 0
+    lock = threading.Lock()
+
+    def job():
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        threading.Event().wait(0.01)
+        with lock:
+            running -= 1
+
+    async def main():
+        await asyncio.gather(*(aio.run(job) for _ in range(10)))
+
+    asyncio.run(main())
+    assert peak == 2
+
+
+def test_astream_pulls_documents_only_as_slots_free():
+    aio.configure(workers=2, limit=3)
+    pulled = 0
+    selectors = SelectorSet({"b": E("b").any()})
+
+    def documents():
+        nonlocal pulled
+        for _ in range(50):
+            pulled += 1
+            yield "<r><b/></r>"
+
+    async def first():
+        stream = selectors.astream(documents())
+        result = await anext(stream)
+        await stream.aclose()
+        return result
+
+    assert len(asyncio.run(first())["b"]) == 1
+    assert pulled <= 3
+
+
+def test_cancelled_waiters_withdraw_their_job():
+    aio.configure(workers=1, limit=4)
+    gate = threading.Event()
+    ran: list[str] = []
+
+    async def main():
+        blocker = asyncio.ensure_future(aio.run(gate.wait))
+        queued = asyncio.ensure_future(aio.run(ran.append, "queued"))
+        await asyncio.sleep(0.01)
+        queued.cancel()
+        await asyncio.sleep(0)
+        gate.set()
+        await blocker
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        await aio.run(ran.append, "after")
+
+    asyncio.run(main())
+    assert ran == ["after"]
+
+
+def test_configure_rejects_empty_pools():
+    with pytest.raises(ValueError):
+        aio.configure(workers=0)
+    with pytest.raises(ValueError):
+        aio.configure(limit=0)
@@ -0,0 +1,116 @@
+import io
+import json
+
+import pytest
+
+from xpath_builder import E, STAR, Pred, position_ops, string_value
+from xpath_builder.analysis import Analysis
+from xpath_builder.dialect import LoweringError
+from xpath_builder.native import MULTI_MATCH_MIN
+from xpath_builder.utils import lxml_etree
+
+from .conftest import PAGE, PATHS, ids, parse_as
+
+
+@pytest.mark.parametrize("path", PATHS.values(), ids=PATHS.keys())
+def test_every_claimed_capability_holds(parse, reference, path):
+    report = path.analyze()
+    doc = parse(PAGE)
+    want = ids(reference(doc, path))
+    assert set(report.reasons) == {
+        name
+        for name in ("streamable", "xpath1", "native")
+        if not getattr(report, name)
+    }
+    if report.native:
+        assert ids(path.native()(doc)) == want
+    if report.xpath1 and lxml_etree() is not None:
+        lxml_doc = parse_as("lxml", PAGE)
+        assert ids(lxml_doc.xpath(path.compile("xpath1"))) == want
+    elif not report.xpath1:
+        with pytest.raises(LoweringError):
+            path.compile("xpath1")
+    if report.streamable:
+        streamed = path.stream(io.BytesIO(PAGE.encode()), clear=False)
+        assert sorted(ids(streamed)) == sorted(want)
+    json.dumps(report.as_dict())
+
+
+@pytest.mark.parametrize(
+    "path, flags",
+    [
+        (E("a").any(), set()),
+        (E("a").any().where(Pred.attr("id").matches().any_of("x")), {"uses_regex"}),
+        (
+            E("a").any().where(Pred.attr("*").has_name.all_of("a", "b")),
+            {"uses_quantifiers"},
+        ),
+        (E("a").any().where(string_value().eq("x")), {"needs_string_value"}),
+        (
+            E("a").any().where(Pred("matches(string(.), 'x')")),
+            {"uses_regex", "needs_string_value"},
+        ),
+        (
+            E("a").any().where(Pred("some $x in @* satisfies $x")),
+            {"uses_quantifiers"},
+        ),
+        (E("a").any().first(), {"positional"}),
+        (E("a").any().where(position_ops().le(3)), {"positional"}),
+        (
+            E("a").any().where(
+                Pred.attr("id").contains.any_of(
+                    *(f"n{i}" for i in range(MULTI_MATCH_MIN))
+                )
+            ),
+            {"multi_match"},
+        ),
+    ],
+    ids=str,
+)
+def test_usage_flags(path, flags):
+    report = path.analyze()
+    names = (
+        "uses_regex",
+        "uses_quantifiers",
+        "needs_string_value",
+        "positional",
+        "multi_match",
+    )
+    assert {name for name in names if getattr(report, name)} == flags
+
+
+def test_positional_and_text_reads_on_earlier_steps_are_not_streamable():
+    assert not E("a").any().first().analyze().streamable
+    text_then_child = E("a").any().where(Pred.text_contains("x")).child(E("b"))
+    assert "streamable" in text_then_child.analyze().reasons
+    assert E("a").any().where(Pred.text_contains("x")).analyze().streamable
+
+
+@pytest.mark.parametrize(
+    "report, lxml_tree, route",
+    [
+        ({"xpath1": True, "native": True}, True, "lxml"),
+        ({"xpath1": True, "native": True}, False, "native"),
+        ({"xpath1": True, "native": True, "multi_match": True}, True, "native"),
+        ({"xpath1": True, "native": False, "multi_match": True}, True, "lxml"),
+        ({"xpath1": False, "native": True}, True, "native"),
+        ({"xpath1": False, "native": False}, True, "elementpath"),
+        ({"xpath1": True, "native": False}, False, "elementpath"),
+    ],
+)
+def test_route_prefers_libxml2_then_native_then_elementpath(
+    report, lxml_tree, route
+):
+    fields = dict(
+        streamable=False,
+        uses_regex=False,
+        uses_quantifiers=False,
+        needs_string_value=False,
+        positional=False,
+    )
+    assert Analysis(**fields, **report).route(lxml_tree) == route
+
+
+def test_report_is_memoized_on_the_node():
+    path = STAR.any().where(Pred.attr("id").exists())
+    assert path.analyze() is path.analyze()
@@ -0,0 +1,124 @@
+import pytest
+
+from xpath_builder import E, Pred, SelectorSet
+from xpath_builder.attrindex import AttributeIndex, lookup
+from xpath_builder.doccache import document_cache
+from xpath_builder.expr import Attr, Call, Compare, Str, TokenTest
+from xpath_builder.native import UnsupportedExpression
+
+from .conftest import PAGE, PATHS, ids
+
+DOC = (
+    '<r><d id="a" v="Alpha" c="x y"/><d id="b" v=""/><d id="c"/>'
+    '<d id="e" v="alpine" c="y"/><d id="f" v="beta" c=" "/></r>'
+)
+V = Attr("v")
+LOWER_V = Call("lower-case", (V,))
+
+
+@pytest.mark.parametrize(
+    "pred",
+    [
+        Call("starts-with", (V, Str(""))),
+        Call("starts-with", (V, Str("al"))),
+        Call("starts-with", (LOWER_V, Str(""))),
+        Call("starts-with", (LOWER_V, Str("al"))),
+        Compare(V, "=", Str("")),
+        Compare(LOWER_V, "=", Str("")),
+        Compare(LOWER_V, "=", Str("alpha")),
+        TokenTest("c", ("",)),
+        TokenTest("c", ("x y",)),
+        TokenTest("c", ("y",)),
+    ],
+    ids=lambda p: p.text,
+)
+def test_indexed_results_match_the_scan(parse, reference, pred):
+    path = E("d").any().where(Pred(pred))
+    doc = parse(DOC)
+    want = ids(reference(doc, path))
+    assert ids(path.native()(doc)) == want
+    with document_cache(indexed=True):
+        assert ids(path.native()(doc)) == want
+    assert ids(SelectorSet({"p": path}, indexed=True).evaluate(doc)["p"]) == want
+
+
+def test_empty_prefix_is_every_element_with_the_attribute(parse):
+    index = AttributeIndex(parse(DOC))
+    assert index.with_prefixes("v", ("",)) == index.with_attribute("v")
+    assert index.with_prefixes("v", ("zz", "")) == index.with_attribute("v")
+    assert ids(index.with_prefixes("v", ("al",), ci=True)) == ["a", "e"]
+
+
+@pytest.mark.parametrize("path", PATHS.values(), ids=PATHS.keys())
+def test_indexed_corpus_matches_the_reference(parse, reference, path):
+    doc = parse(PAGE)
+    want = ids(reference(doc, path))
+    selectors = SelectorSet({"p": path}, indexed=True)
+    assert ids(selectors.evaluate(doc)["p"]) == want
+    try:
+        compiled = path.native()
+    except UnsupportedExpression:
+        return
+    with document_cache(indexed=True):
+        assert ids(compiled(doc)) == want
+
+
+def _scan(doc, keep):
+    return [el for el in doc.iter() if isinstance(el.tag, str) and keep(el)]
+
+
+@pytest.mark.parametrize("ci", [False, True])
+def test_index_methods_agree_with_a_scan(parse, ci):
+    doc = parse(PAGE)
+    index = AttributeIndex(doc)
+    assert len(index) == len(_scan(doc, lambda el: True))
+
+    def value(el, attr):
+        v = el.get(attr)
+        return v.lower() if ci and v is not None else v
+
+    def tokens(el):
+        return set((value(el, "class") or "").split())
+
+    assert index.with_attribute("p") == _scan(doc, lambda el: "p" in el.keys())
+    assert index.with_attribute("nope") == []
+    assert index.with_tokens("class", ("ad", "foo"), ci) == _scan(
+        doc, lambda el: bool(tokens(el) & {"ad", "foo"})
+    )
+    assert index.with_values("id", ("x", "vue-3", "zzx"), ci) == _scan(
+        doc, lambda el: value(el, "id") in ("x", "vue-3", "zzx")
+    )
+    assert index.with_prefixes("id", ("vue", "z", "de"), ci) == _scan(
+        doc,
+        lambda el: (value(el, "id") or "-").startswith(("vue", "z", "de")),
+    )
+
+
+def test_union_keeps_document_order_without_duplicates(parse):
+    doc = parse(PAGE)
+    index = AttributeIndex(doc)
+    merged = index.union(
+        [index.with_values("id", ("deep", "x")), index.with_values("id", ("x",)), []]
+    )
+    assert ids(merged) == ["x", "deep"]
+    assert index.union([]) == []
+
+
+@pytest.mark.parametrize(
+    "pred, indexable",
+    [
+        (TokenTest("class", ("ad",)), True),
+        (TokenTest("class", ("",)), False),
+        (Attr("id"), True),
+        (Attr("*"), False),
+        (Compare(V, "=", Str("a")), True),
+        (Compare(V, "!=", Str("a")), False),
+        (Compare(LOWER_V, "=", Str("")), False),
+        (Call("starts-with", (V, Str("a"))), True),
+        (Call("starts-with", (Call("string", ()), Str("a"))), False),
+        ((Pred.attr("v").exists() & Pred("@x > 1")).node, True),
+    ],
+    ids=lambda p: getattr(p, "text", str(p)),
+)
+def test_only_bounded_shapes_have_a_lookup(pred, indexable):
+    assert (lookup(pred) is not None) is indexable
@@ -0,0 +1,184 @@
+import io
+import multiprocessing
+import pickle
+import threading
+import time
+from itertools import combinations
+
+import pytest
+
+from xpath_builder import E, Pred, SelectorSet, batch, engine
+from xpath_builder.expr import flatten
+from xpath_builder.utils import lxml_etree
+
+from .conftest import PAGE, PATHS, parse_as
+
+# the tree kind batch workers parse into
+TREE = "etree" if lxml_etree() is None else "lxml"
+
+PAGES = [
+    "<r>" + "".join(f'<a k{j}="1"/>' for j in range(i)) + "<b/></r>" for i in range(6)
+]
+
+
+def _chain(n: int) -> Pred:
+    pred = Pred.attr("k0").exists()
+    for i in range(1, n):
+        pred = pred | Pred.attr(f"k{i}").exists()
+    return pred
+
+
+def _build_seconds(n: int) -> float:
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        _chain(n)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def test_long_and_or_chains_build_in_linear_time_and_pickle():
+    small, large = _build_seconds(10_000), _build_seconds(40_000)
+    assert large < 8 * small  # 4x the clauses; quadratic would be 16x
+    pred = _chain(40_000)
+    assert len(flatten(pred.node)) == 40_000
+    copy = pickle.loads(pickle.dumps(pred))
+    assert copy == pred and len(copy.node.operands) == 40_000
+    both = Pred.attr("a").exists() & Pred.attr("b").exists() & _chain(2)
+    assert both.compile() == "@a and @b and (@k0 or @k1)"
+
+
+def test_spawned_workers_receive_long_selectors():
+    paths = {"a": E("a").any().where(_chain(3000)), "b": E("b").any()}
+    results = list(
+        batch.run(
+            paths,
+            PAGES,
+            workers=1,
+            chunksize=2,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    )
+    assert [r.index for r in results] == list(range(len(PAGES)))
+    assert [r.matches for r in results] == [{"a": i, "b": 1} for i in range(6)]
+
+
+def test_workers_keep_the_selector_set_options():
+    selectors = SelectorSet(
+        {"a": E("a").any().where(_chain(2))},
+        adaptive=True,
+        replan_every=7,
+        indexed=True,
+    )
+    worker = batch._Worker(batch._spec(selectors, "count", None, "xml"))
+    own = worker.selectors
+    assert (own.adaptive, own.replan_every, own.indexed) == (True, 7, True)
+    results = batch.run(selectors, PAGES, workers=1, executor="thread")
+    assert [r.matches for r in results] == [{"a": min(i, 2)} for i in range(6)]
+
+
+def test_processes_are_the_default_executor(monkeypatch):
+    kinds: list[str] = []
+    for name in ("ProcessPoolExecutor", "ThreadPoolExecutor"):
+        real = getattr(batch, name)
+
+        def record(*args, _real=real, _name=name, **kwargs):
+            kinds.append(_name)
+            return _real(*args, **kwargs)
+
+        monkeypatch.setattr(batch, name, record)
+    monkeypatch.setattr(batch, "gil_enabled", lambda: False)
+    pages = PAGES[:2]
+    assert len(list(batch.run({"b": E("b").any()}, pages, workers=1))) == 2
+    assert len(list(batch.run({"b": E("b").any()}, pages, executor="auto"))) == 2
+    assert kinds == ["ProcessPoolExecutor", "ThreadPoolExecutor"]
+
+
+CORPUS = {name: PATHS[name] for name in ("tokens", "regex", "and", "steps", "nth")}
+
+
+@pytest.mark.parametrize(
+    "options",
+    [{"workers": 0}, {"workers": 1, "chunksize": 1}, {"workers": 2, "chunksize": 3}],
+    ids=["inline", "one", "two"],
+)
+def test_counts_match_the_reference(reference, options):
+    pages = [PAGE, PAGE.replace("ad", "xx"), "<r/>"] * 3
+    results = list(batch.run(CORPUS, pages, **options))
+    assert [r.index for r in results] == list(range(len(pages)))
+    for result, page in zip(results, pages):
+        doc = parse_as(TREE, page)
+        assert result.error is None
+        assert result.matches == {
+            name: len(reference(doc, path)) for name, path in CORPUS.items()
+        }
+
+
+def test_xpath_output_locates_the_matches(reference):
+    results = batch.run(CORPUS, [PAGE], workers=0, output="xpath")
+    (result,) = results
+    doc = parse_as(TREE, PAGE)
+    for name, path in CORPUS.items():
+        located = [reference(doc, p) for p in result.matches[name]]
+        assert located == [[el] for el in reference(doc, path)]
+
+
+def test_attribute_output_keeps_values_of_matches_that_have_it(reference):
+    (result,) = batch.run(CORPUS, [PAGE], workers=0, output="attribute", attribute="p")
+    doc = parse_as(TREE, PAGE)
+    for name, path in CORPUS.items():
+        want = [el.get("p") for el in reference(doc, path) if el.get("p") is not None]
+        assert result.matches[name] == want
+
+
+def test_every_document_source_is_read(tmp_path):
+    file = tmp_path / "page.xml"
+    file.write_bytes(b"<r><b/></r>")
+    sources = [b"<r><b/></r>", "<r><b/></r>", file, io.BytesIO(b"<r><b/></r>")]
+    results = batch.run({"b": E("b").any()}, sources, workers=0)
+    assert [r.matches for r in results] == [{"b": 1}] * 4
+
+
+def test_failures_are_reported_per_document():
+    pages = ["<r><b/></r>", "<r><b>", 42, "<r><b/><b/></r>"]
+    results = list(batch.run({"b": E("b").any()}, pages, workers=1, chunksize=2))
+    assert [r.matches for r in results] == [{"b": 1}, {}, {}, {"b": 2}]
+    assert [r.error is None for r in results] == [True, False, False, True]
+    assert results[2].error.startswith("TypeError: ")
+
+
+@pytest.mark.parametrize(
+    "options",
+    [{"output": "attribute"}, {"chunksize": 0}, {"executor": "fibers"}],
+)
+def test_invalid_options_are_rejected(options):
+    with pytest.raises(ValueError):
+        next(batch.run({"b": E("b").any()}, PAGES, **options))
+
+
+def test_thread_workers_agree_with_inline_evaluation():
+    pages = [PAGE, PAGE.replace("div", "p"), "<r>"] * 8
+    options = {"output": "xpath", "chunksize": 2}
+    inline = list(batch.run(PATHS, pages, workers=0, **options))
+    threaded = list(batch.run(PATHS, pages, workers=3, executor="thread", **options))
+    assert threaded == inline
+
+
+def test_thread_workers_never_share_evaluators(monkeypatch):
+    seen: dict[int, set[int]] = {}
+    process = batch._Worker.process
+
+    def record(self, index, doc):
+        result = process(self, index, doc)
+        evaluators = seen.setdefault(threading.get_ident(), set())
+        evaluators.update(id(ev) for ev in engine._current()._items.values())
+        return result
+
+    monkeypatch.setattr(batch._Worker, "process", record)
+    pages = [PAGE] * 12
+    list(batch.run(PATHS, pages, workers=3, executor="thread", chunksize=1))
+    assert threading.get_ident() not in seen
+    mine = [evaluators for evaluators in seen.values() if evaluators]
+    shared = {id(ev) for ev in engine._cache._items.values()}
+    assert mine and all(evaluators.isdisjoint(shared) for evaluators in mine)
+    assert all(a.isdisjoint(b) for a, b in combinations(mine, 2))
@@ -0,0 +1,115 @@
+import pytest
+
+from xpath_builder import STAR, Pred, engine
+from xpath_builder.expr import And, Call, Or, Quantified, TokenTest, walk
+from xpath_builder.optimize import merge_regex
+
+from .conftest import ids
+
+ATTRS = (
+    '<r><d id="a" data-x="1" aria-label="l"/><d id="b" Data-Y="2"/>'
+    '<d id="c" class="c" title="t"/><d id="e"/><d id="f" x-data="1" label="2"/></r>'
+)
+
+
+def _name_ops(kind: str, ci: bool):
+    ops = Pred.attr("*", case_insensitive=ci).has_name
+    return ops if kind == "any_of" else getattr(ops, kind)
+
+
+def _quantifiers(pred: Pred) -> int:
+    return sum(isinstance(e, Quantified) for e in walk(pred.node))
+
+
+@pytest.mark.parametrize("ci", [False, True])
+@pytest.mark.parametrize(
+    "kind, names",
+    [
+        ("contains", ("data", "label")),
+        ("startswith", ("data-", "aria-")),
+        ("endswith", ("-x", "label")),
+        ("matches", ("^d", "l$")),
+        ("any_of", ("title", "data-x", "label")),
+    ],
+)
+def test_name_set_ops_scan_the_attributes_once(parse, reference, kind, names, ci):
+    ops = _name_ops(kind, ci)
+    builder = ops() if kind == "matches" else ops
+    parts = [builder.any_of(n).node for n in names]
+    doc = parse(ATTRS)
+    for hoisted, unhoisted in (
+        (builder.any_of(*names), Pred(Or(tuple(parts)))),
+        (builder.none_of(*names), Pred(Or(tuple(parts))).neg()),
+    ):
+        assert _quantifiers(hoisted) == 1
+        path = STAR.any().where(hoisted)
+        want = ids(reference(doc, STAR.any().where(unhoisted)))
+        assert ids(reference(doc, path)) == want
+        assert ids(engine.compile(path)(doc)) == want
+
+
+@pytest.mark.parametrize("ci", [False, True])
+def test_name_all_of_is_one_quantifier_over_the_names(parse, reference, ci):
+    ops = Pred.attr("*", case_insensitive=ci).has_name
+    names = ("id", "data-y")
+    pred = ops.all_of(*names)
+    assert _quantifiers(pred) == 2  # every $n in (...) satisfies some $a in @*
+    unhoisted = Pred(And(tuple(ops.any_of(n).node for n in names)))
+    doc = parse(ATTRS)
+    want = ids(reference(doc, STAR.any().where(unhoisted)))
+    assert want == (["b"] if ci else [])
+    assert ids(engine.compile(STAR.any().where(pred))(doc)) == want
+
+
+TOKENS = (
+    '<r><d id="a" class="ad x"/><d id="b" class="ads"/><d id="c" class="AD"/>'
+    '<d id="e" class="advert  y"/><d id="f" class="aa ab"/><d id="g"/></r>'
+)
+
+
+@pytest.mark.parametrize(
+    "builder, tokens, folded",
+    [
+        (Pred.attr("class").contains_tokens, ("ad", "ads", "ad"), TokenTest),
+        (
+            Pred.attr("class", case_insensitive=True).contains_tokens,
+            ("ad", "advert"),
+            TokenTest,
+        ),
+        (Pred.attr("class").matches(), ("^ad", "s$", "^ad"), Call),
+        (Pred.attr("class").matches(flags="i"), ("^ad$", "y$"), Call),
+    ],
+    ids=["tokens", "tokens_ci", "regex", "regex_i"],
+)
+def test_any_of_folds_into_one_test(parse, reference, builder, tokens, folded):
+    pred = builder.any_of(*tokens)
+    assert isinstance(pred.node, folded)
+    unfolded = Pred(Or(tuple(builder.any_of(t).node for t in tokens)))
+    path = STAR.any().where(pred)
+    doc = parse(TOKENS)
+    want = ids(reference(doc, STAR.any().where(unfolded)))
+    assert want
+    assert ids(reference(doc, path)) == want
+    assert ids(engine.compile(path)(doc)) == want
+    assert ids(path.native()(doc)) == want
+
+
+def test_backreferences_and_mixed_flags_are_not_merged():
+    backref = Pred.attr("class").matches().any_of(r"(a)\1", "^ad")
+    assert isinstance(backref.node, Or)
+    mixed = Pred.attr("class").matches().any_of("^ad") | Pred.attr(
+        "class"
+    ).matches(flags="i").any_of("^x")
+    assert isinstance(mixed.node, Or)
+
+
+def test_merge_keeps_unrelated_operands_in_place():
+    pred = (
+        Pred.attr_has_token("class", "ad")
+        | Pred.attr("id").exists()
+        | Pred.attr_has_token("class", "ads")
+    )
+    merged = merge_regex(pred.node)
+    assert isinstance(merged, Or) and len(merged.operands) == 2
+    assert isinstance(merged.operands[0], TokenTest)
+    assert merged.operands[0].tokens == ("ad", "ads")
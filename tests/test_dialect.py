@@ -0,0 +1,102 @@
+import pytest
+
+from xpath_builder import E, Pred, engine
+from xpath_builder.dialect import LoweringError, lower
+
+from .conftest import PAGE, PATHS, PREDICATES, ids, needs_lxml, xpath1_select
+
+LATIN = (
+    '<r><d id="a" n="ÉCOLE" v="x"/><d id="b" n="école" v="xx"/><d id="c" n="E"/>'
+    '<d id="e" k="some thing"/></r>'
+)
+D = E("d").any()
+EXTRA = {
+    "latin_ci": D.where(Pred.attr("n", case_insensitive=True).as_str.eq("école")),
+    "ends_short": D.where(Pred.attr("v").endswith.any_of("xx", "x")),
+    "ends_missing": D.where(Pred.attr("n").endswith.any_of("")),
+    "seq": D.where(Pred.attr("id").as_str.in_("a", "c")),
+    "token_ws": D.where(Pred.attr_has_token("k", "thing")),
+}
+# need Unicode case mapping, which the translate() table lacks
+UNICODE_CI = ("greek_ci", "cyrillic_ci", "turkish_ci")
+LOWERABLE = {
+    name: path
+    for name, path in {**PATHS, **EXTRA}.items()
+    if name not in ("text_regex", *UNICODE_CI)
+}
+XPATH2_ONLY = ("matches(", "lower-case(", "ends-with(", "some $", "every $")
+
+
+@pytest.mark.parametrize("name", sorted(LOWERABLE))
+def test_lowered_paths_agree_with_xpath2(kind, parse, reference, name):
+    path = LOWERABLE[name]
+    for text in (PAGE, LATIN):
+        doc = parse(text)
+        want = ids(reference(doc, path))
+        assert ids(xpath1_select(kind, doc, path.compile("xpath1"))) == want
+
+
+def test_lowering_removes_every_xpath2_construct():
+    for name, path in LOWERABLE.items():
+        text = path.compile("xpath1")
+        assert not any(c in text for c in XPATH2_ONLY), (name, text)
+
+
+@pytest.mark.parametrize(
+    "pred",
+    [
+        Pred.text_matches("s[12]"),
+        Pred.attr("id").matches().any_of("a+b"),
+        Pred("for $x in @* return $x"),
+    ],
+    ids=lambda p: p.compile(),
+)
+def test_unlowerable_constructs_raise_naming_them(pred):
+    with pytest.raises(LoweringError):
+        E("d").any().where(pred).compile("xpath1")
+
+
+def test_xpath2_is_the_identity_and_lowering_is_memoized():
+    node = PATHS["tokens"].node
+    assert lower(node, "xpath2") is node
+    assert lower(node) is lower(node)
+    with pytest.raises(ValueError):
+        lower(node, "xpath3")  # type: ignore[arg-type]
+
+
+@needs_lxml
+def test_lowerable_paths_run_on_libxml2():
+    assert engine.compile(PATHS["tokens_ci"]).backend == "lxml"
+    assert engine.compile(PATHS["text_regex"]).backend == "elementpath"
+
+
+@pytest.mark.parametrize(
+    "pred",
+    [
+        *(PREDICATES[name] for name in UNICODE_CI),
+        Pred.attr("t", case_insensitive=True).as_str.eq("σ"),
+        Pred.attr("t", case_insensitive=True).as_str.in_("a", "ж"),
+        Pred.attr_has_token("t", "ΣΟΦΙΑ", case_insensitive=True),
+        Pred.attr("t").matches(flags="i").any_of("^жук$"),
+        Pred("lower-case(@t) = $t"),
+        Pred("contains(upper-case(@t), @u)"),
+    ],
+    ids=lambda p: p.compile(),
+)
+def test_case_folds_beyond_latin1_are_not_lowered(pred):
+    with pytest.raises(LoweringError, match="case"):
+        E("d").any().where(pred).compile("xpath1")
+
+
+@pytest.mark.parametrize("name", UNICODE_CI)
+def test_unicode_case_folds_fall_back_from_libxml2(kind, parse, reference, name):
+    path = PATHS[name]
+    doc = parse(PAGE)
+    want = ids(reference(doc, path))
+    assert want == ["intl"]
+    assert ids(engine.compile(path)(doc)) == want
+    assert ids(path.evaluator()(doc)) == want
+    assert engine.compile(path).backend != "lxml"
+    doc = parse('<r><d id="s" t="Σ"/><d id="x" t="x"/></r>')
+    ci = E("d").any().where(Pred.attr("t", case_insensitive=True).as_str.eq("σ"))
+    assert ids(engine.compile(ci)(doc)) == ["s"]
@@ -0,0 +1,103 @@
+import re
+
+import pytest
+
+from xpath_builder import E, STAR, Pred
+from xpath_builder.doccache import (
+    DocumentCache,
+    active_cache,
+    document_cache,
+    no_cache,
+)
+
+from .conftest import PAGE, PREDICATES, ids, reference_select, string_of
+
+
+def _elements(doc):
+    return [el for el in doc.iter() if isinstance(el.tag, str)]
+
+
+def _normalize(text: str) -> str:
+    return " ".join(re.split("[ \t\r\n]+", text)).strip(" ")
+
+
+@pytest.mark.parametrize(
+    "method, expected",
+    [
+        ("string_value", string_of),
+        ("normalized", lambda el: _normalize(string_of(el))),
+        ("lowered", lambda el: string_of(el).lower()),
+        ("normalized_lower", lambda el: _normalize(string_of(el)).lower()),
+    ],
+    ids=["string", "normalize-space", "lower-case", "both"],
+)
+def test_memoized_text_matches_the_tree(parse, method, expected):
+    doc = parse(PAGE)
+    cache = DocumentCache()
+    for el in reversed(_elements(doc)):  # leaves first, then from the memo
+        assert getattr(cache, method)(el) == expected(el)
+
+
+def test_string_values_are_built_once_per_node(parse):
+    doc = parse(PAGE)
+    cache = DocumentCache()
+    cache.string_value(doc)
+    assert len(cache._string) == len(_elements(doc))
+    first = {id(el): cache.string_value(el) for el in _elements(doc)}
+    assert all(cache.string_value(el) is first[id(el)] for el in _elements(doc))
+
+
+def test_deep_documents_do_not_recurse(parse):
+    depth = 250
+    doc = parse("<a>x" * depth + "</a>" * depth)
+    cache = DocumentCache()
+    assert cache.string_value(doc) == "x" * depth
+    assert cache.string_value(doc[0]) == "x" * (depth - 1)
+
+
+@pytest.mark.parametrize("ci", [False, True])
+def test_tokens_split_on_xml_whitespace(parse, ci):
+    doc = parse('<r class=" Ad\tads\n AD  x.y "/>')
+    want = {"ad", "ads", "x.y"} if ci else {"Ad", "ads", "AD", "x.y"}
+    assert DocumentCache().tokens(doc, "class", ci) - {""} == want
+
+
+@pytest.mark.parametrize("name", sorted(PREDICATES))
+def test_cached_and_uncached_predicates_agree(parse, name):
+    doc = parse(PAGE)
+    check = PREDICATES[name].native()
+    with no_cache():
+        plain = [el for el in _elements(doc) if check(el)]
+    with document_cache():
+        cached = [el for el in _elements(doc) if check(el)]
+    assert cached == plain
+    assert ids(plain) == ids(reference_select(doc, STAR.any().where(PREDICATES[name])))
+
+
+def test_scopes_nest_and_reset():
+    assert active_cache() is None
+    with document_cache() as outer:
+        with document_cache(indexed=True) as inner:
+            assert inner is outer and outer.indexed
+        own = DocumentCache()
+        with document_cache(own) as explicit:
+            assert explicit is own and active_cache() is own
+        with no_cache():
+            assert active_cache() is None
+        assert active_cache() is outer
+    assert active_cache() is None
+
+
+def test_text_predicates_share_one_cache_across_selectors(parse):
+    doc = parse(PAGE)
+    paths = [
+        E("div").any().where(Pred.text_contains("hi", case_insensitive=True)),
+        E("div").any().where(Pred.text_contains("World")),
+    ]
+    with document_cache() as cache:
+        for path in paths:
+            path.native()(doc)
+        assert cache._string and cache._normalized_lower
+        size = len(cache._string)
+        paths[0].native()(doc)
+        assert len(cache._string) == size
@@ -0,0 +1,73 @@
+import threading
+
+import pytest
+
+from xpath_builder import E, Pred, engine
+
+from .conftest import PAGE, PATHS, ids
+
+
+@pytest.mark.parametrize("name", sorted(PATHS))
+def test_compiled_paths_agree_with_elementpath(parse, reference, name):
+    doc = parse(PAGE)
+    path = PATHS[name]
+    want = ids(reference(doc, path))
+    evaluator = engine.compile(path)
+    assert ids(evaluator(doc)) == want
+
+
+def test_variables_reach_every_backend(parse, reference):
+    doc = parse(PAGE)
+    path = E("div").any().where(Pred("@id = $v"))
+    for v in ("x", "plain", "nope"):
+        assert ids(engine.compile(path)(doc, v=v)) == ids(reference(doc, path, v=v))
+
+
+def test_test_evaluates_per_element(parse, reference):
+    doc = parse(PAGE)
+    pred = Pred.attr("p").as_num.gt(4)
+    check = engine.compile_test(pred)
+    hits = [el for el in doc.iter() if isinstance(el.tag, str) and check.test(el, doc)]
+    assert ids(hits) == ids(reference(doc, E("*").any().where(pred)))
+
+
+def test_cache_is_a_bounded_lru():
+    cache = engine.EvaluatorCache(2)
+    a, b, c = (E(t).any().node for t in "abc")
+    first = cache.get(a)
+    cache.get(b)
+    assert cache.get(a) is first  # a is now the most recent
+    cache.get(c)  # evicts b
+    assert cache.stats() == engine.CacheStats(hits=1, misses=3, size=2, maxsize=2)
+    assert cache.get(a) is first
+    cache.get(b)
+    assert cache.stats().misses == 4
+    cache.resize(1)
+    assert cache.stats().size == 1
+    cache.clear()
+    assert cache.stats() == engine.CacheStats(0, 0, 0, 1)
+    with pytest.raises(ValueError):
+        engine.EvaluatorCache(0)
+
+
+def test_equal_paths_share_one_evaluator():
+    one = engine.compile(E("div").any().where(Pred.attr("id").exists()))
+    assert engine.compile(E("div").any().where(Pred.attr("id").exists())) is one
+    assert engine.compile("//div[@id]") is one
+
+
+def test_thread_caches_are_private():
+    path = E("div").any().where(Pred.attr("k").exists())
+    shared = engine.compile(path)
+    seen = []
+
+    def worker():
+        own = engine.thread_cache()
+        assert engine.thread_cache() is own
+        seen.append(engine.compile(path))
+
+    t = threading.Thread(target=worker)
+    t.start()
+    t.join()
+    assert len(seen) == 1 and seen[0] is not shared
+    assert engine.compile(path) is shared
@@ -0,0 +1,113 @@
+import pytest
+
+from xpath_builder import E, STAR, Pred
+from xpath_builder.doccache import active_cache
+from xpath_builder.engine import PROBE_LIMIT
+
+from .conftest import PAGE, PATHS, ids, needs_lxml, parse_as
+
+MANY = "<r>" + "".join(f'<d id="d{i}" k="{i % 3}"/>' for i in range(1500)) + "</r>"
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        STAR.any(),
+        E("d").any().where(Pred.attr("k").as_str.eq("1")),
+        E("d").any().where(Pred.attr("k").as_str.eq("nope")),
+    ],
+    ids=str,
+)
+def test_native_modes_agree_with_the_list_across_chunks(parse, path):
+    doc = parse(MANY)
+    fn = path.native()
+    full = fn(doc)
+    assert ids(fn.iter(doc)) == ids(full)
+    assert fn.count(doc) == len(full)
+    assert fn.first(doc) is (full[0] if full else None)
+
+
+def test_native_iter_does_not_leave_the_cache_scope_open(parse):
+    doc = parse(MANY)
+    it = STAR.any().native().iter(doc)
+    next(it)
+    assert active_cache() is None
+    assert len(list(it)) == 1500
+    assert active_cache() is None
+
+
+@needs_lxml
+@pytest.mark.parametrize("at", [0, PROBE_LIMIT - 1, PROBE_LIMIT, 1400, None])
+def test_lxml_modes_probe_natively_then_fall_back(at, reference):
+    hits = () if at is None else (at, at + 1)
+    xml = "<r>" + "".join(
+        f'<d id="d{i}" k="{"x" if i in hits else "y"}"/>' for i in range(1500)
+    ) + "</r>"
+    doc = parse_as("lxml", xml)
+    path = E("d").any().where(Pred.attr("k").as_str.eq("x"))
+    evaluator = path.evaluator()
+    assert evaluator._route(doc, {}) == "libxml2"
+    want = ids(reference(doc, path))
+    assert ids(evaluator.iter(doc)) == want
+    assert evaluator.exists(doc) is bool(want)
+    first = evaluator.first_match(doc)
+    assert (first.get("id") if first is not None else None) == (
+        want[0] if want else None
+    )
+    assert evaluator.count(doc) == len(want)
+
+
+@needs_lxml
+def test_lxml_probe_reads_only_the_candidates_it_needs():
+    doc = parse_as("lxml", MANY)
+    evaluator = E("d").any().where(Pred.attr("k").as_str.eq("1")).evaluator()
+    it = evaluator.iter(doc)
+    assert next(it).get("id") == "d1"
+    hits, complete = evaluator._native.head(doc, PROBE_LIMIT)
+    assert len(hits) == len(range(1, PROBE_LIMIT, 3)) and not complete
+    assert len(list(it)) == 499
+
+
+@needs_lxml
+def test_lxml_modes_with_variables_skip_the_probe():
+    doc = parse_as("lxml", MANY)
+    path = E("d").any().where(Pred("@k = $k"))
+    evaluator = path.evaluator()
+    assert ids(evaluator.iter(doc, k="2")) == [f"d{i}" for i in range(2, 1500, 3)]
+    assert evaluator.exists(doc, k="9") is False
+    assert evaluator.first_match(doc, k="0").get("id") == "d0"
+
+
+def _modes(evaluator, doc, **variables):
+    first = evaluator.first_match(doc, **variables)
+    return (
+        ids(evaluator.iter(doc, **variables)),
+        evaluator.exists(doc, **variables),
+        first.get("id") or first.tag if first is not None else None,
+        evaluator.count(doc, **variables),
+    )
+
+
+def _expected(nodes):
+    found = ids(nodes)
+    return found, bool(found), found[0] if found else None, len(found)
+
+
+@pytest.mark.parametrize("path", PATHS.values(), ids=PATHS.keys())
+def test_modes_agree_with_the_reference_on_every_route(parse, reference, path):
+    doc = parse(PAGE)
+    evaluator = path.evaluator()
+    assert _modes(evaluator, doc) == _expected(reference(doc, path))
+
+
+@pytest.mark.parametrize("text", [PAGE, "<r/>"], ids=["page", "empty"])
+def test_elementpath_route_modes(parse, reference, text):
+    path = E("div").any().where(Pred("exists(for $a in @* return $a[. = 'x'])"))
+    doc = parse(text)
+    evaluator = path.evaluator()
+    assert evaluator._route(doc, {}) == "elementpath"
+    assert _modes(evaluator, doc) == _expected(reference(doc, path))
+    with_var = E("div").any().where(Pred("@p = $p"))
+    assert _modes(with_var.evaluator(), doc, p="10") == _expected(
+        reference(doc, with_var, p="10")
+    )
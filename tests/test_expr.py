@@ -0,0 +1,109 @@
+import dataclasses
+import pickle
+
+import pytest
+
+from xpath_builder import E, Path, Pred
+from xpath_builder.expr import (
+    And,
+    Arith,
+    Attr,
+    Filter,
+    Num,
+    Or,
+    Raw,
+    Str,
+    rewrite,
+    walk,
+)
+
+from .conftest import PAGE, PATHS, ids
+
+
+def test_builders_compose_immutable_trees():
+    base = Pred.attr("id").exists()
+    combined = base & Pred.attr("class").missing()
+    assert base.compile() == "@id"
+    assert combined.compile() == "@id and not(@class)"
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        combined.node = base.node  # type: ignore[misc]
+    path = E("div").any()
+    assert str(path.where(base)) == "//div[@id]"
+    assert str(path) == "//div"
+
+
+def test_plain_strings_are_kept_as_raw_xpath():
+    pred = Pred("@a = 1")
+    assert isinstance(pred.node, Raw)
+    assert E("x").any().where(pred).compile() == "//x[@a = 1]"
+
+
+def test_equality_and_hash_follow_the_rendered_text():
+    a = E("div").any().where(Pred.attr("id").as_str.eq("x"))
+    b = E("div").any().where(Pred.attr("id").as_str.eq("x"))
+    assert a.node is not b.node
+    assert a.node == b.node and hash(a.node) == hash(b.node)
+    assert pickle.loads(pickle.dumps(a)) == a
+
+
+def test_deep_chains_render_compare_and_rewrite_without_recursion():
+    path = E("a").any()
+    for i in range(5000):
+        path = path.where(Pred.attr(f"k{i}").exists())
+    text = path.compile()
+    assert text.startswith("//a[@k0][@k1]") and text.endswith("[@k4999]")
+    assert path.node.text is path.node.text  # memoized on the root
+    assert Path(rewrite(path.node, lambda e: e)).node is path.node
+    assert sum(isinstance(e, Filter) for e in walk(path.node)) == 5000
+
+
+def test_rewrite_rebuilds_only_what_changed():
+    pred = Pred.attr("a").as_str.eq("1") & Pred.attr("b").exists()
+    swapped = rewrite(pred.node, lambda e: Str("2") if e == Str("1") else e)
+    assert swapped.text == "@a = '2' and @b"
+    kept = [e for e in walk(swapped) if isinstance(e, Attr) and e.name == "b"]
+    assert kept[0] is [e for e in walk(pred.node) if e == Attr("b")][0]
+
+
+@pytest.mark.parametrize("name", sorted(PATHS))
+def test_every_corpus_path_selects_a_proper_subset(parse, reference, name):
+    doc = parse(PAGE)
+    found = ids(reference(doc, PATHS[name]))
+    assert 0 < len(found) < len(ids(reference(doc, "//*")))
+
+
+A, B, C = (Pred.attr(n).exists() for n in "abc")
+ABC = (
+    "<r><d id='1' a=''/><d id='2' b='' c=''/><d id='3' a='' b=''/><d id='4' c=''/>"
+    "</r>"
+)
+
+
+@pytest.mark.parametrize(
+    "pred, text, expected",
+    [
+        ((A & B) & C, "@a and @b and @c", []),
+        (A & (B & C), "@a and @b and @c", []),
+        ((A | B) & C, "(@a or @b) and @c", ["2"]),
+        (A | (B & C), "@a or @b and @c", ["1", "2", "3"]),
+        ((A | B) | (C | A), "@a or @b or @c or @a", ["1", "2", "3", "4"]),
+        ((A & B).neg() | C, "not(@a and @b) or @c", ["1", "2", "4"]),
+        (Pred(And((And((A.node, B.node)), C.node))), "@a and @b and @c", []),
+        (Pred(Or((A.node, Raw("@b and @c")))), "@a or (@b and @c)", ["1", "2", "3"]),
+    ],
+    ids=lambda v: v if isinstance(v, str) else "",
+)
+def test_and_or_flatten_and_parenthesize_by_precedence(
+    parse, reference, pred, text, expected
+):
+    assert pred.compile() == text
+    doc = parse(ABC)
+    assert ids(reference(doc, E("d").any().where(pred))) == expected
+
+
+def test_unions_and_arithmetic_keep_their_grouping():
+    p, q, r = (E(t).any() for t in "pqr")
+    assert Path.union(Path.union(p, q), r).compile() == "//p | //q | //r"
+    assert Path.union(p, q).child(E("s")).compile() == "(//p | //q)/s"
+    assert Arith(Arith(Num(1), "-", Num(2)), "-", Num(3)).text == "1 - 2 - 3"
+    assert Arith(Num(1), "-", Arith(Num(2), "-", Num(3))).text == "1 - (2 - 3)"
@@ -0,0 +1,52 @@
+from xpath_builder import E, Pred, engine, extensions
+from xpath_builder.expr import Filter, Raw
+from xpath_builder.native import MULTI_MATCH_MIN
+
+from .conftest import ids, needs_lxml, parse_as
+
+PREFIXES = [f"p{i:02d}" for i in range(MULTI_MATCH_MIN + 6)]
+XML = (
+    "<r>"
+    + "".join(f'<d id="d{i}" v="p{i:02d}x"/>' for i in range(0, 60, 3))
+    + '<d id="none" v="q"/><d id="bare"/></r>'
+)
+
+
+def _non_native(pred: Pred) -> Filter:
+    # a raw step keeps the path off the native route, onto the xb: calls
+    return Filter(E("d").any().where(pred).node, Raw("count(ancestor::*) >= 0"))
+
+
+def test_rewrite_returns_the_matchers_its_calls_name():
+    node = Pred.attr("v").startswith.any_of(*PREFIXES).node
+    rewritten, matchers = extensions.rewrite(node)
+    assert "xb:starts-with-any" in rewritten.text
+    (key,) = matchers
+    assert key in rewritten.text
+    assert matchers[key]("p07zz") and not matchers[key]("zp07")
+    assert extensions.rewrite(node)[1].keys() == matchers.keys()  # stable keys
+
+
+@needs_lxml
+def test_extension_calls_agree_with_elementpath(reference):
+    doc = parse_as("lxml", XML)
+    for pred in (
+        Pred.attr("v").startswith.any_of(*PREFIXES),
+        Pred.attr("v").endswith.any_of(*(p + "x" for p in PREFIXES)),
+        Pred.attr("v").contains.any_of(*(p[1:] + "x" for p in PREFIXES)),
+    ):
+        node = _non_native(pred)
+        evaluator = engine._build(node)
+        assert extensions.uses_extensions(evaluator.expression)
+        assert ids(evaluator(doc)) == ids(reference(doc, node.text))
+
+
+@needs_lxml
+def test_matchers_belong_to_their_evaluator():
+    node = _non_native(Pred.attr("v").startswith.any_of(*PREFIXES))
+    first, second = engine._build(node), engine._build(node)
+    (key,) = first._matchers
+    assert second._matchers.keys() == {key}
+    assert first._matchers[key] is not second._matchers[key]
+    registries = [v for v in vars(extensions).values() if isinstance(v, dict)]
+    assert not any(key in registry for registry in registries)
@@ -0,0 +1,54 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+_PROBE = """
+import sys
+import xpath_builder
+from xpath_builder import E, Pred
+print(E("a").any().where(Pred.attr("k").exists()).compile())
+print(" ".join(m for m in {modules!r} if m in sys.modules))
+"""
+
+LAZY = (
+    "elementpath",
+    "lxml",
+    "xpath_builder.dialect",
+    "xpath_builder.engine",
+    "xpath_builder.extensions",
+    "xpath_builder.native",
+    "xpath_builder.optimize",
+    "xpath_builder.planner",
+    "xpath_builder.selector_set",
+)
+
+
+def _run(code: str) -> list[str]:
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return out.stdout.splitlines()
+
+
+def test_building_and_compiling_loads_no_evaluation_module():
+    xpath, loaded = _run(_PROBE.format(modules=LAZY))
+    assert xpath == "//a[@k]"
+    assert loaded.split() == ["xpath_builder.dialect"]
+
+
+def test_selector_set_is_exported_on_first_use():
+    import xpath_builder
+    from xpath_builder.selector_set import SelectorSet
+
+    assert "SelectorSet" in xpath_builder.__all__
+    assert xpath_builder.SelectorSet is SelectorSet
+    with pytest.raises(AttributeError):
+        xpath_builder.NoSuchThing
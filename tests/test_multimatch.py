@@ -0,0 +1,128 @@
+import random
+
+import pytest
+
+from xpath_builder import E, Pred
+from xpath_builder.multimatch import AhoCorasick, PrefixTrie
+from xpath_builder.native import MULTI_MATCH_MIN
+
+from .conftest import ids, needs_lxml, parse_as
+
+ALPHABET = "abcé-"
+
+
+def _words(rng: random.Random, count: int, longest: int) -> list[str]:
+    return [
+        "".join(rng.choice(ALPHABET) for _ in range(rng.randint(1, longest)))
+        for _ in range(count)
+    ]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_aho_corasick_agrees_with_a_naive_search(seed):
+    rng = random.Random(seed)
+    needles = _words(rng, rng.randint(1, 40), 5)
+    automaton = AhoCorasick(needles)
+    for text in _words(rng, 200, 12):
+        assert automaton.search(text) is any(n in text for n in needles), text
+
+
+@pytest.mark.parametrize(
+    "needles, text, found",
+    [
+        (["he", "she", "his", "hers"], "ushers", True),
+        (["abcd", "bc"], "abce", True),  # only reachable through a failure link
+        (["abcd", "bcx"], "abcx", True),
+        (["aab"], "aaab", True),
+        (["abc"], "ab", False),
+        ([""], "", True),
+        (["x", ""], "y", True),
+        ([], "anything", False),
+    ],
+)
+def test_aho_corasick_edge_cases(needles, text, found):
+    automaton = AhoCorasick(needles)
+    assert automaton.search(text) is found
+    assert automaton.search(text) is found  # warm transitions
+
+
+ADS = [f"ad{i:02d}" for i in range(MULTI_MATCH_MIN + 10)] + ["banner", "promo"]
+CLASSES = (
+    "<r>"
+    + "".join(f'<d id="d{i}" class="x-ad{i:02d}-y"/>' for i in range(0, 60, 7))
+    + '<d id="banner" class="top BANNER"/><d id="promo" class="promotion"/>'
+    + '<d id="none" class="a d"/><d id="bare"/></r>'
+)
+
+
+@pytest.mark.parametrize("ci", [False, True])
+def test_large_contains_disjunctions_match_the_reference(parse, reference, ci):
+    pred = Pred.attr("class", case_insensitive=ci).contains.any_of(*ADS)
+    path = E("d").any().where(pred)
+    report = path.analyze()
+    assert report.multi_match and report.native
+    doc = parse(CLASSES)
+    want = ids(reference(doc, path))
+    assert ("banner" in want) is ci and "promo" in want
+    assert ids(path.native()(doc)) == want
+    assert ids(path.evaluator()(doc)) == want
+
+
+@needs_lxml
+def test_lxml_trees_take_the_native_route_for_large_sets():
+    doc = parse_as("lxml", CLASSES)
+    path = E("d").any().where(Pred.attr("class").contains.any_of(*ADS))
+    assert path.evaluator()._route(doc, {}) == "native"
+    small = E("d").any().where(Pred.attr("class").contains.any_of(*ADS[:3]))
+    assert small.evaluator()._route(doc, {}) == "libxml2"
+
+
+@pytest.mark.parametrize("suffix", [False, True])
+@pytest.mark.parametrize("seed", range(10))
+def test_prefix_trie_agrees_with_a_naive_test(seed, suffix):
+    rng = random.Random(seed)
+    affixes = _words(rng, rng.randint(1, 40), 4)
+    trie = PrefixTrie(affixes, suffix=suffix)
+    naive = str.endswith if suffix else str.startswith
+    for text in _words(rng, 200, 8):
+        assert trie.match(text) is naive(text, tuple(affixes)), text
+
+
+@pytest.mark.parametrize(
+    "affixes, suffix, text, found",
+    [
+        (["ab", "abc"], False, "abd", True),
+        (["abc"], False, "ab", False),
+        (["abc"], True, "xabc", True),
+        (["abc"], True, "abcx", False),
+        ([""], False, "", True),
+        (["a", ""], True, "b", True),
+        ([], False, "a", False),
+    ],
+)
+def test_prefix_trie_edge_cases(affixes, suffix, text, found):
+    assert PrefixTrie(affixes, suffix=suffix).match(text) is found
+
+
+IDS = [f"id{i:02d}-" for i in range(MULTI_MATCH_MIN + 10)]
+AFFIXED = (
+    "<r>"
+    + "".join(
+        f'<d id="d{i}" v="id{i:02d}-x" w="x.ID{i:02d}-"/>' for i in range(0, 60, 7)
+    )
+    + '<d id="short" v="id" w="-"/><d id="bare"/></r>'
+)
+
+
+@pytest.mark.parametrize("ci", [False, True])
+@pytest.mark.parametrize("op", ["startswith", "endswith"])
+def test_large_affix_disjunctions_match_the_reference(parse, reference, op, ci):
+    attr = Pred.attr("v" if op == "startswith" else "w", case_insensitive=ci)
+    path = E("d").any().where(getattr(attr, op).any_of(*IDS))
+    report = path.analyze()
+    assert report.multi_match and report.native
+    doc = parse(AFFIXED)
+    want = ids(reference(doc, path))
+    assert bool(want) is (ci or op == "startswith")
+    assert ids(path.native()(doc)) == want
+    assert ids(path.evaluator()(doc)) == want
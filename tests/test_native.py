@@ -0,0 +1,134 @@
+import pytest
+
+from xpath_builder import E, STAR, Pred, SelectorSet
+from xpath_builder.doccache import document_cache
+from xpath_builder.expr import Attr, Call, Compare, Num, Str, TokenTest
+from xpath_builder.native import UnsupportedExpression
+from xpath_builder.utils import lxml_etree
+
+from .conftest import PAGE, PATHS, PREDICATES, ids, needs_lxml
+
+RELATIONAL = (
+    '<r><d id="a" k="10" j="9"/><d id="b" k="2" j="10"/><d id="c" k="x" j="1"/>'
+    '<d id="e" k=" 3 " j="3.0"/><d id="f"/></r>'
+)
+K, J = Attr("k"), Attr("j")
+
+NATIVE_PATHS = {name: path for name, path in PATHS.items() if name != "last"}
+
+
+@pytest.mark.parametrize("path", NATIVE_PATHS.values(), ids=NATIVE_PATHS.keys())
+def test_compiled_paths_match_the_reference(parse, reference, path):
+    doc = parse(PAGE)
+    assert ids(path.native()(doc)) == ids(reference(doc, path))
+
+
+@pytest.mark.parametrize("pred", PREDICATES.values(), ids=PREDICATES.keys())
+def test_compiled_predicates_filter_like_the_reference(parse, reference, pred):
+    doc = parse(PAGE)
+    fn = pred.native()
+    got = [el for el in doc.iter() if isinstance(el.tag, str) and fn(el)]
+    assert ids(got) == ids(reference(doc, STAR.any().where(pred)))
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        PATHS["last"],
+        E("d").any().where(Pred("foo:bar()")),
+        E("d").any().where(Pred.attr("id").matches().any_of(r"\p{L}")),
+        E("d").any().where(Pred.attr("id").matches(flags="q").any_of("a")),
+        E("d").any().where(Pred("$x = 1")),
+    ],
+    ids=str,
+)
+def test_unsupported_expressions_raise(path):
+    with pytest.raises(UnsupportedExpression):
+        path.native()
+
+
+@needs_lxml
+@pytest.mark.parametrize(
+    "compare",
+    [
+        Compare(K, "<", Str("5")),
+        Compare(Str("10"), "<", K),
+        Compare(K, ">", J),
+        Compare(K, ">=", J),
+        Compare(K, "<", Num(5)),
+        Compare(Attr("*"), ">", Str("5")),
+        Compare(Attr("*"), "<=", J),
+        Compare(Call("string", (K,)), "<", Str("5")),
+        Compare(Call("string", (K,)), ">=", Call("string", (J,))),
+        Compare(Str("b"), "<", Str("a")),
+        Compare(Call("string", (K,)), "=", Str(" 3 ")),
+        Compare(Attr("*"), "!=", Str("3.0")),
+    ],
+    ids=lambda c: c.text,
+)
+def test_relational_comparisons_convert_strings_to_numbers(parse, compare):
+    # XPath 1.0 semantics, as libxml2 evaluates them: elementpath (XPath 2.0)
+    # compares untyped values against a string literal as strings instead
+    path = E("d").any().where(Pred(compare))
+    etree = lxml_etree()
+    assert etree is not None
+    want = etree.fromstring(RELATIONAL.encode()).xpath(path.compile("xpath1"))
+    assert ids(path.native()(parse(RELATIONAL))) == ids(want)
+
+
+TOKENS = (
+    '<r><d id="a" c="x y"/><d id="b" c=""/><d id="c" c=" \t "/><d id="e"/>'
+    '<d id="f" c=" X "/></r>'
+)
+
+
+@pytest.mark.parametrize(
+    "tokens", [("",), ("", "x"), ("x",), ("x y",), (" x",), ("y", "x y")], ids=repr
+)
+@pytest.mark.parametrize("ci", [False, True])
+def test_empty_and_multi_word_tokens_match_like_the_pattern(
+    parse, reference, tokens, ci
+):
+    pred = Pred(TokenTest("c", tokens, ci))
+    path = E("d").any().where(pred)
+    doc = parse(TOKENS)
+    want = ids(reference(doc, path))
+    fn = pred.native()
+    assert ids(el for el in doc.iter("d") if fn(el)) == want
+    with document_cache():
+        assert ids(el for el in doc.iter("d") if fn(el)) == want
+    with document_cache(indexed=True):
+        assert ids(path.native()(doc)) == want
+    assert ids(SelectorSet({"p": path}, indexed=True).evaluate(doc)["p"]) == want
+
+
+ANCHORS = (
+    '<r><a id="1" v="x&#10;"/><a id="2" v="x"/><a id="3" v="x$"/>'
+    '<a id="4" v="a&#10;x"/><a id="5" v="x&#10;&#10;"/></r>'
+)
+
+
+@pytest.mark.parametrize(
+    "pattern, flags",
+    [
+        ("x$", ""),
+        ("^x$", ""),
+        ("x$", "m"),
+        ("^x$", "m"),
+        (r"x\$", ""),
+        ("x[$]", ""),
+        ("(x)$|a$", ""),
+        ("X$", "i"),
+        ("x\n$", ""),
+    ],
+    ids=repr,
+)
+def test_end_anchors_match_only_at_the_end_of_the_string(
+    parse, reference, pattern, flags
+):
+    pred = Pred.attr("v").matches(flags=flags).any_of(pattern)
+    path = E("a").any().where(pred)
+    doc = parse(ANCHORS)
+    want = ids(reference(doc, path))
+    assert ids(path.native()(doc)) == want
+    assert ids(SelectorSet({"p": path}).evaluate(doc)["p"]) == want
@@ -0,0 +1,86 @@
+import pytest
+
+from xpath_builder import E, STAR, Pred, engine
+from xpath_builder.dialect import LoweringError
+from xpath_builder.expr import FALSE, TRUE, Call, Num
+from xpath_builder.native import UnsupportedExpression
+from xpath_builder.optimize import optimize, simplify
+
+from .conftest import PAGE, PATHS, ids, xpath1_select
+
+A, B = Pred.attr("a").exists(), Pred.attr("b").exists()
+NUMBERED = '<r><d id="1" a="1"/><d id="2" b="1"/><d id="3" a="1" b="1"/><d id="4"/></r>'
+DEAD = {
+    "fold": (A & Pred(TRUE)) | Pred(FALSE),
+    "double_negation": A.neg().neg(),
+    "dedup": A & B & A,
+    "absorb_or": A | (A & B),
+    "absorb_and": A & (A | B),
+    "contradiction": (A & A.neg()) | B,
+    "tautology": (A | A.neg()) & B,
+    "empty_sets": Pred.attr("c").contains_tokens.any_of()
+    | Pred.attr("c").contains_tokens.all_of() & B,
+    "not_in": Pred.attr("a").as_str.not_in("1") | A,
+}
+
+
+@pytest.mark.parametrize(
+    "path",
+    [*PATHS.values(), *(E("d").any().where(p) for p in DEAD.values())],
+    ids=[*PATHS, *DEAD],
+)
+def test_optimized_paths_select_the_same_nodes(kind, parse, reference, path):
+    optimized = path.optimize()
+    for text in (PAGE, NUMBERED):
+        doc = parse(text)
+        want = ids(reference(doc, path))
+        assert ids(reference(doc, optimized)) == want
+        assert ids(engine.compile(path)(doc)) == want
+        try:
+            assert ids(optimized.native()(doc)) == want
+        except UnsupportedExpression:
+            pass
+        try:
+            lowered = optimized.compile("xpath1")
+        except LoweringError:
+            continue
+        assert ids(xpath1_select(kind, doc, lowered)) == want
+
+
+@pytest.mark.parametrize(
+    "pred, want",
+    [
+        (DEAD["fold"], A),
+        (DEAD["double_negation"], A),
+        (DEAD["dedup"], A & B),
+        (DEAD["absorb_or"], A),
+        (DEAD["absorb_and"], A),
+        (DEAD["contradiction"], B),
+        (DEAD["tautology"], B),
+        (DEAD["empty_sets"], B),
+        (A & Pred("true()"), A),
+        (Pred(FALSE).neg(), Pred(TRUE)),
+    ],
+    ids=str,
+)
+def test_dead_structure_is_removed(pred, want):
+    assert simplify(pred.node) == want.node
+
+
+def test_numbers_keep_their_boolean_wrapper():
+    # [2 and true()] is a boolean test; [2] would be a position test
+    path = E("d").any().where(Pred(Num(2)) & Pred(TRUE))
+    assert path.optimize().compile() == "//d[boolean(2)]"
+    assert simplify(Pred(Call("count", (Num(1),))).neg().neg().node) == Call(
+        "boolean", (Call("count", (Num(1),)),)
+    )
+
+
+def test_optimize_is_idempotent():
+    for path in PATHS.values():
+        once = optimize(path.node)
+        assert optimize(once) == once
+
+
+def test_true_filters_are_dropped():
+    assert STAR.any().where(Pred(TRUE)).optimize().compile() == "//*"
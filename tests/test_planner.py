@@ -0,0 +1,83 @@
+import pytest
+
+from xpath_builder import E, Pred, engine, string_value
+from xpath_builder.dialect import LoweringError
+from xpath_builder.expr import And, Or, flatten
+from xpath_builder.native import UnsupportedExpression
+from xpath_builder.planner import DEFAULT_PASS_RATE, Selectivity, cost, plan
+
+from .conftest import PAGE, PATHS, ids, xpath1_select
+
+EXISTS = Pred.attr("id").exists()
+EQUALS = Pred.attr("id").as_str.eq("x")
+CONTAINS = Pred.attr("class").contains.any_of("ad")
+TOKEN = Pred.attr_has_token("class", "ad")
+REGEX = Pred.attr("id").matches().any_of("^v")
+TEXT = string_value().eq("s1")
+QUANTIFIER = Pred.attr("*").has_name.all_of("id", "class")
+LADDER = [EXISTS, EQUALS, CONTAINS, TOKEN, REGEX, TEXT, QUANTIFIER]
+
+MIXED = {
+    "and": TEXT & REGEX & EXISTS,
+    "or": QUANTIFIER | CONTAINS | EQUALS,
+    "nested": (TEXT | TOKEN) & (REGEX | EXISTS) & EQUALS.neg(),
+}
+CASES = {**PATHS, **{name: E("div").any().where(p) for name, p in MIXED.items()}}
+
+
+def test_static_costs_follow_the_ladder():
+    costs = [cost(p.node) for p in LADDER]
+    assert costs == sorted(costs) and len(set(costs)) == len(costs)
+
+
+@pytest.mark.parametrize("kind_", [And, Or])
+def test_operands_are_ordered_cheapest_first(kind_):
+    node = plan(kind_(tuple(p.node for p in reversed(LADDER))))
+    assert flatten(node) == tuple(p.node for p in LADDER)
+
+
+def test_raw_operands_are_barriers():
+    raw = Pred("@guard and number(@id) > 1")
+    node = plan((TEXT & raw & REGEX & EXISTS).node)
+    assert flatten(node) == (TEXT.node, raw.node, EXISTS.node, REGEX.node)
+
+
+def test_sampled_rates_put_the_decisive_test_first(parse):
+    doc = parse(
+        "<r>" + '<div id="a"/>' * 8 + '<div id="a" class="ad"/><div id="b"/></r>'
+    )
+    never = Pred.attr("class").contains.any_of("ad")  # 10%: decisive for and
+    always = Pred.attr("id").exists()  # 100%: decisive for or
+    stats = Selectivity.sample(E("div").any().where(always & never), [doc])
+    assert stats.elements == 10
+    assert stats.rate(always.node) == 1.0 and stats.rate(never.node) == 0.1
+    assert flatten(plan((always & never).node, stats))[0] == never.node
+    assert flatten(plan((never | always).node, stats))[0] == always.node
+    assert Selectivity().rate(always.node) == DEFAULT_PASS_RATE
+
+
+def test_sampling_stops_at_max_elements(parse):
+    doc = parse("<r>" + "<div/><p/>" * 50 + "</r>")
+    path = E("div").any().where(EXISTS & TEXT)
+    assert Selectivity.sample(path, [doc, doc], max_elements=70).elements == 70
+    assert Selectivity.sample(path, [doc]).elements == 50
+    assert Selectivity.sample(path, []) == Selectivity({}, 0)
+
+
+@pytest.mark.parametrize("path", CASES.values(), ids=CASES.keys())
+def test_planned_paths_select_the_same_nodes(kind, parse, reference, path):
+    doc = parse(PAGE)
+    want = ids(reference(doc, path))
+    stats = Selectivity.sample(path, [doc])
+    for planned in (path.plan(), path.plan(stats)):
+        assert ids(reference(doc, planned)) == want
+        assert ids(engine.compile(planned)(doc)) == want
+        try:
+            assert ids(planned.native()(doc)) == want
+        except UnsupportedExpression:
+            pass
+        try:
+            lowered = planned.compile("xpath1")
+        except LoweringError:
+            continue
+        assert ids(xpath1_select(kind, doc, lowered)) == want
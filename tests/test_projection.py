@@ -0,0 +1,95 @@
+import pytest
+
+from xpath_builder import E, Path, Pred
+
+from .conftest import PAGE, PATHS, needs_lxml, parse_as, string_of
+
+VAR = E("div").any().where(Pred("@p = $p"))
+
+
+@pytest.mark.parametrize("path", PATHS.values(), ids=PATHS.keys())
+@pytest.mark.parametrize("attribute", ["@id", "p"])
+def test_attribute_projection_matches_the_reference(parse, reference, path, attribute):
+    doc = parse(PAGE)
+    name = attribute.removeprefix("@")
+    want = [el.get(name) for el in reference(doc, path) if el.get(name) is not None]
+    got = path.project(attribute)(doc)
+    assert got == want
+    assert all(type(value) is str for value in got)
+
+
+@pytest.mark.parametrize("path", PATHS.values(), ids=PATHS.keys())
+def test_text_projection_matches_the_string_values(parse, reference, path):
+    doc = parse(PAGE)
+    got = path.project_text()(doc)
+    assert got == [string_of(el) for el in reference(doc, path)]
+    assert all(type(value) is str for value in got)
+
+
+def test_projection_passes_variables(parse):
+    doc = parse(PAGE)
+    assert VAR.project("@id")(doc, p="10") == ["x"]
+    assert VAR.project_text()(doc, p="nope") == []
+
+
+@pytest.mark.parametrize(
+    "text, want",
+    [
+        ("//div[@p]/@p", ["3", "10", "abc", "5.5"]),
+        ("count(//div)", [str(PAGE.count("<div "))]),
+        ("sum(//div/@p[number(.) = number(.)])", ["18.5"]),
+        ("//div[@id = 'none']/@p = '5.5'", ["true"]),
+        ("string(//b)", ["World"]),
+        # XPath 2.0 spellings on every engine, not libxml2's Infinity
+        ("number(1) div 0", ["INF"]),
+        ("number(-1) div 0", ["-INF"]),
+        ("number('x')", ["NaN"]),
+    ],
+)
+def test_atomic_results_render_as_xpath_strings(parse, text, want):
+    got = Path(text).project_text()(parse(PAGE))
+    assert got == want and all(type(value) is str for value in got)
+
+
+@needs_lxml
+def test_lxml_results_are_not_smart_strings():
+    doc = parse_as("lxml", PAGE)
+    path = E("div").any().where(Pred.attr("p").exists())
+    assert path.evaluator()._route(doc, {}) == "libxml2"
+    for value in path.project("@p")(doc) + path.project_text()(doc):
+        assert type(value) is str and not hasattr(value, "getparent")
+
+
+@pytest.mark.parametrize(
+    "name", ["", "a b", "@", "1x", "a[1]", "x:", "{}href", "{u}a:b", "xlink:href"]
+)
+def test_invalid_attribute_names_are_rejected(name):
+    with pytest.raises(ValueError):
+        E("div").any().project(name)
+
+
+XLINK = "http://www.w3.org/1999/xlink"
+SVG = (
+    f'<svg xmlns:xlink="{XLINK}" xmlns:l="urn:l"><use id="a" xlink:href="#x"/>'
+    '<use id="b" href="#plain"/><use id="c" xml:lang="en" l:href="#other"/></svg>'
+)
+
+
+@pytest.mark.parametrize(
+    "attribute, namespaces, want",
+    [
+        ("@xlink:href", {"xlink": XLINK}, ["#x"]),
+        ("x:href", {"x": XLINK}, ["#x"]),
+        (f"{{{XLINK}}}href", None, ["#x"]),
+        ("@l:href", {"l": "urn:l"}, ["#other"]),
+        ("@href", None, ["#plain"]),
+        ("@xml:lang", None, ["en"]),
+    ],
+)
+def test_namespaced_attributes_resolve_through_the_prefix_map(
+    parse, attribute, namespaces, want
+):
+    doc = parse(SVG)
+    path = E("*").any().where(Pred.attr("id").exists())
+    got = path.project(attribute, namespaces)(doc)
+    assert got == want and all(type(value) is str for value in got)
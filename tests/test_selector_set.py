@@ -0,0 +1,64 @@
+import pytest
+
+from xpath_builder import E, STAR, Pred, SelectorSet
+from xpath_builder.selector_set import scan_shape
+
+from .conftest import PAGE, PATHS, ids
+
+
+def test_one_pass_agrees_with_each_path(parse, reference):
+    doc = parse(PAGE)
+    found = SelectorSet(PATHS).evaluate(doc)
+    assert list(found) == list(PATHS)
+    for name, path in PATHS.items():
+        assert ids(found[name]) == ids(reference(doc, path)), name
+
+
+def test_repeated_evaluation_starts_from_scratch(parse, reference):
+    selectors = SelectorSet(PATHS)
+    selectors.evaluate(parse(PAGE))
+    doc = parse('<r><div id="x" class="ad"/><span/></r>')
+    found = selectors.evaluate(doc)
+    for name, path in PATHS.items():
+        assert ids(found[name]) == ids(reference(doc, path)), name
+
+
+@pytest.mark.parametrize(
+    "path, shape",
+    [
+        (E("a").any(), ("a", 0)),
+        (STAR.any().where(Pred.attr("k").exists()), ("*", 1)),
+        (E("a").any().where(Pred.attr("k").exists()).where(Pred("@j")), ("a", 2)),
+        (E("a").any().first(), None),
+        (E("a").any().child(E("b")), None),
+        (E("a").root(), None),
+    ],
+    ids=lambda v: str(v),
+)
+def test_scan_shape_accepts_only_element_local_descendant_filters(path, shape):
+    found = scan_shape(path.node)
+    assert (None if found is None else (found[0], len(found[1]))) == shape
+
+
+def test_elements_are_checked_only_against_their_tag_and_star(parse):
+    selectors = SelectorSet(
+        {
+            "ads": E("div").any().where(Pred.attr_has_token("class", "ad")),
+            "spans": E("span").any().where(Pred.attr("class").exists()),
+            "ids": STAR.any().where(Pred.attr("id").as_str.eq("x")),
+            "first": E("div").any().first(),  # positional: not scanned
+        }
+    )
+    assert selectors.dispatch_table == {"div": ["ads"], "span": ["spans"], "*": ["ids"]}
+    doc = parse(PAGE)
+    found = selectors.evaluate(doc)
+    assert ids(found["ads"]) == ["vue-1"] and ids(found["spans"]) == ["span"]
+    elements = [el for el in doc.iter() if isinstance(el.tag, str)]
+    divs = sum(el.tag == "div" for el in elements)
+    spans = sum(el.tag == "span" for el in elements)
+    stats = selectors.stats()
+    assert stats.elements == len(elements)
+    assert stats.checks == divs + spans + len(elements)
+    assert stats.skipped == 3 * len(elements) - stats.checks
+    selectors.reset_stats()
+    assert selectors.stats().checks == 0
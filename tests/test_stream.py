@@ -0,0 +1,104 @@
+import io
+
+import pytest
+
+from xpath_builder import E, STAR, Pred
+from xpath_builder.stream import NotStreamable, is_streamable, iter_matches
+
+from .conftest import PAGE, PATHS, ids, needs_lxml
+
+STREAMABLE = {name: path for name, path in PATHS.items() if is_streamable(path)}
+
+
+def _end_order(nodes, root):
+    """Reference results reordered to the stream's end-tag order."""
+    order = {id(el): i for i, el in enumerate(_post_order(root))}
+    return sorted(nodes, key=lambda el: order[id(el)])
+
+
+def _post_order(el):
+    for child in el:
+        if isinstance(child.tag, str):
+            yield from _post_order(child)
+    yield el
+
+
+@pytest.mark.parametrize("path", STREAMABLE.values(), ids=STREAMABLE.keys())
+@pytest.mark.parametrize("clear", [True, False])
+def test_stream_matches_the_in_memory_reference(
+    kind, parse, reference, path, clear
+):
+    doc = parse(PAGE)
+    want = ids(_end_order(reference(doc, path), doc))
+    source = io.BytesIO(PAGE.encode())
+    assert ids(path.stream(source, backend=kind, clear=clear)) == want
+
+
+NESTED = (
+    '<feed><entry id="1" kind="a"><title>Hello</title><entry id="1.1" kind="a">'
+    '<title>Nested hi</title></entry></entry><entry id="2" kind="b"><title>'
+    'World</title></entry><group kind="a"><entry id="3"><title>hi there</title>'
+    "</entry></group></feed>"
+)
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        E("entry").any().where(Pred.text_contains("hi", case_insensitive=True)),
+        E("feed").root().child(E("entry")),
+        E("feed").root().desc(E("title")),
+        E("entry").any().where(Pred.attr("kind").as_str.eq("a")).child(E("title")),
+        E("group").any().where(Pred.attr("kind").exists()).desc(E("title")),
+    ],
+    ids=str,
+)
+def test_nested_candidates_keep_their_subtrees(kind, parse, reference, path):
+    doc = parse(NESTED)
+    want = _end_order(reference(doc, path), doc)
+    got = [
+        (el.get("id") or el.tag, len(list(el.iter())))
+        for el in iter_matches(path, io.BytesIO(NESTED.encode()), backend=kind)
+    ]
+    assert got == [(name, len(list(el.iter()))) for name, el in zip(ids(want), want)]
+
+
+def test_yielded_elements_are_cleared_on_resume(kind):
+    xml = "<r>" + "<d k='1'><e/></d>" * 300 + "</r>"
+    seen = []
+    for el in iter_matches(E("d").any(), io.BytesIO(xml.encode()), backend=kind):
+        assert len(el) == 1 and el.get("k") == "1"
+        seen.append(el)
+    assert len(seen) == 300
+    assert all(len(el) == 0 and not el.attrib for el in seen)
+
+
+@needs_lxml
+def test_finished_siblings_are_detached():
+    xml = "<r>" + "<d><e/></d>" * 300 + "</r>"
+    matches = iter_matches(E("d").any(), io.BytesIO(xml.encode()), backend="lxml")
+    root = next(matches).getparent()
+    assert sum(1 for _ in matches) == 299
+    assert len(root) == 0
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        E("d").any().first(),
+        E("d").any().where(Pred.text_contains("x")).child(E("e")),
+        E("d").curr_desc(),
+        E("d").any().where(Pred("position() = last()")),
+    ],
+    ids=str,
+)
+def test_paths_outside_the_subset_are_rejected(path):
+    assert not is_streamable(path)
+    with pytest.raises(NotStreamable):
+        next(path.stream(io.BytesIO(b"<r/>")))
+
+
+def test_star_paths_stream(kind):
+    path = STAR.any().where(Pred.attr("id").startswith.any_of("1"))
+    got = path.stream(io.BytesIO(NESTED.encode()), backend=kind)
+    assert ids(got) == ["1.1", "1"]
@@ -0,0 +1,61 @@
+import threading
+
+import pytest
+
+from xpath_builder import E, Pred, utils
+
+from .conftest import PATHS, needs_elementpath
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    utils.clear_validation_cache()
+    yield
+    utils.clear_validation_cache()
+
+
+@needs_elementpath
+def test_validation_results_are_cached_both_ways():
+    good = E("a").any().where(Pred.attr("k").exists())
+    good.validate()
+    good.validate()
+    with pytest.raises(SyntaxError):
+        utils.validate_xpath("//a[")
+    with pytest.raises(SyntaxError):
+        utils.validate_xpath("//a[")
+    info = utils._check_xpath.cache_info()
+    assert (info.hits, info.misses) == (2, 2)
+
+
+@needs_elementpath
+def test_validate_many_checks_duplicates_once_in_input_order():
+    results = utils.validate_many(["//b", "//a[", "//b", "//c"])
+    assert list(results) == ["//b", "//a[", "//c"]
+    assert isinstance(results["//a["], SyntaxError)
+    assert results["//b"] is None and results["//c"] is None
+    assert utils._check_xpath.cache_info().misses == 3
+
+
+@needs_elementpath
+def test_a_failed_parse_does_not_poison_the_thread_parser():
+    for _ in range(3):
+        assert utils.validate_many(["//a[", "//a[@b]"])["//a[@b]"] is None
+        utils.clear_validation_cache()
+
+
+@needs_elementpath
+def test_threads_get_their_own_parser():
+    parsers = []
+
+    def validate(n: int) -> None:
+        for path in PATHS.values():
+            # distinct text per thread, so each one parses
+            utils.validate_xpath(f"({path.compile()})[{n}]")
+        parsers.append(utils._local.parser)
+
+    threads = [threading.Thread(target=validate, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len({id(p) for p in parsers}) == 4
@@ -1,3 +1,5 @@
+from typing import TYPE_CHECKING, Any
+
 from xpath_builder.core import (
     Node,
     Path,
@@ -11,6 +13,9 @@ from xpath_builder.core import (
 )
 from xpath_builder.shortcuts import E, STAR, TEXT, COMMENT
 
+if TYPE_CHECKING:
+    from xpath_builder.selector_set import SelectorSet
+
 __all__ = [
     "Ops",
     "Node",
@@ -21,8 +26,18 @@ __all__ = [
     "position_ops",
     "bool_expr",
     "string_value",
+    "SelectorSet",
     "E",
     "STAR",
     "TEXT",
     "COMMENT",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    # SelectorSet pulls in the evaluation engine; import it on first use
+    if name == "SelectorSet":
+        from xpath_builder.selector_set import SelectorSet
+
+        return SelectorSet
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,239 @@
+"""
+Adaptive clause ordering from runtime statistics.
+
+An AdaptivePredicate evaluates the top-level and/or clauses of a predicate
+one by one, counting how often each clause is evaluated and passes and
+timing a sample of the evaluations. Every replan_every calls it re-sorts the
+clauses by observed mean time / chance of deciding the result (the runtime
+counterpart of xpath_builder.planner) and halves the counters, so the
+order follows the workload as it drifts. freeze() pins the current order
+and drops the instrumentation.
+
+Only the first thread to call a predicate counts and re-plans; other
+threads evaluate the current order uninstrumented, so counters never race.
+Give each thread its own copy (SelectorSet.copy()) to adapt in all of them.
+
+    check = compile_adaptive(pred)
+    hits = [el for el in root.iter() if check(el)]
+    check.plan  # current clause order as a Pred-ready expression
+
+SelectorSet(paths, adaptive=True) uses these for its scan checks.
+"""
+
+import threading
+from dataclasses import dataclass
+from threading import get_ident
+from time import perf_counter_ns
+from typing import TYPE_CHECKING, Any, Callable, Sequence
+
+from xpath_builder import engine, native
+from xpath_builder.expr import And, Expr, Or, as_expr, flatten
+from xpath_builder.planner import DEFAULT_PASS_RATE, cost
+
+if TYPE_CHECKING:
+    from xpath_builder.core import Pred
+
+DEFAULT_REPLAN_EVERY = 1024
+DEFAULT_SAMPLE_EVERY = 16
+
+Check = Callable[[Any], bool]
+
+
+@dataclass(frozen=True)
+class ClauseStats:
+    """
+    Decayed counters for one clause.
+    - evaluations / passes: how often it ran, and was true
+    - mean_ns: mean time per evaluation over the timed sample (None: untimed)
+    """
+
+    text: str
+    evaluations: float
+    passes: float
+    mean_ns: float | None
+
+    @property
+    def pass_rate(self) -> float:
+        if not self.evaluations:
+            return DEFAULT_PASS_RATE
+        return self.passes / self.evaluations
+
+
+class _Clause:
+    __slots__ = ("node", "fn", "evaluations", "passes", "timed", "ns")
+
+    def __init__(self, node: Expr, fn: Check) -> None:
+        self.node = node
+        self.fn = fn
+        self.evaluations = 0.0
+        self.passes = 0.0
+        self.timed = 0.0
+        self.ns = 0.0
+
+
+def compile_clause(node: Expr) -> tuple[Check, bool] | None:
+    """
+    (check, lxml_only) for one element: native when possible, else a libxml2
+    boolean() test (lxml trees only); None if neither applies.
+    """
+    try:
+        return native.compile_pred(node), False
+    except native.UnsupportedExpression:
+        pass
+    ev = engine.compile_test(node)
+    if ev.backend != "lxml":
+        return None
+    return ev.test, True
+
+
+class AdaptivePredicate:
+    """
+    A predicate whose and/or clause order is re-planned from observed
+    pass rates and timings. Call it with an element.
+    """
+
+    def __init__(
+        self,
+        node: Expr,
+        checks: Sequence[Check],
+        *,
+        replan_every: int = DEFAULT_REPLAN_EVERY,
+        sample_every: int = DEFAULT_SAMPLE_EVERY,
+        lxml_only: bool = False,
+    ) -> None:
+        if replan_every < 1 or sample_every < 1:
+            raise ValueError("replan_every and sample_every must be >= 1")
+        operands = flatten(node)
+        if len(operands) != len(checks):
+            raise ValueError("one check per and/or operand expected")
+        self.node = node
+        self.conjunction = not isinstance(node, Or)
+        self.replan_every = replan_every
+        self.sample_every = sample_every
+        self.lxml_only = lxml_only  # some clause runs in libxml2
+        self._order = tuple(_Clause(n, fn) for n, fn in zip(operands, checks))
+        self._calls = 0
+        self._frozen = False
+        self._owner: int | None = None  # the thread that instruments
+        self._lock = threading.Lock()
+
+    def _claim(self) -> bool:
+        """Make the calling thread the instrumenting one, unless there is one."""
+        if self._owner is not None:
+            return False
+        with self._lock:
+            if self._owner is None:
+                self._owner = get_ident()
+            return self._owner == get_ident()
+
+    def __call__(self, el: Any) -> bool:
+        conj = self.conjunction
+        if self._frozen or (self._owner != get_ident() and not self._claim()):
+            for c in self._order:
+                if bool(c.fn(el)) is not conj:
+                    return not conj
+            return conj
+        self._calls = calls = self._calls + 1
+        if calls % self.replan_every == 0:
+            self.replan()
+        timed = calls % self.sample_every == 0
+        for c in self._order:
+            if timed:
+                t0 = perf_counter_ns()
+                r = bool(c.fn(el))
+                c.ns += perf_counter_ns() - t0
+                c.timed += 1
+            else:
+                r = bool(c.fn(el))
+            c.evaluations += 1
+            if r:
+                c.passes += 1
+            if r is not conj:
+                return r
+        return conj
+
+    @property
+    def frozen(self) -> bool:
+        return self._frozen
+
+    def freeze(self, frozen: bool = True) -> None:
+        """Pin (or with frozen=False, release) the current clause order."""
+        self._frozen = frozen
+
+    @property
+    def plan(self) -> Expr:
+        """The clauses in their current evaluation order."""
+        nodes = tuple(c.node for c in self._order)
+        if len(nodes) == 1:
+            return nodes[0]
+        return And(nodes) if self.conjunction else Or(nodes)
+
+    def stats(self) -> list[ClauseStats]:
+        """Counters per clause, in current evaluation order."""
+        return [
+            ClauseStats(
+                c.node.text,
+                c.evaluations,
+                c.passes,
+                c.ns / c.timed if c.timed else None,
+            )
+            for c in self._order
+        ]
+
+    def replan(self) -> None:
+        """Re-sort clauses by expected work from the counters, then decay them."""
+        with self._lock:
+            clauses = self._order
+            # ns per static cost unit, to price clauses that were never timed;
+            # with no timings at all the static costs alone set the scale
+            timed = [(c.ns / c.timed, cost(c.node)) for c in clauses if c.timed]
+            unit = (
+                sum(ns for ns, _ in timed) / max(sum(k for _, k in timed), 1e-9)
+                if timed
+                else 1.0
+            )
+
+            def rank(c: _Clause) -> float:
+                mean = c.ns / c.timed if c.timed else cost(c.node) * unit
+                rate = (
+                    c.passes / c.evaluations if c.evaluations else DEFAULT_PASS_RATE
+                )
+                decisive = 1 - rate if self.conjunction else rate
+                return mean / max(decisive, 1e-6)
+
+            order = tuple(sorted(clauses, key=rank))
+            for c in order:
+                c.evaluations /= 2
+                c.passes /= 2
+                c.timed /= 2
+                c.ns /= 2
+            self._order = order
+
+
+def compile_adaptive(
+    pred: "Pred | Expr | str",
+    *,
+    replan_every: int = DEFAULT_REPLAN_EVERY,
+    sample_every: int = DEFAULT_SAMPLE_EVERY,
+) -> AdaptivePredicate:
+    """
+    AdaptivePredicate over the top-level and/or clauses of pred. Raises
+    native.UnsupportedExpression if a clause compiles neither natively nor
+    to libxml2 (which in turn only runs on lxml trees).
+    """
+    node = as_expr(getattr(pred, "node", pred))
+    checks = []
+    lxml_only = False
+    for clause in flatten(node):
+        compiled = compile_clause(clause)
+        if compiled is None:
+            raise native.UnsupportedExpression(f"no per-element check for {clause}")
+        checks.append(compiled[0])
+        lxml_only = lxml_only or compiled[1]
+    return AdaptivePredicate(
+        node,
+        checks,
+        replan_every=replan_every,
+        sample_every=sample_every,
+        lxml_only=lxml_only,
+    )
@@ -0,0 +1,180 @@
+"""
+asyncio front end: parse and evaluate off the event loop.
+
+    found = await path.aevaluate(page_bytes, parser="html")
+    async for found in selectors.astream(pages, parser="html"):
+        found["ads"]  # SelectorSet.evaluate() result, one per page, in order
+
+Documents (parsed trees, or bytes / str / os.PathLike / file objects to
+parse) are handled on a shared thread pool, so the loop keeps serving I/O
+while pages are matched. Each pool thread evaluates through its own
+evaluator cache (engine.thread_cache()) and its own SelectorSet.copy(),
+since lxml XPath objects must not be shared between threads.
+
+At most `limit` jobs per event loop are in flight (default: twice the
+pool's threads); further callers wait for a slot, and astream pulls the
+next document only when one is free, so an endless crawl streams through in
+bounded memory. A slot is held until its job has finished on the pool, not
+just until its caller gives up. Cancelling an awaiting task withdraws its
+job if it has not started; closing astream cancels the jobs it has queued.
+"""
+
+import asyncio
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    Iterable,
+    TypeVar,
+)
+from weakref import WeakKeyDictionary
+
+from xpath_builder import engine
+from xpath_builder.batch import Parser, document_parser
+
+if TYPE_CHECKING:
+    from xpath_builder.core import Path
+    from xpath_builder.selector_set import SelectorSet
+
+T = TypeVar("T")
+
+_lock = threading.Lock()
+_pool: ThreadPoolExecutor | None = None
+_workers = min(32, (os.cpu_count() or 1) + 4)
+_limit = 2 * _workers
+_slots: "WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    WeakKeyDictionary()
+)
+_thread = threading.local()
+
+
+def configure(*, workers: int | None = None, limit: int | None = None) -> None:
+    """
+    Size the shared pool (threads) and the per-loop in-flight limit. A new
+    pool is started on next use; the old one finishes its jobs first.
+    """
+    global _pool, _workers, _limit
+    if workers is not None and workers < 1:
+        raise ValueError("workers must be >= 1")
+    if limit is not None and limit < 1:
+        raise ValueError("limit must be >= 1")
+    with _lock:
+        old, _pool = _pool, None
+        if workers is not None:
+            _workers = workers
+        _limit = limit if limit is not None else 2 * _workers
+        _slots.clear()
+    if old is not None:
+        old.shutdown(wait=False)
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(_workers, thread_name_prefix="xpath_builder")
+        return _pool
+
+
+def _loop_slots(loop: asyncio.AbstractEventLoop) -> asyncio.Semaphore:
+    slots = _slots.get(loop)
+    if slots is None:
+        slots = _slots[loop] = asyncio.Semaphore(_limit)
+    return slots
+
+
+def _release(loop: asyncio.AbstractEventLoop, slots: asyncio.Semaphore) -> None:
+    try:
+        loop.call_soon_threadsafe(slots.release)
+    except RuntimeError:  # the loop is closed; nobody is waiting on it
+        pass
+
+
+def _in_thread(fn: Callable[..., T], *args: Any) -> T:
+    engine.thread_cache()
+    return fn(*args)
+
+
+async def run(fn: Callable[..., T], *args: Any) -> T:
+    """fn(*args) on the shared pool, once a slot of this loop is free."""
+    loop = asyncio.get_running_loop()
+    slots = _loop_slots(loop)
+    await slots.acquire()
+    try:
+        job = _executor().submit(_in_thread, fn, *args)
+    except BaseException:
+        slots.release()
+        raise
+    job.add_done_callback(lambda _: _release(loop, slots))
+    return await asyncio.wrap_future(job, loop=loop)
+
+
+def _parse(doc: Any, kind: Parser) -> Any:
+    if not isinstance(doc, (bytes, str, os.PathLike)) and not hasattr(doc, "read"):
+        return doc  # already a tree or element
+    parsers = _thread.__dict__.setdefault("parsers", {})
+    parse = parsers.get(kind)
+    if parse is None:
+        parse = parsers[kind] = document_parser(kind)
+    return parse(doc)
+
+
+def _evaluate(path: "Path", doc: Any, kind: Parser, variables: dict) -> Any:
+    return path.evaluator()(_parse(doc, kind), **variables)
+
+
+def _select(selectors: "SelectorSet", doc: Any, kind: Parser) -> Any:
+    copies = _thread.__dict__.setdefault("selectors", WeakKeyDictionary())
+    own = copies.get(selectors)
+    if own is None:
+        own = copies[selectors] = selectors.copy()
+    return own.evaluate(_parse(doc, kind))
+
+
+async def evaluate(
+    path: "Path", doc: Any, *, parser: Parser = "xml", **variables: Any
+) -> Any:
+    """path.evaluator()(doc, **variables), parsing doc first if needed."""
+    return await run(_evaluate, path, doc, parser, variables)
+
+
+async def _documents(source: Iterable[Any] | AsyncIterable[Any]) -> AsyncIterator:
+    if isinstance(source, AsyncIterable):
+        async for doc in source:
+            yield doc
+    else:
+        for doc in source:
+            yield doc
+
+
+async def stream(
+    selectors: "SelectorSet",
+    documents: Iterable[Any] | AsyncIterable[Any],
+    *,
+    parser: Parser = "xml",
+) -> AsyncIterator[dict[str, list[Any]]]:
+    """
+    selectors.evaluate() of each document, in input order. Up to the
+    in-flight limit of documents are matched ahead of the consumer.
+    """
+    pending: deque[asyncio.Task] = deque()
+    window = _limit
+    try:
+        async for doc in _documents(documents):
+            pending.append(asyncio.ensure_future(run(_select, selectors, doc, parser)))
+            if len(pending) >= window:
+                yield await pending.popleft()
+        while pending:
+            yield await pending.popleft()
+    finally:
+        for task in pending:
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()  # retrieved, so a failure is not logged
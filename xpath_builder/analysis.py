@@ -0,0 +1,142 @@
+"""
+Static capability report for an expression tree.
+
+    report = path.analyze()
+    report.streamable, report.xpath1, report.native, report.uses_regex, ...
+    report.as_dict()  # JSON-ready
+    report.reasons    # {capability: why it is missing}
+
+The engine reads it to route a selector: libxml2 when it lowers to XPath 1.0,
+the native closures when the tree is not lxml (or when they have a
+multi-needle matcher libxml2 lacks), elementpath otherwise, and iterparse
+streaming (xpath_builder.stream) when it is streamable.
+"""
+
+from dataclasses import asdict, dataclass, field
+from typing import Any, Literal
+
+from xpath_builder import native, stream
+from xpath_builder.dialect import LoweringError, lower
+from xpath_builder.expr import Call, Context, Expr, Filter, Num, Quantified, Raw, walk
+
+Route = Literal["lxml", "native", "elementpath"]
+
+_REGEX_FUNCTIONS = frozenset({"matches", "replace", "tokenize"})
+# functions that read the string-value of their argument, or of . when called
+# without one
+_TEXT_FUNCTIONS = frozenset({"string", "normalize-space", "string-length", "number"})
+_RAW_REGEX = ("matches(", "replace(", "tokenize(")
+_RAW_QUANTIFIERS = ("some $", "every $")
+_RAW_TEXT = ("string(", "normalize-space(", "string-length(", "text()", ".//")
+_RAW_POSITIONAL = ("position()", "last()")
+
+
+@dataclass(frozen=True)
+class Analysis:
+    """
+    What an expression needs and which engines can run it.
+    - streamable: runs over iterparse events (xpath_builder.stream)
+    - xpath1: lowers to XPath 1.0, so libxml2 can run it
+    - native: compiles to Python closures (xpath_builder.native)
+    - uses_regex: contains matches()/replace()/tokenize()
+    - uses_quantifiers: contains some/every
+    - needs_string_value: reads the text of a whole subtree (string(.) and co.)
+    - positional: a predicate depends on position() or last()
+    - multi_match: has a contains() disjunction large enough for the native
+      Aho-Corasick matcher (native.MULTI_MATCH_MIN needles on one operand)
+    """
+
+    streamable: bool
+    xpath1: bool
+    native: bool
+    uses_regex: bool
+    uses_quantifiers: bool
+    needs_string_value: bool
+    positional: bool
+    multi_match: bool = False
+    reasons: dict[str, str] = field(default_factory=dict)
+
+    def route(self, lxml_tree: bool) -> Route:
+        """The fastest in-memory engine for a tree of the given kind."""
+        if lxml_tree and self.xpath1 and not (self.native and self.multi_match):
+            return "lxml"
+        if self.native:
+            return "native"
+        return "elementpath"
+
+    def as_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+def _raw_has(e: Raw, needles: tuple[str, ...]) -> bool:
+    return any(n in e.value for n in needles)
+
+
+def _is_text_read(e: Expr) -> bool:
+    if isinstance(e, Context):
+        return True
+    if isinstance(e, Call):
+        return e.name in _TEXT_FUNCTIONS and (
+            not e.args or isinstance(e.args[0], Context)
+        )
+    return isinstance(e, Raw) and _raw_has(e, _RAW_TEXT)
+
+
+def _is_positional(e: Expr) -> bool:
+    for f in walk(e):
+        if not isinstance(f, Filter):
+            continue
+        if isinstance(f.pred, Num):
+            return True
+        for n in walk(f.pred):
+            if isinstance(n, Call) and n.name in ("position", "last"):
+                return True
+            if isinstance(n, Raw) and _raw_has(n, _RAW_POSITIONAL):
+                return True
+    return False
+
+
+def analyze(root: Expr) -> Analysis:
+    """Capability report for root; memoized on the node."""
+    cached = root.__dict__.get("_analysis")
+    if cached is not None:
+        return cached
+
+    uses_regex = uses_quantifiers = needs_string_value = False
+    for e in walk(root):
+        if isinstance(e, Call) and e.name in _REGEX_FUNCTIONS:
+            uses_regex = True
+        elif isinstance(e, Quantified):
+            uses_quantifiers = True
+        elif isinstance(e, Raw):
+            uses_regex = uses_regex or _raw_has(e, _RAW_REGEX)
+            uses_quantifiers = uses_quantifiers or _raw_has(e, _RAW_QUANTIFIERS)
+        needs_string_value = needs_string_value or _is_text_read(e)
+
+    reasons: dict[str, str] = {}
+    try:
+        lower(root, "xpath1")
+    except LoweringError as exc:
+        reasons["xpath1"] = str(exc)
+    try:
+        native.compile_path(root)
+    except native.UnsupportedExpression as exc:
+        reasons["native"] = str(exc)
+    try:
+        stream.stream_steps(root)
+    except stream.NotStreamable as exc:
+        reasons["streamable"] = str(exc)
+
+    result = Analysis(
+        streamable="streamable" not in reasons,
+        xpath1="xpath1" not in reasons,
+        native="native" not in reasons,
+        uses_regex=uses_regex,
+        uses_quantifiers=uses_quantifiers,
+        needs_string_value=needs_string_value,
+        positional=_is_positional(root),
+        multi_match=native.uses_multi_match(root),
+        reasons=reasons,
+    )
+    object.__setattr__(root, "_analysis", result)
+    return result
@@ -0,0 +1,210 @@
+"""
+Per-document attribute index for class-token, id-prefix and attribute lookups.
+
+    cache = DocumentCache(indexed=True)
+    with document_cache(cache):
+        for path in paths:
+            path.native()(doc)  # //div[token test] etc. answered by lookup
+
+An AttributeIndex is built lazily over one document: on first use a single
+walk records which elements carry which attribute names; token -> elements
+maps (for TokenTest) and sorted value lists (for =, starts-with) are built
+per attribute the first time a predicate asks for them, then shared by every
+selector run in the same document_cache scope. lookup(pred) plans the query:
+it returns a superset of the elements pred can hold for, in document order,
+and the engine runs the full predicate on those candidates only.
+"""
+
+import re
+from bisect import bisect_left, bisect_right
+from typing import Any, Callable
+
+from xpath_builder.expr import (
+    And,
+    Attr,
+    Call,
+    Compare,
+    Expr,
+    Or,
+    Seq,
+    Str,
+    TokenTest,
+    flatten,
+)
+
+_WS = re.compile(r"[ \t\r\n]+")
+_NAME = re.compile(r"^[A-Za-z_][\w.-]*$")
+
+Lookup = Callable[["AttributeIndex"], list[Any]]
+
+
+class AttributeIndex:
+    """
+    Attribute name, token and value index over the elements under root
+    (root included). Results are lists of elements in document order.
+    """
+
+    def __init__(self, root: Any) -> None:
+        self.root = root
+        self._position: dict[Any, int] = {}
+        self._names: dict[str, list[Any]] | None = None
+        self._tokens: dict[tuple[str, bool], dict[str, list[Any]]] = {}
+        self._sorted: dict[tuple[str, bool], tuple[list[str], list[Any]]] = {}
+
+    def __len__(self) -> int:
+        """Number of elements indexed."""
+        self._by_name()
+        return len(self._position)
+
+    def _by_name(self) -> dict[str, list[Any]]:
+        if self._names is None:
+            names: dict[str, list[Any]] = {}
+            position = self._position
+            for i, el in enumerate(self.root.iter()):
+                if not isinstance(el.tag, str):
+                    continue
+                position[el] = i
+                for name in el.keys():
+                    names.setdefault(name, []).append(el)
+            self._names = names
+        return self._names
+
+    def with_attribute(self, name: str) -> list[Any]:
+        """Elements that have @name."""
+        return self._by_name().get(name, [])
+
+    def with_tokens(self, attr: str, tokens: Any, ci: bool = False) -> list[Any]:
+        """Elements whose @attr lists any of tokens (lower-case them if ci)."""
+        key = (attr, ci)
+        table = self._tokens.get(key)
+        if table is None:
+            table = {}
+            for el in self.with_attribute(attr):
+                value = el.get(attr)
+                for token in set(_WS.split(value.lower() if ci else value)):
+                    if token:
+                        table.setdefault(token, []).append(el)
+            self._tokens[key] = table
+        return self.union([table.get(t, []) for t in tokens])
+
+    def _values(self, attr: str, ci: bool) -> tuple[list[str], list[Any]]:
+        key = (attr, ci)
+        pair = self._sorted.get(key)
+        if pair is None:
+            position = self._position
+            rows = sorted(
+                (el.get(attr).lower() if ci else el.get(attr), position[el], el)
+                for el in self.with_attribute(attr)
+            )
+            pair = self._sorted[key] = (
+                [v for v, _, _ in rows],
+                [el for _, _, el in rows],
+            )
+        return pair
+
+    def with_values(self, attr: str, values: Any, ci: bool = False) -> list[Any]:
+        """Elements whose @attr (lower-cased if ci) equals one of values."""
+        keys, elements = self._values(attr, ci)
+        found: list[Any] = []
+        for v in values:
+            found.extend(elements[bisect_left(keys, v) : bisect_right(keys, v)])
+        return self._ordered(found)
+
+    def with_prefixes(self, attr: str, prefixes: Any, ci: bool = False) -> list[Any]:
+        """Elements whose @attr (lower-cased if ci) starts with one of prefixes."""
+        if "" in prefixes:
+            return self.with_attribute(attr)
+        keys, elements = self._values(attr, ci)
+        found: list[Any] = []
+        for p in prefixes:
+            i = bisect_left(keys, p)
+            while i < len(keys) and keys[i].startswith(p):
+                found.append(elements[i])
+                i += 1
+        return self._ordered(found)
+
+    def _ordered(self, found: list[Any]) -> list[Any]:
+        position = self._position
+        return sorted(set(found), key=position.__getitem__)
+
+    def union(self, lists: list[list[Any]]) -> list[Any]:
+        """Merge document-ordered element lists."""
+        lists = [x for x in lists if x]
+        if len(lists) <= 1:
+            return lists[0] if lists else []
+        return self._ordered([el for x in lists for el in x])
+
+
+# ----- query planning -----
+
+
+def _attr_operand(e: Expr) -> tuple[str, bool] | None:
+    """(name, ci) for @name or lower-case(@name)."""
+    ci = False
+    if isinstance(e, Call) and e.name == "lower-case" and len(e.args) == 1:
+        e, ci = e.args[0], True
+    if isinstance(e, Attr) and _NAME.match(e.name):
+        return e.name, ci
+    return None
+
+
+def _strings(e: Expr) -> tuple[str, ...] | None:
+    if isinstance(e, Str):
+        return (e.value,)
+    if isinstance(e, Seq) and all(isinstance(i, Str) for i in e.items):
+        return tuple(i.value for i in e.items)  # type: ignore[attr-defined]
+    return None
+
+
+def _compare_lookup(e: Compare) -> Lookup | None:
+    if e.op != "=":
+        return None
+    for lhs, rhs in ((e.lhs, e.rhs), (e.rhs, e.lhs)):
+        attr, values = _attr_operand(lhs), _strings(rhs)
+        if attr is not None and values is not None:
+            name, ci = attr
+            if ci and "" in values:
+                return None  # lower-case(@a) is '' where @a is missing too
+            return lambda ix: ix.with_values(name, values, ci)
+    return None
+
+
+def lookup(pred: Expr) -> Lookup | None:
+    """
+    Index query for pred: fn(index) -> document-ordered superset of the
+    elements pred is true for. None if pred has no indexable form.
+    """
+    if isinstance(pred, TokenTest) and _NAME.match(pred.attr):
+        attr, ci = pred.attr, pred.ci
+        # 'a b' holds only where 'a' is a token; '' holds without the attribute
+        words = [[w for w in _WS.split(t) if w] for t in pred.tokens]
+        if not all(words):
+            return None
+        tokens = tuple(w[0].lower() if ci else w[0] for w in words)
+        return lambda ix: ix.with_tokens(attr, tokens, ci)
+    if isinstance(pred, Attr) and _NAME.match(pred.name):
+        name = pred.name
+        return lambda ix: ix.with_attribute(name)
+    if isinstance(pred, Compare):
+        return _compare_lookup(pred)
+    if isinstance(pred, Call) and pred.name == "starts-with" and len(pred.args) == 2:
+        attr, prefix = _attr_operand(pred.args[0]), pred.args[1]
+        # starts-with(@a, '') holds where @a is missing too: no index bound
+        if attr is not None and isinstance(prefix, Str) and prefix.value:
+            name, ci = attr
+            return lambda ix: ix.with_prefixes(name, (prefix.value,), ci)
+        return None
+    if isinstance(pred, And):
+        found = [f for op in flatten(pred) if (f := lookup(op)) is not None]
+        if not found:
+            return None
+        if len(found) == 1:
+            return found[0]
+        # any one conjunct bounds the result: take the smallest
+        return lambda ix: min((f(ix) for f in found), key=len)
+    if isinstance(pred, Or):
+        parts = [lookup(op) for op in flatten(pred)]
+        if any(f is None for f in parts):
+            return None
+        return lambda ix: ix.union([f(ix) for f in parts])  # type: ignore[misc]
+    return None
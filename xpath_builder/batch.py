@@ -0,0 +1,289 @@
+"""
+Run one set of selectors over many documents on a process pool.
+
+    selectors = {"ads": ad_selector, "svg": svg_selector}
+    for r in batch.run(selectors, pages, workers=8):
+        r.index, r.matches  # {"ads": 3, "svg": 0}
+
+The selectors are sent to each worker once, through the pool initializer,
+and compiled there into a SelectorSet. Documents (bytes, str, or a path to
+read in the worker) travel in chunks of chunksize, are parsed and
+evaluated in the workers, and only compact results come back: match counts,
+node paths (/html/body/div[3]) or attribute values, never elements. At most
+a few chunks per worker are in flight, so an endless crawl streams through
+in bounded memory; results are yielded in input order.
+
+executor="thread" runs the workers as threads instead, which skips pickling
+documents and results and, on a free-threaded (no-GIL) build, evaluates in
+parallel. Each thread compiles its own SelectorSet into its own evaluator
+cache (engine.thread_cache()), since lxml XPath objects must not be shared
+between threads. The default is "process"; executor="auto" opts in to
+threads when the GIL is off (benchmarks/thread_pool.py measures whether
+that pays on a given machine).
+"""
+
+import os
+import sys
+import threading
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice
+from multiprocessing.context import BaseContext
+from typing import Any, Callable, Iterable, Iterator, Literal, Mapping
+
+from xpath_builder import engine
+from xpath_builder.adaptive import DEFAULT_REPLAN_EVERY
+from xpath_builder.core import Path
+from xpath_builder.selector_set import SelectorSet
+from xpath_builder.utils import lxml_etree
+
+Output = Literal["count", "xpath", "attribute"]
+Parser = Literal["xml", "html"]
+ExecutorKind = Literal["auto", "process", "thread"]
+
+DEFAULT_CHUNKSIZE = 32
+_IN_FLIGHT_PER_WORKER = 2  # chunks queued per worker
+
+
+@dataclass(frozen=True)
+class DocumentResult:
+    """
+    Outcome for one document.
+    - index: position of the document in the input
+    - matches: {selector name: count | [node paths] | [attribute values]}
+    - error: "ExceptionType: message" if parsing or evaluation failed
+      (matches is empty then)
+    """
+
+    index: int
+    matches: dict[str, Any] = field(default_factory=dict)
+    error: str | None = None
+
+
+@dataclass(frozen=True)
+class _Spec:
+    paths: dict[str, Path]
+    indexed: bool
+    adaptive: bool
+    replan_every: int
+    output: Output
+    attribute: str | None
+    parser: Parser
+
+
+def _spec(
+    paths: Mapping[str, Path] | SelectorSet,
+    output: Output,
+    attribute: str | None,
+    parser: Parser,
+) -> _Spec:
+    if isinstance(paths, SelectorSet):
+        # the options SelectorSet.copy() keeps
+        return _Spec(
+            paths.paths,
+            paths.indexed,
+            paths.adaptive,
+            paths.replan_every,
+            output,
+            attribute,
+            parser,
+        )
+    return _Spec(
+        dict(paths), False, False, DEFAULT_REPLAN_EVERY, output, attribute, parser
+    )
+
+
+def _read(doc: Any) -> bytes:
+    if isinstance(doc, bytes):
+        return doc
+    if isinstance(doc, str):
+        return doc.encode("utf-8")
+    if isinstance(doc, os.PathLike):
+        with open(doc, "rb") as f:
+            return f.read()
+    if hasattr(doc, "read"):
+        return doc.read()
+    raise TypeError(f"cannot read a document from {type(doc).__name__}")
+
+
+def document_parser(kind: Parser = "xml") -> Callable[[Any], Any]:
+    """
+    fn(doc) -> root element for bytes, str, os.PathLike or file-object
+    documents, with lxml ("xml" or "html") or xml.etree ("xml" only).
+    """
+    etree = lxml_etree()
+    if etree is None:
+        if kind == "html":
+            raise ImportError("HTML parsing needs lxml (pip install lxml)")
+        import xml.etree.ElementTree as ET
+
+        return lambda doc: ET.fromstring(_read(doc))
+    parser = etree.HTMLParser() if kind == "html" else etree.XMLParser()
+
+    def parse(doc: Any) -> Any:
+        root = etree.fromstring(_read(doc), parser)
+        if root is None:
+            raise ValueError("empty document")
+        return root
+
+    return parse
+
+
+def _element_path(el: Any, parents: dict[Any, Any]) -> str:
+    """lxml-style /a/b[2]/c path of an xml.etree element."""
+    steps: list[str] = []
+    while True:
+        parent = parents.get(el)
+        if parent is None:
+            steps.append(f"/{el.tag}")
+            break
+        same = [c for c in parent if c.tag == el.tag]
+        n = same.index(el) + 1
+        steps.append(f"/{el.tag}[{n}]" if len(same) > 1 else f"/{el.tag}")
+        el = parent
+    return "".join(reversed(steps))
+
+
+class _Worker:
+    def __init__(self, spec: _Spec) -> None:
+        self.selectors = SelectorSet(
+            spec.paths,
+            adaptive=spec.adaptive,
+            replan_every=spec.replan_every,
+            indexed=spec.indexed,
+        )
+        self.parse = document_parser(spec.parser)
+        self.output = spec.output
+        self.attribute = spec.attribute or ""
+
+    def process(self, index: int, doc: Any) -> DocumentResult:
+        try:
+            root = self.parse(doc)
+            found = self.selectors.evaluate(root)
+            return DocumentResult(index, self._compact(root, found))
+        except Exception as exc:
+            return DocumentResult(index, {}, f"{type(exc).__name__}: {exc}")
+
+    def _compact(self, root: Any, found: dict[str, list[Any]]) -> dict[str, Any]:
+        if self.output == "count":
+            return {name: len(items) for name, items in found.items()}
+        if self.output == "attribute":
+            attr = self.attribute
+            return {
+                name: [v for item in items if (v := _attribute(item, attr)) is not None]
+                for name, items in found.items()
+            }
+        path = _path_function(root)
+        return {name: [path(item) for item in items] for name, items in found.items()}
+
+
+def _path_function(root: Any) -> Callable[[Any], str]:
+    if hasattr(root, "getroottree"):
+        getpath = root.getroottree().getpath
+    else:
+        parents = {c: p for p in root.iter() for c in p}
+
+        def getpath(el: Any) -> str:
+            return _element_path(el, parents)
+
+    return lambda item: getpath(item) if hasattr(item, "tag") else str(item)
+
+
+def _attribute(item: Any, name: str) -> str | None:
+    if hasattr(item, "get"):
+        value = item.get(name)
+        return None if value is None else str(value)
+    return str(item)  # an attribute or string result already
+
+
+_worker: _Worker | None = None
+_thread = threading.local()
+
+
+def _init(spec: _Spec) -> None:
+    global _worker
+    _worker = _Worker(spec)
+
+
+def _init_thread(spec: _Spec) -> None:
+    engine.thread_cache()
+    _thread.worker = _Worker(spec)
+
+
+def _process_chunk(chunk: list[tuple[int, Any]]) -> list[DocumentResult]:
+    worker = getattr(_thread, "worker", None) or _worker
+    assert worker is not None, "worker not initialized"
+    return [worker.process(i, doc) for i, doc in chunk]
+
+
+def gil_enabled() -> bool:
+    """False on a free-threaded build running without the GIL."""
+    check = getattr(sys, "_is_gil_enabled", None)
+    return True if check is None else check()
+
+
+def run(
+    paths: Mapping[str, Path] | SelectorSet,
+    documents: Iterable[Any],
+    *,
+    workers: int | None = None,
+    output: Output = "count",
+    attribute: str | None = None,
+    parser: Parser = "xml",
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    executor: ExecutorKind = "process",
+    mp_context: BaseContext | None = None,
+) -> Iterator[DocumentResult]:
+    """
+    Evaluate paths on every document, yielding a DocumentResult per document
+    in input order.
+    - paths: {name: Path}, or a SelectorSet, whose options (indexed,
+      adaptive, replan_every) the workers' SelectorSets keep
+    - documents: bytes or str content (str is encoded as UTF-8), os.PathLike
+      file names, or binary file objects
+    - workers: processes (default: CPU count); 0 runs in this process
+    - output: "count", "xpath" (node paths) or "attribute" (values of
+      attribute= on the matched elements)
+    - parser: "xml", or "html" (lxml's forgiving HTML parser)
+    - executor: "process" (default), "thread", or "auto" (threads when the
+      GIL is off, else processes)
+    - mp_context: multiprocessing context of the process pool, e.g.
+      multiprocessing.get_context("spawn"); the selectors are pickled to
+      each worker
+    """
+    if output == "attribute" and not attribute:
+        raise ValueError('output="attribute" needs attribute=')
+    if chunksize < 1:
+        raise ValueError("chunksize must be >= 1")
+    if executor not in ("auto", "process", "thread"):
+        raise ValueError(f"Unknown executor: {executor!r}")
+    spec = _spec(paths, output, attribute, parser)
+    items = enumerate(documents)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1:
+        worker = _Worker(spec)
+        for i, doc in items:
+            yield worker.process(i, doc)
+        return
+
+    if executor == "auto":
+        executor = "process" if gil_enabled() else "thread"
+    pool: Executor
+    if executor == "thread":
+        pool = ThreadPoolExecutor(workers, initializer=_init_thread, initargs=(spec,))
+    else:
+        pool = ProcessPoolExecutor(
+            workers, mp_context=mp_context, initializer=_init, initargs=(spec,)
+        )
+    pending: deque[Future[list[DocumentResult]]] = deque()
+    try:
+        while chunk := list(islice(items, chunksize)):
+            pending.append(pool.submit(_process_chunk, chunk))
+            if len(pending) >= workers * _IN_FLIGHT_PER_WORKER:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
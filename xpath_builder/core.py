@@ -1,9 +1,42 @@
+import re
 from dataclasses import dataclass
 from typing import Protocol, runtime_checkable
 
-from typing import Callable, Literal
-
-from xpath_builder.utils import quote, re_escape_xsd, validate_xpath
+from typing import TYPE_CHECKING, Any, Callable, Iterator, Literal, Mapping
+
+from xpath_builder.expr import (
+    FALSE,
+    TRUE,
+    And,
+    Attr,
+    Call,
+    Compare,
+    Context,
+    Expr,
+    Filter,
+    Not,
+    Num,
+    Or,
+    Quantified,
+    Raw,
+    Seq,
+    Step,
+    Str,
+    TokenTest,
+    Union,
+    Var,
+    as_expr,
+    hoist_quantifier,
+    render,
+)
+from xpath_builder.utils import validate_xpath
+
+if TYPE_CHECKING:
+    from xpath_builder.analysis import Analysis
+    from xpath_builder.dialect import Dialect
+    from xpath_builder.engine import Evaluator
+    from xpath_builder.native import CompiledPath
+    from xpath_builder.planner import Selectivity
 
 
 @dataclass(frozen=True)
@@ -12,15 +45,22 @@ class Ops[T]:
     Generic comparator builder for an XPath LHS.
     - lhs: the left-hand XPath expression, e.g. '@price', 'number(@price)', 'position()'
     - to_lit: turns a Python value into an XPath literal (quotes, lowercasing, etc.)
+    Plain strings are accepted for both and treated as raw XPath.
     """
 
-    lhs: str
-    to_lit: Callable[[T], str]
+    lhs: Expr
+    to_lit: Callable[[T], Expr]
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "lhs", as_expr(self.lhs))
+
+    def _lit(self, value: T) -> Expr:
+        return as_expr(self.to_lit(value))
 
     def cmp(self, op: Literal["=", "!=", "<", "<=", ">", ">="], value: T) -> "Pred":
         if op not in {"=", "!=", "<", "<=", ">", ">="}:
             raise ValueError("Invalid comparator")
-        return Pred(f"{self.lhs} {op} {self.to_lit(value)}")
+        return Pred(Compare(self.lhs, op, self._lit(value)))
 
     def eq(self, value: T) -> "Pred":
         return self.cmp("=", value)
@@ -46,14 +86,19 @@ class Ops[T]:
         lop = ">=" if inclusive[0] else ">"
         hip = "<=" if inclusive[1] else "<"
         return Pred(
-            f"({self.lhs} {lop} {self.to_lit(lo)}) and ({self.lhs} {hip} {self.to_lit(hi)})"
+            And(
+                (
+                    Compare(self.lhs, lop, self._lit(lo)),
+                    Compare(self.lhs, hip, self._lit(hi)),
+                )
+            )
         )
 
     def in_(self, *values: T) -> "Pred":
         if not values:
-            return Pred("false()")
-        seq = "(" + ", ".join(self.to_lit(v) for v in values) + ")"
-        return Pred(f"{self.lhs} = {seq}")
+            return Pred(FALSE)
+        seq = Seq(tuple(self._lit(v) for v in values))
+        return Pred(Compare(self.lhs, "=", seq))
 
     def not_in(self, *values: T) -> "Pred":
         return self.in_(*values).neg()
@@ -61,87 +106,96 @@ class Ops[T]:
 
 def attr_str(name: str, *, ci: bool = False) -> Ops[str]:
     """String attribute ops (optionally case-insensitive)."""
-    lhs = f"lower-case(@{name})" if ci else f"@{name}"
+    lhs: Expr = Call("lower-case", (Attr(name),)) if ci else Attr(name)
 
-    def to_lit(v: str) -> str:
-        return quote(v.lower() if ci else v)
+    def to_lit(v: str) -> Expr:
+        return Str(v.lower() if ci else v)
 
     return Ops[str](lhs, to_lit)
 
 
 def attr_num(name: str) -> Ops[float]:
     """Numeric compare on attribute by casting: number(@name)."""
-    lhs = f"number(@{name})"
-
-    def to_lit(v: float) -> str:
-        return (
-            "NaN"
-            if v != v  # type: ignore[comparison-overlap]  # NaN check
-            else (
-                "Infinity"
-                if v == float("inf")
-                else "-Infinity" if v == float("-inf") else str(v)
-            )
-        )
+    lhs = Call("number", (Attr(name),))
+
+    def to_lit(v: float) -> Expr:
+        return Num(v)
 
     return Ops[float](lhs, to_lit)
 
 
 def position_ops() -> Ops[int]:
-    lhs = "position()"
+    lhs = Call("position")
 
-    def to_lit(v: int) -> str:
-        return str(int(v))
+    def to_lit(v: int) -> Expr:
+        return Num(int(v))
 
     return Ops[int](lhs, to_lit)
 
 
 def bool_expr(expr: str) -> Ops[bool]:
     """Compare boolean expressions (rare)."""
-    lhs = expr
+    lhs = Raw(expr)
 
-    def to_lit(v: bool) -> str:
-        return "true()" if v else "false()"
+    def to_lit(v: bool) -> Expr:
+        return TRUE if v else FALSE
 
     return Ops[bool](lhs, to_lit)
 
 
 def string_value(ci: bool = False) -> Ops[str]:
     """Compare node string-value: string(.) (optionally lower-cased)."""
-    lhs = "lower-case(string(.))" if ci else "string(.)"
+    sv = Call("string", (Context(),))
+    lhs = Call("lower-case", (sv,)) if ci else sv
 
-    def to_lit(v: str) -> str:
-        return quote(v.lower() if ci else v)
+    def to_lit(v: str) -> Expr:
+        return Str(v.lower() if ci else v)
 
     return Ops[str](lhs, to_lit)
 
 
 @dataclass(frozen=True)
 class _SetBuilder:
-    """Implements .any_of/.all_of/.none_of for a given per-token predicate factory."""
+    """
+    Implements .any_of/.all_of/.none_of for a given per-token predicate factory.
+    Per-token quantifiers over a shared domain (e.g. some $a in @*) are hoisted
+    into one quantifier, so the domain is scanned once whatever the token count,
+    and any_of folds token tests / regexes into one (see optimize.merge_regex).
+    """
 
-    make_one: Callable[[str], str]  # (token: str) -> str
+    make_one: Callable[[str], Expr]  # (token: str) -> Expr
 
     def any_of(self, *tokens: str) -> "Pred":
         if not tokens:
-            return Pred("false()")
-        parts = [self.make_one(t) for t in tokens]
-        return Pred(" or ".join(parts))
+            return Pred(FALSE)
+        parts = tuple(self.make_one(t) for t in tokens)
+        if len(parts) == 1:
+            return Pred(parts[0])
+        from xpath_builder.optimize import merge_regex
+
+        return Pred(merge_regex(hoist_quantifier(parts, Or) or Or(parts)))
 
     def all_of(self, *tokens: str) -> "Pred":
         if not tokens:
-            return Pred("true()")
-        parts = [self.make_one(t) for t in tokens]
-        return Pred(" and ".join(parts))
+            return Pred(TRUE)
+        parts = tuple(self.make_one(t) for t in tokens)
+        if len(parts) == 1:
+            return Pred(parts[0])
+        return Pred(hoist_quantifier(parts, And) or And(parts))
 
     def none_of(self, *tokens: str) -> "Pred":
         if not tokens:
-            return Pred("true()")
+            return Pred(TRUE)
         return self.any_of(*tokens).neg()
 
 
-def _seq_literal_strs(items: list[str]) -> str:
-    return "(" + ", ".join(quote(s) for s in items) + ")"
+def _seq_literal_strs(items: list[str]) -> Expr:
+    return Seq(tuple(Str(s) for s in items))
+
+
+def _some_attr(cond: Expr) -> Expr:
+    """some $a in @* satisfies cond"""
+    return Quantified("some", "a", Attr("*"), cond)
 
 
 @dataclass(frozen=True)
@@ -150,25 +204,26 @@ class _AttrNameOps:
 
     ci: bool  # case-insensitive for NAME comparisons
 
-    def _lname(self, var: str) -> str:
-        # var is like "$a"
-        return f"lower-case(local-name({var}))" if self.ci else f"local-name({var})"
+    def _lname(self, var: str) -> Expr:
+        # var is like "a" for $a
+        lname = Call("local-name", (Var(var),))
+        return Call("lower-case", (lname,)) if self.ci else lname
 
     @property
     def contains(self) -> _SetBuilder:
-        def one(substr: str) -> str:
-            x = self._lname("$a")
+        def one(substr: str) -> Expr:
+            x = self._lname("a")
             needle = substr.lower() if self.ci else substr
-            return f"some $a in @* satisfies contains({x}, {quote(needle)})"
+            return _some_attr(Call("contains", (x, Str(needle))))
 
         return _SetBuilder(make_one=one)
 
     @property
     def equals(self) -> _SetBuilder:
-        def one(name: str) -> str:
-            x = self._lname("$a")
+        def one(name: str) -> Expr:
+            x = self._lname("a")
             target = name.lower() if self.ci else name
-            return f"some $a in @* satisfies {x} = {quote(target)}"
+            return _some_attr(Compare(x, "=", Str(target)))
 
         return _SetBuilder(make_one=one)
 
@@ -179,39 +234,43 @@ class _AttrNameOps:
     def all_of(self, *names: str) -> "Pred":
         # every $n in ('a','b') satisfies some $a in @* satisfies local-name($a)= $n
         if not names:
-            return Pred("true()")
+            return Pred(TRUE)
         seq = _seq_literal_strs([n.lower() if self.ci else n for n in names])
-        x = "lower-case(local-name($a))" if self.ci else "local-name($a)"
-        return Pred(f"every $n in {seq} satisfies some $a in @* satisfies {x} = $n")
+        x = self._lname("a")
+        return Pred(
+            Quantified("every", "n", seq, _some_attr(Compare(x, "=", Var("n"))))
+        )
 
     def none_of(self, *names: str) -> "Pred":
         if not names:
-            return Pred("true()")
+            return Pred(TRUE)
         return self.any_of(*names).neg()
 
     @property
     def startswith(self) -> _SetBuilder:
-        def one(prefix: str) -> str:
-            x = self._lname("$a")
-            return f"some $a in @* satisfies starts-with({x}, {quote(prefix.lower() if self.ci else prefix)})"
+        def one(prefix: str) -> Expr:
+            x = self._lname("a")
+            lit = Str(prefix.lower() if self.ci else prefix)
+            return _some_attr(Call("starts-with", (x, lit)))
 
         return _SetBuilder(make_one=one)
 
     @property
     def endswith(self) -> _SetBuilder:
-        def one(suffix: str) -> str:
-            x = self._lname("$a")
-            return f"some $a in @* satisfies ends-with({x}, {quote(suffix.lower() if self.ci else suffix)})"
+        def one(suffix: str) -> Expr:
+            x = self._lname("a")
+            lit = Str(suffix.lower() if self.ci else suffix)
+            return _some_attr(Call("ends-with", (x, lit)))
 
         return _SetBuilder(make_one=one)
 
     def matches(self, *, flags: str = "") -> _SetBuilder:
-        fl = f", {quote(flags)}" if flags else ""
+        fl: tuple[Expr, ...] = (Str(flags),) if flags else ()
 
-        def one(pattern: str) -> str:
+        def one(pattern: str) -> Expr:
             # Note: pattern is XML Schema regex; pass as-is
-            lhs = f"lower-case(local-name($a))" if self.ci else f"local-name($a)"
-            return f"some $a in @* satisfies matches({lhs}, {quote(pattern)}{fl})"
+            lhs = self._lname("a")
+            return _some_attr(Call("matches", (lhs, Str(pattern), *fl)))
 
         return _SetBuilder(make_one=one)
 
@@ -223,24 +282,24 @@ class _AttrOps:
     name: str
     ci: bool
 
+    def _operand(self) -> Expr:
+        attr = Attr(self.name)
+        return Call("lower-case", (attr,)) if self.ci else attr
+
     @property
     def contains(self) -> _SetBuilder:
-        base = f"lower-case(@{self.name})" if self.ci else f"@{self.name}"
+        base = self._operand()
 
-        def one(tok: str) -> str:
+        def one(tok: str) -> Expr:
             needle = tok.lower() if self.ci else tok
-            return f"contains({base}, {quote(needle)})"
+            return Call("contains", (base, Str(needle)))
 
         return _SetBuilder(make_one=one)
 
     @property
     def contains_tokens(self) -> _SetBuilder:
-        src = f"concat(' ', normalize-space(@{self.name}), ' ')"
-        flags = ", 'i'" if self.ci else ""
-
-        def one(tok: str) -> str:
-            pat = rf"\s{re_escape_xsd(tok)}\s"
-            return f"matches({src}, {quote(pat)}{flags})"
+        def one(tok: str) -> Expr:
+            return TokenTest(self.name, (tok,), self.ci)
 
         return _SetBuilder(make_one=one)
 
@@ -249,21 +308,21 @@ class _AttrOps:
 
     @property
     def startswith(self) -> _SetBuilder:
-        left = f"lower-case(@{self.name})" if self.ci else f"@{self.name}"
+        left = self._operand()
 
-        def one(prefix: str) -> str:
-            right = quote(prefix.lower() if self.ci else prefix)
-            return f"starts-with({left}, {right})"
+        def one(prefix: str) -> Expr:
+            right = Str(prefix.lower() if self.ci else prefix)
+            return Call("starts-with", (left, right))
 
         return _SetBuilder(make_one=one)
 
     @property
     def endswith(self) -> _SetBuilder:
-        left = f"lower-case(@{self.name})" if self.ci else f"@{self.name}"
+        left = self._operand()
 
-        def one(suffix: str) -> str:
-            right = quote(suffix.lower() if self.ci else suffix)
-            return f"ends-with({left}, {right})"
+        def one(suffix: str) -> Expr:
+            right = Str(suffix.lower() if self.ci else suffix)
+            return Call("ends-with", (left, right))
 
         return _SetBuilder(make_one=one)
 
@@ -280,10 +339,10 @@ class _AttrOps:
         return _AttrNameOps(ci=self.ci)
 
     def matches(self, *, flags: str = "") -> _SetBuilder:
-        fl = f", {quote(flags)}" if flags else ""
+        fl: tuple[Expr, ...] = (Str(flags),) if flags else ()
 
-        def one(pattern: str) -> str:
-            return f"matches(@{self.name}, {quote(pattern)}{fl})"
+        def one(pattern: str) -> Expr:
+            return Call("matches", (Attr(self.name), Str(pattern), *fl))
 
         return _SetBuilder(make_one=one)
 
@@ -291,13 +350,13 @@ class _AttrOps:
         """
         Attribute missing: not(@attr)
         """
-        return Pred(f"not(@{self.name})")
+        return Pred(Not(Attr(self.name)))
 
     def exists(self) -> "Pred":
         """
         Attribute exists: @attr
         """
-        return Pred(f"@{self.name}")
+        return Pred(Attr(self.name))
 
     @property
     def as_str(self) -> Ops[str]:
@@ -321,20 +380,61 @@ class Compilable(Protocol):
 
 @dataclass(frozen=True)
 class Pred(Compilable):
-    expr: str
+    """
+    Boolean predicate backed by an immutable expression tree.
+    Plain strings are accepted and kept as raw XPath.
+    """
 
-    def compile(self) -> str:
-        return self.expr
+    node: Expr
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "node", as_expr(self.node))
+
+    @property
+    def expr(self) -> str:
+        return self.node.text
+
+    def compile(self, dialect: "Dialect" = "xpath2") -> str:
+        """
+        Render to XPath text. dialect="xpath1" lowers 2.0-only constructs
+        (see xpath_builder.dialect) and raises LoweringError if it cannot.
+        """
+        from xpath_builder.dialect import compile_expr
+
+        return compile_expr(self.node, dialect)
+
+    def optimize(self) -> "Pred":
+        """Equivalent predicate after xpath_builder.optimize passes."""
+        from xpath_builder.optimize import optimize
+
+        return Pred(optimize(self.node))
+
+    def plan(self, stats: "Selectivity | None" = None) -> "Pred":
+        """
+        Equivalent predicate with and/or operands ordered by expected cost,
+        refined by sampled pass rates when given (see xpath_builder.planner).
+        """
+        from xpath_builder.planner import plan
+
+        return Pred(plan(self.node, stats))
+
+    def native(self) -> Callable[[Any], bool]:
+        """
+        fn(element) -> bool compiled to plain Python (see xpath_builder.native).
+        """
+        from xpath_builder import native
+
+        return native.compile_pred(self)
 
     # Boolean ops
     def __and__(self, other: "Pred") -> "Pred":
-        return Pred(f"({self.expr}) and ({other.expr})")
+        return Pred(And((self.node, other.node)))
 
     def __or__(self, other: "Pred") -> "Pred":
-        return Pred(f"({self.expr}) or ({other.expr})")
+        return Pred(Or((self.node, other.node)))
 
     def neg(self) -> "Pred":
-        return Pred(f"not({self.expr})")
+        return Pred(Not(self.node))
 
     @staticmethod
     def attr(name: str, *, case_insensitive: bool = False) -> _AttrOps:
@@ -348,28 +448,24 @@ class Pred(Compilable):
         We normalize spaces to avoid duplicate-space issues.
         """
         # normalize-space collapses whitespace; add spaces to force token boundaries
-        src = f"concat(' ', normalize-space(@{attr}), ' ')"
-        pat = f"\\s{token}\\s"
-        flags = "i" if case_insensitive else ""
-        return Pred(
-            f"matches({src}, {quote(pat)}{', ' + quote(flags) if flags else ''})"
-        )
+        return Pred(TokenTest(attr, (token,), case_insensitive))
 
     # Text/string predicates (node string-value)
     @staticmethod
     def text_contains(
         needle: str, normalized: bool = True, case_insensitive: bool = False
     ) -> "Pred":
-        base = "normalize-space()" if normalized else "string(.)"
+        base = Call("normalize-space") if normalized else Call("string", (Context(),))
         if case_insensitive:
-            return Pred(f"contains(lower-case({base}), lower-case({quote(needle)}))")
-        return Pred(f"contains({base}, {quote(needle)})")
+            lowered = Call("lower-case", (base,))
+            return Pred(Call("contains", (lowered, Call("lower-case", (Str(needle),)))))
+        return Pred(Call("contains", (base, Str(needle))))
 
     @staticmethod
     def text_matches(pattern: str, flags: str = "") -> "Pred":
-        base = "string(.)"
-        flags_arg = f", {quote(flags)}" if flags else ""
-        return Pred(f"matches({base}, {quote(pattern)}{flags_arg})")
+        base = Call("string", (Context(),))
+        flags_arg: tuple[Expr, ...] = (Str(flags),) if flags else ()
+        return Pred(Call("matches", (base, Str(pattern), *flags_arg)))
 
     @staticmethod
     def union(*preds: "Pred") -> "Pred":
@@ -377,49 +473,105 @@ class Pred(Compilable):
         Union of multiple predicates: (pred1) | (pred2) | ...
         """
         if not preds:
-            return Pred("false()")
-        return Pred(" or ".join(f"({p.compile()})" for p in preds))
+            return Pred(FALSE)
+        return Pred(Or(tuple(p.node for p in preds)))
 
 
 # ----- Path / Node DSL -----
 
+
+def _desc_from_context(node: Expr) -> Expr:
+    """
+    Re-anchor a relative path at the context node: a/b -> .//a/b
+    Falls back to textual prefixing for anything that is not a plain step chain.
+    """
+    chain: list[Expr] = []
+    cur = node
+    while isinstance(cur, (Step, Filter)) and cur.base is not None:
+        chain.append(cur)
+        cur = cur.base
+    if not (isinstance(cur, Step) and cur.sep == ""):
+        return Raw(f".//{render(node)}")
+    out: Expr = Step(Context(), "//", cur.test)
+    for link in reversed(chain):
+        if isinstance(link, Step):
+            out = Step(out, link.sep, link.test)
+        else:
+            assert isinstance(link, Filter)
+            out = Filter(out, link.pred)
+    return out
+
+
 @dataclass(frozen=True)
 class Path(Compilable):
-    expr: str
+    """
+    Location path backed by an immutable expression tree.
+    Plain strings are accepted and kept as raw XPath.
+    """
 
-    def compile(self) -> str:
-        return self.expr
+    node: Expr
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "node", as_expr(self.node))
+
+    @property
+    def expr(self) -> str:
+        return self.node.text
+
+    def compile(self, dialect: "Dialect" = "xpath2") -> str:
+        """
+        Render to XPath text. dialect="xpath1" lowers 2.0-only constructs
+        (see xpath_builder.dialect) and raises LoweringError if it cannot.
+        """
+        from xpath_builder.dialect import compile_expr
+
+        return compile_expr(self.node, dialect)
 
     def __str__(self) -> str:
-        return self.expr
+        return self.node.text
+
+    def optimize(self) -> "Path":
+        """Equivalent path after xpath_builder.optimize passes."""
+        from xpath_builder.optimize import optimize
+
+        return Path(optimize(self.node))
+
+    def plan(self, stats: "Selectivity | None" = None) -> "Path":
+        """
+        Equivalent path with and/or operands ordered by expected cost,
+        refined by sampled pass rates when given (see xpath_builder.planner).
+        """
+        from xpath_builder.planner import plan
+
+        return Path(plan(self.node, stats))
 
     # predicates
     def neg(self) -> "Pred":
-        return Pred(f"not({self.expr})")
+        return Pred(Not(self.node))
 
     def where(self, pred: "Pred") -> "Path":
         """
         Filter with a predicate: /node[pred]
         """
-        return Path(f"{self.expr}[{pred.compile()}]")
+        return Path(Filter(self.node, pred.node))
 
     def child(self, node: "Node") -> "Path":
         """
         Child axis: /node
         """
-        return Path(f"{self.expr}/{node.compile()}")
+        return Path(Step(self.node, "/", node.test))
 
     def desc(self, node: "Node") -> "Path":
         """
         Descendant-or-self axis: //node
         """
-        return Path(f"{self.expr}//{node.compile()}")
+        return Path(Step(self.node, "//", node.test))
 
     def curr_desc(self) -> "Path":
         """
         Current + Descendant-or-self axis: .//node
         """
-        return Path(f".//{self.expr}")
+        return Path(_desc_from_context(self.node))
 
     def nth(self, n: int) -> "Path":
         return self.where(position_ops().eq(n))
@@ -428,7 +580,97 @@ class Path(Compilable):
         return self.nth(1)
 
     def validate(self) -> None:
-        validate_xpath(self.expr)
+        validate_xpath(self.compile())
+
+    def evaluator(self) -> "Evaluator":
+        """
+        Precompiled, cached evaluator for this path (see xpath_builder.engine).
+        """
+        from xpath_builder import engine
+
+        return engine.compile(self)
+
+    def native(self) -> "CompiledPath":
+        """
+        fn(doc) -> matching elements, compiled to plain Python closures over
+        el.get()/el.iter(); fn.iter(doc) yields them lazily (see
+        xpath_builder.native).
+        """
+        from xpath_builder import native
+
+        return native.compile_path(self)
+
+    # early-terminating evaluation (see Evaluator.iter, exists, ...)
+    def exists(self, doc: Any, **variables: Any) -> bool:
+        """True if anything matches in doc; stops at the first match."""
+        return self.evaluator().exists(doc, **variables)
+
+    def first_match(self, doc: Any, **variables: Any) -> Any:
+        """The first match in document order, or None."""
+        return self.evaluator().first_match(doc, **variables)
+
+    def count(self, doc: Any, **variables: Any) -> int:
+        """Number of matches, without building the list of them."""
+        return self.evaluator().count(doc, **variables)
+
+    def iter(self, doc: Any, **variables: Any) -> Iterator[Any]:
+        """
+        Matches in document order, found as they are read. On lxml trees
+        libxml2 builds the node list up front, except for the first matches
+        of a //test[...] path with a native form (see Evaluator.iter).
+        """
+        return self.evaluator().iter(doc, **variables)
+
+    # projection to plain strings (see Projection)
+    def project(
+        self, attribute: str, namespaces: Mapping[str, str] | None = None
+    ) -> "Projection":
+        """
+        The value of attribute ("@href" or "href") on each match, as plain
+        str: path.project("@href")(doc) -> ["/a", "/b"]. A prefixed name
+        ("@xlink:href") is resolved through namespaces ({prefix: uri}; xml
+        is predefined), or pass the {uri}local form directly.
+        """
+        name = attribute.removeprefix("@")
+        prefix, colon, local = name.partition(":")
+        if colon and not name.startswith("{"):
+            uri = {**_NAMESPACES, **(namespaces or {})}.get(prefix)
+            if uri is None:
+                raise ValueError(f"Unknown namespace prefix in {attribute!r}")
+            name = f"{{{uri}}}{local}"
+        return Projection(self, name)
+
+    def project_text(self) -> "Projection":
+        """The string-value of each match, as plain str."""
+        return Projection(self, None)
+
+    def analyze(self) -> "Analysis":
+        """
+        Capability report: streamable, xpath1, native, uses_regex,
+        uses_quantifiers, needs_string_value, positional (see
+        xpath_builder.analysis).
+        """
+        from xpath_builder.analysis import analyze
+
+        return analyze(self.node)
+
+    def stream(self, source: Any, **options: Any) -> Iterator[Any]:
+        """
+        Matches from an iterparse of source, without building the whole tree
+        (see xpath_builder.stream.iter_matches for the streamable subset).
+        """
+        from xpath_builder import stream
+
+        return stream.iter_matches(self, source, **options)
+
+    async def aevaluate(self, doc: Any, **options: Any) -> Any:
+        """
+        Evaluate on a worker thread, for asyncio code; doc may be a tree or
+        content to parse (see xpath_builder.aio.evaluate).
+        """
+        from xpath_builder import aio
+
+        return await aio.evaluate(self, doc, **options)
 
     @staticmethod
     def union(*paths: "Path") -> "Path":
@@ -436,8 +678,33 @@ class Path(Compilable):
         Union of multiple paths: /path1 | /path2 | ...
         """
         if not paths:
-            return Path("false()")
-        return Path(" | ".join(f"({p.compile()})" for p in paths))
+            return Path(FALSE)
+        return Path(Union(tuple(p.node for p in paths)))
+
+
+_ATTRIBUTE_NAME = re.compile(r"^(?:\{[^{}]+\})?[A-Za-z_][\w.-]*$")
+_NAMESPACES = {"xml": "http://www.w3.org/XML/1998/namespace"}
+
+
+@dataclass(frozen=True)
+class Projection:
+    """
+    Path matches read out as plain str (values of attribute, a name or
+    {uri}local, or string-values if attribute is None). Results hold no
+    reference to the document, unlike elements and lxml smart strings, so
+    its tree can be freed right after evaluation (see Evaluator.project).
+    """
+
+    path: Path
+    attribute: str | None
+
+    def __post_init__(self) -> None:
+        name = self.attribute
+        if name is not None and not _ATTRIBUTE_NAME.match(name):
+            raise ValueError(f"Invalid attribute name: {name!r}")
+
+    def __call__(self, doc: Any, **variables: Any) -> list[str]:
+        return self.path.evaluator().project(doc, self.attribute, **variables)
 
 
 @dataclass(frozen=True)
@@ -451,7 +718,10 @@ class Node(Compilable):
         """
         Union with another node test: node | other
         """
-        return Path(f"{self.test} | {other.test}")
+        return Path(Union((self._step(), other._step())))
+
+    def _step(self, sep: str = "") -> Expr:
+        return Step(None, sep, self.test)
 
     def compile(self) -> str:
         return self.test
@@ -460,28 +730,28 @@ class Node(Compilable):
         """
         Description: Match any in the document.
         """
-        return Path(f"//{self.test}")
+        return Path(self._step("//"))
 
     def root(self) -> "Path":
         """
         Description: Match the root of the document.
         """
-        return Path(f"/{self.test}")
+        return Path(self._step("/"))
 
     def where(self, pred: "Pred") -> "Path":
         """
         Filter with a predicate: /node[pred]
         """
-        return Path(self.test).where(pred)
+        return Path(self._step()).where(pred)
 
     def child(self, other: "Node") -> "Path":
-        return Path(self.test).child(other)
+        return Path(self._step()).child(other)
 
     def desc(self, other: "Node") -> "Path":
-        return Path(self.test).desc(other)
+        return Path(self._step()).desc(other)
 
     def curr_desc(self) -> "Path":
         """
         Current + Descendant-or-self axis: .//node
         """
-        return Path(self.test).curr_desc()
+        return Path(self._step()).curr_desc()
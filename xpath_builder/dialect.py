@@ -0,0 +1,355 @@
+"""
+XPath dialect targets.
+
+The builder emits XPath 2.0 (lower-case, matches, ends-with, quantifiers,
+sequences). lower(node, "xpath1") rewrites those into XPath 1.0 equivalents
+where one exists, so the selector can run on libxml2:
+
+- lower-case(x)         -> translate(x, 'AB..', 'ab..')  (ASCII + Latin-1; a
+  folded value compared with anything but text in that range is not lowered)
+- ends-with(s, t)       -> substring(s, string-length(s) - string-length(t) + 1) = t
+- token tests           -> contains(concat(' ', normalize-space(@a), ' '), ' tok ')
+- literal matches()     -> contains / starts-with / ends-with / =
+  (a top-level alternation of literals becomes an `or` of those)
+- some $a in @* ...     -> @*[... local-name(.) ...]
+- x = ('a', 'b')        -> x = 'a' or x = 'b'
+
+Anything else raises LoweringError naming the construct.
+"""
+
+import unicodedata
+from typing import Iterator, Literal
+
+from xpath_builder.expr import (
+    FALSE,
+    TRUE,
+    XPATH1_FUNCTIONS,
+    And,
+    Arith,
+    Attr,
+    Call,
+    Compare,
+    Context,
+    Expr,
+    Filter,
+    Not,
+    Num,
+    Or,
+    Quantified,
+    Raw,
+    Seq,
+    Step,
+    Str,
+    TokenTest,
+    Union,
+    Var,
+    is_xpath1,
+    rewrite,
+    walk,
+)
+
+Dialect = Literal["xpath2", "xpath1"]
+
+_UPPER = "ABCDEFGHIJKLMNOPQRSTUVWXYZÀÁÂÃÄÅÆÇÈÉÊËÌÍÎÏÐÑÒÓÔÕÖØÙÚÛÜÝÞ"
+_LOWER = _UPPER.lower()
+_FOLDS = ((Str(_UPPER), Str(_LOWER)), (Str(_LOWER), Str(_UPPER)))
+_STRING_TESTS = frozenset({"contains", "starts-with"})
+_REGEX_SPECIALS = frozenset(".^$|?*+()[]{}")
+_NODE_SETS = (Attr, Step, Filter, Union, Context)
+
+
+class LoweringError(ValueError):
+    """Raised when an expression has no equivalent in the target dialect."""
+
+
+def lower(root: Expr, dialect: Dialect = "xpath1") -> Expr:
+    """Rewrite root for the target dialect. The result is memoized on root."""
+    if dialect == "xpath2":
+        return root
+    if dialect != "xpath1":
+        raise ValueError(f"Unknown dialect: {dialect!r}")
+    cached = root.__dict__.get("_xpath1")
+    if cached is None:
+        cached = rewrite(root, _lower1)
+        _check_xpath1(cached)
+        _check_case_folds(cached)
+        object.__setattr__(root, "_xpath1", cached)
+    return cached
+
+
+def compile_expr(root: Expr, dialect: Dialect = "xpath2") -> str:
+    return lower(root, dialect).text
+
+
+# ----- rules -----
+
+
+def _case_fold(x: Expr, upper: bool = False) -> Expr:
+    if isinstance(x, Str):
+        return Str(x.value.upper() if upper else x.value.lower())
+    src, dst = (_LOWER, _UPPER) if upper else (_UPPER, _LOWER)
+    return Call("translate", (x, Str(src), Str(dst)))
+
+
+def _ends_with(s: Expr, t: Expr) -> Expr:
+    length = Call("string-length", (s,))
+    if isinstance(t, Str):
+        k = len(t.value) - 1
+        start: Expr = length if k == 0 else Arith(length, "-", Num(k))
+    else:
+        start = Arith(Arith(length, "-", Call("string-length", (t,))), "+", Num(1))
+    return Compare(Call("substring", (s, start)), "=", t)
+
+
+def _token_test(e: TokenTest) -> Expr:
+    src = e.source()
+    if e.ci:
+        src = _case_fold(src)
+    parts = tuple(
+        Call("contains", (src, Str(f" {t.lower() if e.ci else t} "))) for t in e.tokens
+    )
+    return parts[0] if len(parts) == 1 else Or(parts)
+
+
+def _regex_literal(pattern: str) -> tuple[bool, str, bool] | None:
+    """Split ^lit$ into (anchored_start, lit, anchored_end); None if not a literal."""
+    start = pattern.startswith("^")
+    if start:
+        pattern = pattern[1:]
+    end = pattern.endswith("$") and not pattern.endswith("\\$")
+    if end:
+        pattern = pattern[:-1]
+    out: list[str] = []
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == "\\":
+            nxt = pattern[i + 1 : i + 2]
+            if nxt and (nxt in _REGEX_SPECIALS or nxt in "\\-"):
+                out.append(nxt)
+                i += 2
+                continue
+            return None
+        if ch in _REGEX_SPECIALS:
+            return None
+        out.append(ch)
+        i += 1
+    return start, "".join(out), end
+
+
+def _split_alternation(pattern: str) -> list[str]:
+    """
+    Top-level alternatives of pattern, each stripped of one enclosing group:
+    "(a)|(^b)" -> ["a", "^b"]. A pattern without top-level | is returned whole.
+    """
+    alts: list[str] = []
+    start = 0
+    for i, depth in _scan_depths(pattern):
+        if pattern[i] == "|" and depth == 0:
+            alts.append(pattern[start:i])
+            start = i + 1
+    if not alts:
+        return [pattern]
+    alts.append(pattern[start:])
+    return [_strip_group(a) for a in alts]
+
+
+def _scan_depths(pattern: str) -> Iterator[tuple[int, int]]:
+    """(index, group depth) of every unescaped character outside [...]."""
+    depth = 0
+    in_class = False
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == "\\":
+            i += 2
+            continue
+        if in_class:
+            in_class = ch != "]"
+        elif ch == "[":
+            in_class = True
+        else:
+            if ch == ")":
+                depth -= 1
+            yield i, depth
+            if ch == "(":
+                depth += 1
+        i += 1
+
+
+def _strip_group(alt: str) -> str:
+    """(x) -> x when the first ( closes at the very end."""
+    if not alt.startswith("("):
+        return alt
+    for i, depth in _scan_depths(alt):
+        if alt[i] == ")" and depth == 0:
+            return alt[1:-1] if i == len(alt) - 1 else alt
+    return alt
+
+
+def _matches(e: Call) -> Expr:
+    args = e.args
+    if len(args) not in (2, 3) or not all(isinstance(a, Str) for a in args[1:]):
+        raise LoweringError(f"matches() with a computed pattern cannot be lowered: {e}")
+    pattern = args[1].value  # type: ignore[attr-defined]
+    flags = args[2].value if len(args) == 3 else ""  # type: ignore[attr-defined]
+    lits: list[tuple[bool, str, bool]] = []
+    for alt in _split_alternation(pattern):
+        lit = _regex_literal(alt)
+        anchored = lit is not None and (lit[0] or lit[2])
+        if lit is None or set(flags) - set("ism") or ("m" in flags and anchored):
+            raise LoweringError(
+                f"matches() with regex {pattern!r} has no XPath 1.0 equivalent: "
+                f"{e.text}"
+            )
+        lits.append(lit)
+    ci = "i" in flags
+    x = _case_fold(args[0]) if ci else args[0]
+    parts = tuple(_literal_match(x, *lit, ci) for lit in lits)
+    return parts[0] if len(parts) == 1 else Or(parts)
+
+
+def _literal_match(x: Expr, start: bool, needle: str, end: bool, ci: bool) -> Expr:
+    if ci:
+        needle = needle.lower()
+    if start and end:
+        return Compare(Call("string", (x,)), "=", Str(needle))
+    if start:
+        return Call("starts-with", (x, Str(needle)))
+    if end:
+        return _ends_with(x, Str(needle))
+    return Call("contains", (x, Str(needle)))
+
+
+def _substitute(e: Expr, var: str, value: Expr) -> Expr:
+    return rewrite(e, lambda n: value if isinstance(n, Var) and n.name == var else n)
+
+
+def _uses_in_filter(e: Expr, var: str) -> bool:
+    """True if $var is used inside a nested predicate, where . is another node."""
+    for n in walk(e):
+        if isinstance(n, Filter) and any(
+            isinstance(m, Var) and m.name == var for m in walk(n.pred)
+        ):
+            return True
+    return False
+
+
+def _quantified(e: Quantified) -> Expr:
+    if isinstance(e.domain, Seq):
+        parts = tuple(_substitute(e.cond, e.var, item) for item in e.domain.items)
+        if not parts:
+            return FALSE if e.quantifier == "some" else TRUE
+        if len(parts) == 1:
+            return parts[0]
+        return Or(parts) if e.quantifier == "some" else And(parts)
+    if isinstance(e.domain, _NODE_SETS) and not _uses_in_filter(e.cond, e.var):
+        cond = _substitute(e.cond, e.var, Context())
+        if e.quantifier == "some":
+            return Filter(e.domain, cond)
+        return Not(Filter(e.domain, Not(cond)))
+    raise LoweringError(f"quantified expression cannot be lowered: {e.text}")
+
+
+def _compare(e: Compare) -> Expr:
+    lhs, rhs = e.lhs, e.rhs
+    if isinstance(rhs, Seq) and not isinstance(lhs, Seq):
+        # general comparison against a sequence is existential
+        parts = tuple(Compare(lhs, e.op, item) for item in rhs.items)
+    elif isinstance(lhs, Seq) and not isinstance(rhs, Seq):
+        parts = tuple(Compare(item, e.op, rhs) for item in lhs.items)
+    else:
+        return e
+    if not parts:
+        return FALSE
+    return parts[0] if len(parts) == 1 else Or(parts)
+
+
+def _num(e: Num) -> Expr:
+    v = e.value
+    if v != v:
+        return Raw("0 div 0")
+    if v in (float("inf"), float("-inf")):
+        return Raw("1 div 0" if v > 0 else "-1 div 0")
+    return e
+
+
+def _lower1(e: Expr) -> Expr:
+    if isinstance(e, TokenTest):
+        return _token_test(e)
+    if isinstance(e, Num):
+        return _num(e)
+    if isinstance(e, Compare):
+        return _compare(e)
+    if isinstance(e, Quantified):
+        return _quantified(e)
+    if isinstance(e, Call):
+        if e.name in ("lower-case", "upper-case") and len(e.args) == 1:
+            return _case_fold(e.args[0], upper=e.name == "upper-case")
+        if e.name == "ends-with" and len(e.args) == 2:
+            return _ends_with(e.args[0], e.args[1])
+        if e.name == "matches":
+            return _matches(e)
+    return e
+
+
+def _check_xpath1(root: Expr) -> None:
+    from xpath_builder.extensions import FUNCTIONS as EXTENSION_FUNCTIONS
+
+    for e in walk(root):
+        if isinstance(e, Seq):
+            raise LoweringError(f"sequence {e.text} has no XPath 1.0 equivalent")
+        if isinstance(e, Quantified):
+            raise LoweringError(f"quantified expression cannot be lowered: {e.text}")
+        if isinstance(e, Call) and not (
+            e.name in XPATH1_FUNCTIONS or e.name in EXTENSION_FUNCTIONS
+        ):
+            raise LoweringError(f"{e.name}() has no XPath 1.0 equivalent")
+        if isinstance(e, Raw) and not is_xpath1(e):
+            raise LoweringError(f"raw fragment {e.value!r} is not XPath 1.0")
+
+
+def _is_folded(e: Expr) -> bool:
+    return any(
+        isinstance(n, Call) and n.name == "translate" and n.args[1:] in _FOLDS
+        for n in walk(e)
+    )
+
+
+def _foldable(text: str) -> bool:
+    """
+    True if the translate() table case-maps text as lower-case() would:
+    letters of the table, or uncased characters that no case mapping
+    produces (lower-case('İ') ends in a combining dot).
+    """
+    return all(
+        ch in _UPPER
+        or ch in _LOWER
+        or (ch.lower() == ch.upper() and not unicodedata.combining(ch))
+        for ch in text
+    )
+
+
+def _check_case_folds(root: Expr) -> None:
+    """
+    translate() only folds ASCII and Latin-1, so a folded value may only be
+    tested against literal text of that range (or another folded value):
+    'σ' or a variable would give a different answer than lower-case() does.
+    """
+    for e in walk(root):
+        if isinstance(e, Compare):
+            operands: tuple[Expr, ...] = (e.lhs, e.rhs)
+        elif isinstance(e, Call) and e.name in _STRING_TESTS:
+            operands = e.args
+        else:
+            continue
+        if not any(_is_folded(op) for op in operands):
+            continue
+        for op in operands:
+            if _is_folded(op) or isinstance(op, Num):
+                continue
+            if not (isinstance(op, Str) and _foldable(op.value)):
+                raise LoweringError(
+                    f"case folding against {op.text} needs Unicode case mapping, "
+                    f"which XPath 1.0 translate() lacks: {e.text}"
+                )
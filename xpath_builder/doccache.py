@@ -0,0 +1,152 @@
+"""
+Document-scoped memo of derived text, shared by every native predicate.
+
+string(.), normalize-space(), lower-case(...) and the token list of @class
+are the same for a node whatever selector asks, so inside
+
+    with document_cache():
+        ...evaluate any number of native predicates / paths...
+
+each is computed once per node. String-values are built bottom-up from the
+children's cached values, so //*[contains(., 'x')] does one pass over the
+text instead of re-reading every subtree at every ancestor.
+SelectorSet.evaluate() and compiled native paths open a scope themselves;
+nested scopes share the outer cache. The cache holds strong references to
+elements, so keep scopes to one pass over one unchanging document.
+
+An indexed cache also keeps an AttributeIndex per document root (see
+xpath_builder.attrindex), from which token, value and prefix tests on
+attributes are answered without visiting every element.
+"""
+
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator
+
+from xpath_builder.attrindex import AttributeIndex
+
+_WS = re.compile(r"[ \t\r\n]+")
+
+
+class DocumentCache:
+    """Per-node memo of string-values, their normalized/lower-cased forms and
+    attribute token sets; indexed=True adds per-document attribute indexes."""
+
+    def __init__(self, *, indexed: bool = False) -> None:
+        self.indexed = indexed
+        self._indexes: dict[Any, AttributeIndex] = {}
+        self._string: dict[Any, str] = {}
+        self._normalized: dict[Any, str] = {}
+        self._lowered: dict[Any, str] = {}
+        self._normalized_lower: dict[Any, str] = {}
+        self._tokens: dict[tuple[Any, str, bool], frozenset[str]] = {}
+
+    def string_value(self, el: Any) -> str:
+        """string(el): own text plus descendants' text, comments excluded."""
+        memo = self._string
+        value = memo.get(el)
+        if value is not None:
+            return value
+        stack: list[tuple[Any, bool]] = [(el, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if not children_done:
+                if node not in memo:
+                    stack.append((node, True))
+                    stack.extend((c, False) for c in node if isinstance(c.tag, str))
+                continue
+            parts = [node.text or ""]
+            for child in node:
+                if isinstance(child.tag, str):
+                    parts.append(memo[child])
+                if child.tail:
+                    parts.append(child.tail)
+            memo[node] = "".join(parts)
+        return memo[el]
+
+    def normalized(self, el: Any) -> str:
+        """normalize-space(el)"""
+        value = self._normalized.get(el)
+        if value is None:
+            value = _WS.sub(" ", self.string_value(el)).strip(" ")
+            self._normalized[el] = value
+        return value
+
+    def lowered(self, el: Any) -> str:
+        """lower-case(string(el))"""
+        value = self._lowered.get(el)
+        if value is None:
+            value = self._lowered[el] = self.string_value(el).lower()
+        return value
+
+    def normalized_lower(self, el: Any) -> str:
+        """lower-case(normalize-space(el))"""
+        value = self._normalized_lower.get(el)
+        if value is None:
+            value = self._normalized_lower[el] = self.normalized(el).lower()
+        return value
+
+    def tokens(self, el: Any, attr: str, ci: bool = False) -> frozenset[str]:
+        """Whitespace-separated tokens of @attr (lower-cased if ci)."""
+        key = (el, attr, ci)
+        value = self._tokens.get(key)
+        if value is None:
+            raw = el.get(attr) or ""
+            value = frozenset(_WS.split(raw.lower() if ci else raw))
+            self._tokens[key] = value
+        return value
+
+    def attribute_index(self, root: Any) -> AttributeIndex | None:
+        """The (lazily built) index of the document under root; None unless
+        indexed."""
+        if not self.indexed:
+            return None
+        index = self._indexes.get(root)
+        if index is None:
+            index = self._indexes[root] = AttributeIndex(root)
+        return index
+
+
+_active: ContextVar[DocumentCache | None] = ContextVar(
+    "xpath_builder_document_cache", default=None
+)
+
+
+def active_cache() -> DocumentCache | None:
+    """The cache of the innermost document_cache() scope, if any."""
+    return _active.get()
+
+
+@contextmanager
+def document_cache(
+    cache: DocumentCache | None = None, *, indexed: bool = False
+) -> Iterator[DocumentCache]:
+    """
+    Scope in which native evaluation memoizes derived text (and, if indexed,
+    answers attribute tests from an index). Reuses the enclosing scope's
+    cache unless one is passed explicitly.
+    """
+    current = _active.get()
+    if cache is None and current is not None:
+        current.indexed = current.indexed or indexed
+        yield current
+        return
+    if cache is None:
+        cache = DocumentCache(indexed=indexed)
+    token = _active.set(cache)
+    try:
+        yield _active.get()  # type: ignore[misc]
+    finally:
+        _active.reset(token)
+
+
+@contextmanager
+def no_cache() -> Iterator[None]:
+    """Scope in which native evaluation recomputes everything (e.g. while
+    streaming, where elements are cleared after use)."""
+    token = _active.set(None)
+    try:
+        yield
+    finally:
+        _active.reset(token)
@@ -0,0 +1,420 @@
+"""
+Precompiled selector evaluation.
+
+compile(path) optimizes the expression (see xpath_builder.optimize) and
+returns an Evaluator whose engine is picked from its capability report (see
+xpath_builder.analysis): lxml's XPath (libxml2) when the expression is XPath
+1.0 or can be lowered to it (see xpath_builder.dialect), an elementpath
+selector otherwise. Paths that compile to native closures (see
+xpath_builder.native) run those on non-lxml trees instead of elementpath,
+and on lxml trees too when they carry a multi-needle contains() matcher
+(Analysis.multi_match), or inside an indexed document_cache() scope when the
+attribute index can answer them (see xpath_builder.attrindex). Without a
+native form, such multi-literal groups run in libxml2 through the
+extension functions of xpath_builder.extensions.
+Evaluator.exists / first_match / count / iter answer without building the
+match list: native and elementpath evaluation stop walking at the first hit
+the caller needs. libxml2 has no lazy mode. On its route, a //test[...]
+path with a native form first checks PROBE_LIMIT candidates natively, so an
+early hit returns at once. Past that, exists, first_match and count use
+boolean(...), (...)[1] and count(...) forms, which still walk the whole
+location path but never create the nodes' Python proxies.
+Evaluators are kept in a bounded, thread-safe LRU keyed by the compiled text,
+so a hot loop never re-parses the same selector. lxml XPath objects must not
+be shared between threads running in parallel (free-threaded builds), so a
+worker thread can call thread_cache() to get an LRU of its own; compile()
+and the cache functions below then act on that one.
+"""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from itertools import islice
+from typing import Any, Iterable, Iterator, Literal
+
+from xpath_builder import extensions
+from xpath_builder.analysis import analyze
+from xpath_builder.core import Path, Pred
+from xpath_builder.dialect import lower
+from xpath_builder.doccache import active_cache
+from xpath_builder.native import (
+    CompiledPath,
+    compile_path,
+    format_number,
+    index_lookup,
+    string_value,
+)
+from xpath_builder.expr import Call, Expr, as_expr
+from xpath_builder.optimize import optimize
+from xpath_builder.utils import elementpath_module, lxml_etree
+
+Backend = Literal["lxml", "elementpath"]
+Route = Literal["libxml2", "native", "elementpath"]
+
+# XPath forms libxml2 answers without creating a Python object per node
+_EXISTS = "boolean({})"
+_COUNT = "count({})"
+_FIRST = "({})[1]"
+_ATTRIBUTE = "({})/@{}"
+
+DEFAULT_CACHE_SIZE = 1024
+# candidates checked natively before exists/first_match/iter hand an lxml
+# tree to libxml2, which only returns complete node lists
+PROBE_LIMIT = 256
+
+
+class Evaluator:
+    """
+    A compiled selector. Call it with a document or element to get the
+    matching nodes (or an atomic value, for non node-set expressions).
+    """
+
+    def __init__(
+        self,
+        expression: str,
+        backend: Backend,
+        native: CompiledPath | None = None,
+        indexed: bool = False,
+        native_first: bool = False,
+        portable: str | None = None,
+        matchers: extensions.Matchers | None = None,
+    ) -> None:
+        self.expression = expression
+        # for elementpath: expression without lxml-only extension calls
+        self._portable = expression if portable is None else portable
+        self.backend: Backend = backend
+        self._native = native  # used for non-lxml trees when set
+        self._indexed = indexed and native is not None  # native uses the index
+        self._native_first = native_first and native is not None  # on lxml too
+        self._matchers = matchers or {}  # for xb: extension calls
+        self._xpath: Any = None
+        self._modes: dict[tuple[str, bool], Any] = {}
+        self._selector: Any = None
+        self._lock = threading.Lock()
+        if backend == "lxml":
+            self._xpath = self._compile_xpath(expression)
+        elif native is None:
+            self._selector = self._make_selector()
+
+    def _compile_xpath(self, expression: str, smart_strings: bool = True) -> Any:
+        if extensions.uses_extensions(expression):
+            return extensions.compile_xpath(
+                expression, self._matchers, smart_strings=smart_strings
+            )
+        etree = lxml_etree()
+        assert etree is not None
+        return etree.XPath(expression, smart_strings=smart_strings)
+
+    def _mode(self, text: str, smart_strings: bool = True) -> Any:
+        """The lxml XPath for text, compiled on first use."""
+        key = (text, smart_strings)
+        xpath = self._modes.get(key)
+        if xpath is None:
+            with self._lock:
+                xpath = self._modes.get(key)
+                if xpath is None:
+                    xpath = self._compile_xpath(text, smart_strings)
+                    self._modes[key] = xpath
+        return xpath
+
+    def _make_selector(self) -> Any:
+        elementpath = elementpath_module()
+        if elementpath is None:
+            raise ImportError(
+                f"XPath 2.0 expression needs elementpath (pip install elementpath): "
+                f"{self.expression}"
+            )
+        return elementpath.Selector(self._portable, parser=elementpath.XPath2Parser)
+
+    def _elementpath(self) -> Any:
+        if self._selector is None:
+            # lxml-backed evaluator applied to a non-lxml tree
+            with self._lock:
+                if self._selector is None:
+                    self._selector = self._make_selector()
+        return self._selector
+
+    def _route(self, doc: Any, variables: dict[str, Any]) -> Route:
+        if self._xpath is not None and is_lxml_node(doc):
+            if not variables and (
+                self._native_first or (self._indexed and _indexing())
+            ):
+                return "native"
+            return "libxml2"
+        if self._native is not None and not variables:
+            return "native"
+        return "elementpath"
+
+    def __call__(self, doc: Any, **variables: Any) -> Any:
+        route = self._route(doc, variables)
+        if route == "libxml2":
+            return self._xpath(doc, **variables)
+        if route == "native":
+            return self._native(doc)  # type: ignore[misc]
+        return self._elementpath().select(doc, variables=variables)
+
+    def _probe(
+        self, doc: Any, variables: dict[str, Any]
+    ) -> tuple[list[Any], bool] | None:
+        """Native look at the first PROBE_LIMIT candidates (see iter())."""
+        if self._native is None or variables:
+            return None
+        return self._native.head(doc, PROBE_LIMIT)
+
+    def iter(self, doc: Any, **variables: Any) -> Iterator[Any]:
+        """
+        Matches one at a time, in document order. Native and elementpath
+        evaluation walk the tree only as far as the consumer reads. libxml2
+        has no lazy mode: on its route (lxml trees, unless routed native),
+        paths of one //test[...] step with a native form check their first
+        PROBE_LIMIT candidates natively and yield those matches before the
+        rest of the node list is built; other paths build it first.
+        """
+        route = self._route(doc, variables)
+        if route == "libxml2":
+            return self._libxml2_iter(doc, variables)
+        if route == "native":
+            return self._native.iter(doc)  # type: ignore[union-attr]
+        return self._elementpath().iter_select(doc, variables=variables)
+
+    def _libxml2_iter(self, doc: Any, variables: dict[str, Any]) -> Iterator[Any]:
+        probe = self._probe(doc, variables)
+        skip = 0
+        if probe is not None:
+            hits, complete = probe
+            yield from hits
+            if complete:
+                return
+            skip = len(hits)  # the node list starts with the same matches
+        result = self._xpath(doc, **variables)
+        if not isinstance(result, list):
+            yield result
+            return
+        yield from islice(result, skip, None)
+
+    def exists(self, doc: Any, **variables: Any) -> bool:
+        """True if anything matches; stops at the first match (see iter())."""
+        route = self._route(doc, variables)
+        if route == "libxml2":
+            probe = self._probe(doc, variables)
+            if probe is not None and (probe[0] or probe[1]):
+                return bool(probe[0])
+            return bool(self._mode(_EXISTS.format(self.expression))(doc, **variables))
+        if route == "native":
+            return self._native.first(doc) is not None  # type: ignore[union-attr]
+        return next(self.iter(doc, **variables), _NONE) is not _NONE
+
+    def first_match(self, doc: Any, **variables: Any) -> Any:
+        """The first match in document order, or None; stops there (see iter())."""
+        route = self._route(doc, variables)
+        if route == "libxml2":
+            probe = self._probe(doc, variables)
+            if probe is not None and (probe[0] or probe[1]):
+                return probe[0][0] if probe[0] else None
+            result = self._mode(_FIRST.format(self.expression))(doc, **variables)
+            return result[0] if result else None
+        if route == "native":
+            return self._native.first(doc)  # type: ignore[union-attr]
+        return next(self.iter(doc, **variables), None)
+
+    def count(self, doc: Any, **variables: Any) -> int:
+        """Number of matches, without building the list of them."""
+        route = self._route(doc, variables)
+        if route == "libxml2":
+            return int(self._mode(_COUNT.format(self.expression))(doc, **variables))
+        if route == "native":
+            return self._native.count(doc)  # type: ignore[union-attr]
+        return sum(1 for _ in self.iter(doc, **variables))
+
+    def project(
+        self, doc: Any, attribute: str | None = None, **variables: Any
+    ) -> list[str]:
+        """
+        The matches as plain str: the value of @attribute (a name or
+        {uri}local) on each, skipping matches without one, or, if None,
+        each match's string-value.
+        Unlike elements and lxml smart strings, these do not reference doc,
+        so its tree can be freed as soon as the caller drops it.
+        """
+        namespaced = attribute is not None and attribute.startswith("{")
+        if namespaced or self._route(doc, variables) != "libxml2":
+            items: Iterable[Any] = self.iter(doc, **variables)
+        elif attribute is not None:
+            text = _ATTRIBUTE.format(self.expression, attribute)
+            return self._mode(text, smart_strings=False)(doc, **variables)
+        else:
+            result = self._mode(self.expression, smart_strings=False)(doc, **variables)
+            items = result if isinstance(result, list) else (result,)
+        if attribute is None:
+            return [_plain(item) for item in items]
+        return [
+            str(value)
+            for item in items
+            if hasattr(item, "get") and (value := item.get(attribute)) is not None
+        ]
+
+    def test(self, element: Any, root: Any = None) -> bool:
+        """
+        Evaluate with element as the context node and return the effective
+        boolean value. root is the document root, needed by elementpath.
+        """
+        if self._xpath is not None and is_lxml_node(element):
+            return bool(self._xpath(element))
+        start = element if root is None else root
+        return bool(self._elementpath().select(start, item=element))
+
+    def __repr__(self) -> str:
+        return f"Evaluator({self.expression!r}, backend={self.backend!r})"
+
+
+_NONE = object()
+
+
+def _plain(item: Any) -> str:
+    """Plain-str string-value of an element, attribute or atomic result."""
+    if hasattr(item, "tag"):
+        return string_value(item)
+    if isinstance(item, bool):
+        return "true" if item else "false"
+    # libxml2 returns every number as a float; render it as XPath 2.0 does,
+    # so a projection reads the same whichever engine ran
+    if isinstance(item, float):
+        return format_number(item)
+    return str(item)
+
+
+def is_lxml_node(doc: Any) -> bool:
+    etree = lxml_etree()
+    return etree is not None and isinstance(doc, (etree._Element, etree._ElementTree))
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    hits: int
+    misses: int
+    size: int
+    maxsize: int
+
+
+class EvaluatorCache:
+    """Bounded LRU of Evaluators keyed by compiled text; thread-safe."""
+
+    def __init__(self, maxsize: int = DEFAULT_CACHE_SIZE) -> None:
+        if maxsize < 1:
+            raise ValueError("maxsize must be >= 1")
+        self.maxsize = maxsize
+        self._items: OrderedDict[str, Evaluator] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, node: Expr) -> Evaluator:
+        key = node.text
+        with self._lock:
+            ev = self._items.get(key)
+            if ev is not None:
+                self._items.move_to_end(key)
+                self._hits += 1
+                return ev
+            self._misses += 1
+        # build outside the lock; a racing thread may build the same entry
+        ev = _build(node)
+        with self._lock:
+            self._items[key] = ev
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return ev
+
+    def resize(self, maxsize: int) -> None:
+        if maxsize < 1:
+            raise ValueError("maxsize must be >= 1")
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._items) > maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._hits = 0
+            self._misses = 0
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(self._hits, self._misses, len(self._items), self.maxsize)
+
+
+def _indexing() -> bool:
+    cache = active_cache()
+    return cache is not None and cache.indexed
+
+
+def _build(node: Expr) -> Evaluator:
+    node = optimize(node)
+    report = analyze(node)
+    fn = compile_path(node) if report.native else None
+    if report.xpath1 and lxml_etree() is not None:
+        indexed = fn is not None and index_lookup(node) is not None
+        native_first = report.route(lxml_tree=True) == "native"
+        text = portable = lower(node, "xpath1").text
+        matchers = None
+        if report.multi_match and fn is None:
+            rewritten, matchers = extensions.rewrite(node)
+            text = lower(rewritten, "xpath1").text
+        return Evaluator(text, "lxml", fn, indexed, native_first, portable, matchers)
+    if elementpath_module() is not None or fn is not None:
+        return Evaluator(node.text, "elementpath", fn)
+    if lxml_etree() is not None:
+        lower(node, "xpath1")  # raises the LoweringError explaining why
+    raise ImportError("No XPath engine available: pip install lxml or elementpath")
+
+
+_cache = EvaluatorCache()
+_thread = threading.local()
+
+
+def _current() -> EvaluatorCache:
+    cache = getattr(_thread, "cache", None)
+    return _cache if cache is None else cache
+
+
+def thread_cache(maxsize: int = DEFAULT_CACHE_SIZE) -> EvaluatorCache:
+    """
+    Give the calling thread an evaluator cache of its own (idempotent), so
+    its Evaluators, and their lxml XPath objects, are never shared.
+    """
+    cache = getattr(_thread, "cache", None)
+    if cache is None:
+        cache = _thread.cache = EvaluatorCache(maxsize)
+    return cache
+
+
+def compile(path: Path | Pred | Expr | str) -> Evaluator:
+    """
+    Precompiled evaluator for a Path, Pred, expression node or raw XPath text.
+    Results are shared through the module-level cache (or the thread's own,
+    see thread_cache()).
+    """
+    node = path.node if isinstance(path, (Path, Pred)) else as_expr(path)
+    return _current().get(node)
+
+
+def compile_test(pred: Pred | Expr | str) -> Evaluator:
+    """
+    Precompiled boolean(pred), meant to be run per element via Evaluator.test().
+    """
+    node = pred.node if isinstance(pred, (Path, Pred)) else as_expr(pred)
+    return _current().get(Call("boolean", (node,)))
+
+
+def cache_stats() -> CacheStats:
+    return _current().stats()
+
+
+def clear_cache() -> None:
+    _current().clear()
+
+
+def set_cache_size(maxsize: int) -> None:
+    _current().resize(maxsize)
@@ -0,0 +1,569 @@
+"""
+Immutable expression tree behind Pred and Path.
+
+Builders compose nodes in O(1); text is produced by render() in a single
+iterative pass and memoized on the root node, so long chains stay linear
+and never hit the recursion limit.
+
+Nested and/or/union chains are flattened into one n-ary operator when
+rendered, and parentheses are only emitted where XPath precedence needs
+them.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, ClassVar, Iterator
+
+from xpath_builder.utils import quote, regex_trie
+
+_node = dataclass(frozen=True, eq=False, repr=False)
+
+# Binding strength, loosest first (XPath 2.0 grammar order).
+PREC_UNKNOWN = 0  # raw text we cannot see into
+PREC_SINGLE = 1  # some/every ... satisfies
+PREC_OR = 2
+PREC_AND = 3
+PREC_COMPARE = 4
+PREC_ADDITIVE = 5
+PREC_UNION = 6
+PREC_PATH = 7
+PREC_PRIMARY = 8
+
+_SIMPLE_RAW = re.compile(
+    r"""^(?:[@$]?[\w.*:-]+(?:\(\))?|'[^']*'|"[^"]*")$"""
+)
+
+
+class Expr:
+    """
+    Base class for expression nodes.
+    Equality and hashing go through the rendered text, which is computed
+    iteratively, so arbitrarily deep trees can be compared safely.
+    """
+
+    prec: ClassVar[int] = PREC_PRIMARY
+
+    def children(self) -> tuple["Expr", ...]:
+        return ()
+
+    def with_children(self, children: tuple["Expr", ...]) -> "Expr":
+        """Same node over new children (in children() order)."""
+        return self
+
+    def _parts(self) -> list["Expr | str"]:
+        raise NotImplementedError
+
+    @property
+    def text(self) -> str:
+        cached = self.__dict__.get("_text")
+        if cached is None:
+            cached = render(self)
+            object.__setattr__(self, "_text", cached)
+        return cached
+
+    def __str__(self) -> str:
+        return self.text
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.text!r})"
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Expr):
+            return NotImplemented
+        return type(self) is type(other) and self.text == other.text
+
+    def __hash__(self) -> int:
+        return hash((type(self).__name__, self.text))
+
+
+# ----- atoms -----
+
+
+@_node
+class Raw(Expr):
+    """Opaque XPath fragment, emitted verbatim."""
+
+    value: str
+
+    @property
+    def prec(self) -> int:  # type: ignore[override]
+        return PREC_PRIMARY if _SIMPLE_RAW.match(self.value) else PREC_UNKNOWN
+
+    def _parts(self) -> list["Expr | str"]:
+        return [self.value]
+
+
+@_node
+class Str(Expr):
+    """String literal; quoted on render."""
+
+    value: str
+
+    def _parts(self) -> list["Expr | str"]:
+        return [quote(self.value)]
+
+
+@_node
+class Num(Expr):
+    """Numeric literal."""
+
+    value: float
+
+    def _parts(self) -> list["Expr | str"]:
+        v = self.value
+        if v != v:  # NaN check
+            return ["NaN"]
+        if v == float("inf"):
+            return ["Infinity"]
+        if v == float("-inf"):
+            return ["-Infinity"]
+        return [str(v)]
+
+
+@_node
+class Attr(Expr):
+    """Attribute reference: @name (name may be '*')."""
+
+    name: str
+
+    def _parts(self) -> list["Expr | str"]:
+        return [f"@{self.name}"]
+
+
+@_node
+class Var(Expr):
+    """Variable reference: $name"""
+
+    name: str
+
+    def _parts(self) -> list["Expr | str"]:
+        return [f"${self.name}"]
+
+
+@_node
+class Context(Expr):
+    """Context item: ."""
+
+    def _parts(self) -> list["Expr | str"]:
+        return ["."]
+
+
+# ----- composites -----
+
+
+@_node
+class Call(Expr):
+    """Function call: name(arg, ...)"""
+
+    name: str
+    args: tuple[Expr, ...] = ()
+
+    def children(self) -> tuple[Expr, ...]:
+        return self.args
+
+    def with_children(self, children: tuple[Expr, ...]) -> Expr:
+        return Call(self.name, children)
+
+    def _parts(self) -> list["Expr | str"]:
+        return [self.name, "(", *_join(", ", self.args, PREC_SINGLE), ")"]
+
+
+@_node
+class Seq(Expr):
+    """Literal sequence: (a, b, ...)"""
+
+    items: tuple[Expr, ...]
+
+    def children(self) -> tuple[Expr, ...]:
+        return self.items
+
+    def with_children(self, children: tuple[Expr, ...]) -> Expr:
+        return Seq(children)
+
+    def _parts(self) -> list["Expr | str"]:
+        return ["(", *_join(", ", self.items, PREC_SINGLE), ")"]
+
+
+@_node
+class Compare(Expr):
+    """Comparison: lhs op rhs"""
+
+    prec: ClassVar[int] = PREC_COMPARE
+
+    lhs: Expr
+    op: str
+    rhs: Expr
+
+    def children(self) -> tuple[Expr, ...]:
+        return (self.lhs, self.rhs)
+
+    def with_children(self, children: tuple[Expr, ...]) -> Expr:
+        return Compare(children[0], self.op, children[1])
+
+    def _parts(self) -> list["Expr | str"]:
+        # comparisons are non-associative: nested ones always need parens
+        lhs = _wrap(self.lhs, PREC_COMPARE + 1)
+        return [*lhs, f" {self.op} ", *_wrap(self.rhs, PREC_COMPARE + 1)]
+
+
+@_node
+class Arith(Expr):
+    """Additive arithmetic: lhs + rhs, lhs - rhs"""
+
+    prec: ClassVar[int] = PREC_ADDITIVE
+
+    lhs: Expr
+    op: str
+    rhs: Expr
+
+    def children(self) -> tuple[Expr, ...]:
+        return (self.lhs, self.rhs)
+
+    def with_children(self, children: tuple[Expr, ...]) -> Expr:
+        return Arith(children[0], self.op, children[1])
+
+    def _parts(self) -> list["Expr | str"]:
+        # left-associative
+        lhs = _wrap(self.lhs, PREC_ADDITIVE)
+        return [*lhs, f" {self.op} ", *_wrap(self.rhs, PREC_ADDITIVE + 1)]
+
+
+def _reduce_flat(e: "And | Or") -> tuple[Any, ...]:
+    """
+    Pickle an and/or as one node over its flattened operands: a & b & c & ...
+    nests as deep as the chain is long, too deep for pickle's recursion.
+    """
+    return type(e), (flatten(e),)
+
+
+@_node
+class And(Expr):
+    """n-ary conjunction."""
+
+    prec: ClassVar[int] = PREC_AND
+
+    operands: tuple[Expr, ...]
+
+    def children(self) -> tuple[Expr, ...]:
+        return flatten(self)
+
+    def with_children(self, children: tuple[Expr, ...]) -> Expr:
+        return And(children)
+
+    def _parts(self) -> list["Expr | str"]:
+        return _join(" and ", flatten(self), PREC_AND + 1)
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        return _reduce_flat(self)
+
+
+@_node
+class Or(Expr):
+    """n-ary disjunction."""
+
+    prec: ClassVar[int] = PREC_OR
+
+    operands: tuple[Expr, ...]
+
+    def children(self) -> tuple[Expr, ...]:
+        return flatten(self)
+
+    def with_children(self, children: tuple[Expr, ...]) -> Expr:
+        return Or(children)
+
+    def _parts(self) -> list["Expr | str"]:
+        return _join(" or ", flatten(self), PREC_OR + 1)
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        return _reduce_flat(self)
+
+
+@_node
+class Not(Expr):
+    """Negation: not(operand)"""
+
+    operand: Expr
+
+    def children(self) -> tuple[Expr, ...]:
+        return (self.operand,)
+
+    def with_children(self, children: tuple[Expr, ...]) -> Expr:
+        return Not(children[0])
+
+    def _parts(self) -> list["Expr | str"]:
+        return ["not(", *_wrap(self.operand, PREC_SINGLE), ")"]
+
+
+@_node
+class Quantified(Expr):
+    """Quantified expression: some|every $var in domain satisfies cond"""
+
+    prec: ClassVar[int] = PREC_SINGLE
+
+    quantifier: str
+    var: str
+    domain: Expr
+    cond: Expr
+
+    def children(self) -> tuple[Expr, ...]:
+        return (self.domain, self.cond)
+
+    def with_children(self, children: tuple[Expr, ...]) -> Expr:
+        return Quantified(self.quantifier, self.var, children[0], children[1])
+
+    def _parts(self) -> list["Expr | str"]:
+        return [
+            f"{self.quantifier} ${self.var} in ",
+            *_wrap(self.domain, PREC_SINGLE),
+            " satisfies ",
+            *_wrap(self.cond, PREC_SINGLE),
+        ]
+
+
+@_node
+class TokenTest(Expr):
+    """
+    Whitespace-separated token test on an attribute such as @class.
+    Renders as matches(concat(' ', normalize-space(@attr), ' '), '\\stok\\s'),
+    with several tokens folded into one prefix-factored alternation.
+    """
+
+    attr: str
+    tokens: tuple[str, ...]
+    ci: bool = False
+
+    def source(self) -> Expr:
+        """concat(' ', normalize-space(@attr), ' ')"""
+        norm = Call("normalize-space", (Attr(self.attr),))
+        return Call("concat", (Str(" "), norm, Str(" ")))
+
+    def pattern(self) -> str:
+        return rf"\s{regex_trie(self.tokens)}\s"
+
+    def as_call(self) -> Call:
+        flags: tuple[Expr, ...] = (Str("i"),) if self.ci else ()
+        return Call("matches", (self.source(), Str(self.pattern()), *flags))
+
+    def _parts(self) -> list["Expr | str"]:
+        return [self.as_call()]
+
+
+# ----- paths -----
+
+
+@_node
+class Step(Expr):
+    """
+    Location step: base + sep + test, e.g. //div, a/b.
+    base is None for the first step of a path.
+    """
+
+    prec: ClassVar[int] = PREC_PATH
+
+    base: Expr | None
+    sep: str
+    test: str
+
+    def children(self) -> tuple[Expr, ...]:
+        return () if self.base is None else (self.base,)
+
+    def with_children(self, children: tuple[Expr, ...]) -> Expr:
+        return Step(children[0] if children else None, self.sep, self.test)
+
+    def _parts(self) -> list["Expr | str"]:
+        head = [] if self.base is None else _wrap_base(self.base)
+        return [*head, self.sep, self.test]
+
+
+@_node
+class Filter(Expr):
+    """Predicate filter: base[pred]"""
+
+    prec: ClassVar[int] = PREC_PATH
+
+    base: Expr
+    pred: Expr
+
+    def children(self) -> tuple[Expr, ...]:
+        return (self.base, self.pred)
+
+    def with_children(self, children: tuple[Expr, ...]) -> Expr:
+        return Filter(children[0], children[1])
+
+    def _parts(self) -> list["Expr | str"]:
+        return [*_wrap_base(self.base), "[", self.pred, "]"]
+
+
+@_node
+class Union(Expr):
+    """Path union: a | b | ..."""
+
+    prec: ClassVar[int] = PREC_UNION
+
+    operands: tuple[Expr, ...]
+
+    def children(self) -> tuple[Expr, ...]:
+        return flatten(self)
+
+    def with_children(self, children: tuple[Expr, ...]) -> Expr:
+        return Union(children)
+
+    def _parts(self) -> list["Expr | str"]:
+        return _join(" | ", flatten(self), PREC_UNION + 1)
+
+
+# ----- rendering -----
+
+
+def flatten(e: Expr) -> tuple[Expr, ...]:
+    """
+    Operands of an associative node with nested same-kind nodes spliced in,
+    e.g. And(And(a, b), c) -> (a, b, c). Other nodes flatten to themselves.
+    """
+    if not isinstance(e, (And, Or, Union)):
+        return (e,)
+    kind = type(e)
+    out: list[Expr] = []
+    stack: list[Expr] = [e]
+    while stack:
+        cur = stack.pop()
+        if type(cur) is kind:
+            stack.extend(reversed(cur.operands))  # type: ignore[attr-defined]
+        else:
+            out.append(cur)
+    return tuple(out)
+
+
+def _wrap(e: Expr, min_prec: int) -> list["Expr | str"]:
+    return ["(", e, ")"] if e.prec < min_prec else [e]
+
+
+def _wrap_base(e: Expr) -> list["Expr | str"]:
+    # Raw text in path position is taken to be a path and left as-is.
+    return [e] if isinstance(e, Raw) else _wrap(e, PREC_PATH)
+
+
+def _join(sep: str, operands: tuple[Expr, ...], min_prec: int) -> list["Expr | str"]:
+    out: list[Expr | str] = []
+    for i, e in enumerate(operands):
+        if i:
+            out.append(sep)
+        out.extend(_wrap(e, min_prec))
+    return out
+
+
+def render(root: Expr) -> str:
+    """Render a tree to XPath text without recursion."""
+    out: list[str] = []
+    stack: list[Expr | str] = [root]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            out.append(item)
+            continue
+        cached = item.__dict__.get("_text")
+        if cached is not None:
+            out.append(cached)
+        else:
+            stack.extend(reversed(item._parts()))
+    return "".join(out)
+
+
+def walk(root: Expr) -> Iterator[Expr]:
+    """Pre-order traversal of all nodes in the tree."""
+    stack: list[Expr] = [root]
+    while stack:
+        e = stack.pop()
+        yield e
+        stack.extend(reversed(e.children()))
+
+
+def rewrite(root: Expr, fn: Callable[[Expr], Expr]) -> Expr:
+    """
+    Bottom-up rebuild without recursion: fn sees each node after its
+    children were rewritten. Untouched subtrees are shared, not copied.
+    """
+    done: dict[int, Expr] = {}
+    stack: list[tuple[Expr, bool]] = [(root, False)]
+    while stack:
+        e, ready = stack.pop()
+        if ready:
+            kids = e.children()
+            new = tuple(done[id(k)] for k in kids)
+            changed = any(a is not b for a, b in zip(kids, new))
+            done[id(e)] = fn(e.with_children(new) if changed else e)
+        elif id(e) not in done:
+            stack.append((e, True))
+            stack.extend((k, False) for k in reversed(e.children()))
+    return done[id(root)]
+
+
+def hoist_quantifier(
+    parts: tuple[Expr, ...], join: type[And] | type[Or]
+) -> Expr | None:
+    """
+    Fuse per-token quantifiers over one domain into a single scan:
+      (some $a in D satisfies p) or (some $a in D satisfies q)
+        -> some $a in D satisfies (p or q)
+    and likewise 'every' under and. None if the parts do not line up.
+    """
+    quantifier = "some" if join is Or else "every"
+    first = parts[0]
+    if not isinstance(first, Quantified) or first.quantifier != quantifier:
+        return None
+    for p in parts[1:]:
+        if not (
+            isinstance(p, Quantified)
+            and p.quantifier == quantifier
+            and p.var == first.var
+            and p.domain == first.domain
+        ):
+            return None
+    conds = tuple(p.cond for p in parts)  # type: ignore[attr-defined]
+    return Quantified(quantifier, first.var, first.domain, join(conds))
+
+
+def as_expr(x: "Expr | str") -> Expr:
+    """Coerce plain XPath text to a Raw node."""
+    return x if isinstance(x, Expr) else Raw(x)
+
+
+TRUE = Call("true")
+FALSE = Call("false")
+
+
+# ----- dialect checks -----
+
+XPATH1_FUNCTIONS = frozenset(
+    {
+        "last", "position", "count", "id", "local-name", "namespace-uri",
+        "name", "string", "concat", "starts-with", "contains",
+        "substring-before", "substring-after", "substring", "string-length",
+        "normalize-space", "translate", "boolean", "not", "true", "false",
+        "lang", "number", "sum", "floor", "ceiling", "round",
+    }
+)  # fmt: skip
+_NODE_TYPES = frozenset({"node", "text", "comment", "processing-instruction"})
+_RAW_CALL = re.compile(r"([A-Za-z_][\w.-]*(?::[\w.-]+)?)\s*\(")
+_RAW_XPATH2 = re.compile(r"\b(?:some|every|for|if)\s*[$(]")
+
+
+def _raw_is_xpath1(text: str) -> bool:
+    if _RAW_XPATH2.search(text):
+        return False
+    return all(
+        name in XPATH1_FUNCTIONS or name in _NODE_TYPES
+        for name in _RAW_CALL.findall(text)
+    )
+
+
+def is_xpath1(root: Expr) -> bool:
+    """True if the tree only uses constructs available in XPath 1.0."""
+    for e in walk(root):
+        if isinstance(e, (Quantified, Seq)):
+            return False
+        if isinstance(e, Call) and e.name not in XPATH1_FUNCTIONS:
+            return False
+        if isinstance(e, Raw) and not _raw_is_xpath1(e.value):
+            return False
+    return True
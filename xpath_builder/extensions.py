@@ -0,0 +1,133 @@
+"""
+lxml (libxml2) extension functions for multi-literal string tests.
+
+XPath 1.0 can only spell "starts with any of these prefixes" as
+
+    starts-with(@id, 'a') or starts-with(@id, 'b') or ...
+
+which libxml2 evaluates one literal at a time. rewrite(node) replaces each
+such group of MULTI_MATCH_MIN or more starts-with / ends-with / contains
+tests on one operand by a single call
+
+    xb:starts-with-any(@id, '<key>')   xb:ends-with-any(...)   xb:contains-any(...)
+
+whose second argument names a prefix trie / Aho-Corasick automaton
+(xpath_builder.multimatch). rewrite() returns the matchers its calls name,
+and compile_xpath() binds the xb prefix and functions over exactly those,
+so they live as long as the XPath object, not in a global registry:
+
+    rewritten, matchers = rewrite(node)
+    xpath = compile_xpath(lower(rewritten, "xpath1").text, matchers)
+
+The engine does this for lxml trees when an expression has such a group but
+no native form; native evaluation builds the same matchers itself.
+"""
+
+import hashlib
+from typing import Any, Callable, Mapping, Sequence
+
+from xpath_builder.expr import Call, Expr, Or, Str, flatten, rewrite as _rewrite
+from xpath_builder.multimatch import AhoCorasick, PrefixTrie
+from xpath_builder.native import MULTI_MATCH_MIN, literal_groups, literal_test
+from xpath_builder.utils import lxml_etree
+
+NAMESPACE = "urn:xpath-builder:extensions"
+PREFIX = "xb"
+FUNCTIONS = frozenset(
+    f"{PREFIX}:{name}-any" for name in ("contains", "starts-with", "ends-with")
+)
+
+Matchers = Mapping[str, Callable[[str], bool]]
+
+
+def register(
+    function: str, literals: Sequence[str], matchers: dict[str, Callable[[str], bool]]
+) -> str:
+    """
+    Key of the matcher for function ('contains', 'starts-with' or
+    'ends-with') over literals, added to matchers unless already there.
+    Keys are derived from the content, so they are stable across processes.
+    """
+    unique = tuple(dict.fromkeys(literals))
+    payload = "\0".join((function, *unique)).encode()
+    key = hashlib.blake2b(payload, digest_size=12).hexdigest()
+    if key not in matchers:
+        if function == "contains":
+            matchers[key] = AhoCorasick(unique).search
+        else:
+            matchers[key] = PrefixTrie(unique, suffix=function == "ends-with").match
+    return key
+
+
+def _string(value: Any) -> str:
+    """XPath string() of an extension function argument."""
+    if isinstance(value, list):
+        if not value:
+            return ""
+        value = value[0]
+    if isinstance(value, str):
+        return value
+    if hasattr(value, "itertext"):
+        return "".join(value.itertext())
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def rewrite(root: Expr) -> tuple[Expr, dict[str, Callable[[str], bool]]]:
+    """
+    (root with large literal-test groups replaced by xb:*-any calls, the
+    matchers those calls name by key).
+    """
+    matchers: dict[str, Callable[[str], bool]] = {}
+    return _rewrite(root, lambda e: _rewrite_or(e, matchers)), matchers
+
+
+def _rewrite_or(e: Expr, matchers: dict[str, Callable[[str], bool]]) -> Expr:
+    if not isinstance(e, Or):
+        return e
+    groups = literal_groups(e)
+    if all(len(literals) < MULTI_MATCH_MIN for literals in groups.values()):
+        return e
+    out: list[Expr] = []
+    done: set[tuple[str, str]] = set()
+    for op in flatten(e):
+        found = literal_test(op)
+        if found is None:
+            out.append(op)
+            continue
+        name, subject, _ = found
+        key = (name, subject.text)
+        literals = groups[key]
+        if len(literals) < MULTI_MATCH_MIN:
+            out.append(op)
+        elif key not in done:
+            done.add(key)
+            ref = Str(register(name, literals, matchers))
+            out.append(Call(f"{PREFIX}:{name}-any", (subject, ref)))
+    return out[0] if len(out) == 1 else Or(tuple(out))
+
+
+def uses_extensions(expression: str) -> bool:
+    return f"{PREFIX}:" in expression
+
+
+def compile_xpath(
+    expression: str, matchers: Matchers, *, smart_strings: bool = True
+) -> Any:
+    """etree.XPath for expression with the xb functions bound over matchers."""
+    etree = lxml_etree()
+    if etree is None:
+        raise ImportError("lxml is not installed (pip install lxml)")
+
+    def any_(context: Any, value: Any, key: str) -> bool:
+        return matchers[str(key)](_string(value))
+
+    return etree.XPath(
+        expression,
+        namespaces={PREFIX: NAMESPACE},
+        extensions={(NAMESPACE, name.partition(":")[2]): any_ for name in FUNCTIONS},
+        smart_strings=smart_strings,
+    )
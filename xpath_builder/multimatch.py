@@ -0,0 +1,131 @@
+"""
+Multi-literal string tests whose cost does not grow with the literal count.
+
+contains(x, 'a') or contains(x, 'b') or ... reads x once per needle; an
+Aho-Corasick automaton reads it once whatever the number of needles. For
+starts-with / ends-with disjunctions a prefix trie (built over reversed
+suffixes for ends-with) walks at most len(x) nodes. Native evaluation
+(xpath_builder.native) and the lxml extension functions
+(xpath_builder.extensions) compile large disjunctions over one operand into
+these.
+
+    AhoCorasick(["ads", "advert", "sponsored"]).search("top-advert-slot")
+    PrefixTrie(["data-", "aria-"]).match("data-id")
+    PrefixTrie([".png", ".gif"], suffix=True).match("logo.gif")
+"""
+
+from collections import deque
+from typing import Any, Iterable
+
+_END = ""  # trie key marking the end of an affix (never a character)
+
+
+class AhoCorasick:
+    """
+    Multi-needle substring test, linear in the length of the searched text.
+    Transitions are resolved through the failure links on first use and
+    memoized, so a warm automaton costs one dict lookup per character.
+    """
+
+    __slots__ = ("needles", "_goto", "_fail", "_out", "_delta", "_empty")
+
+    def __init__(self, needles: Iterable[str]) -> None:
+        self.needles = tuple(dict.fromkeys(needles))
+        self._empty = "" in self.needles  # contains(x, '') always holds
+        goto: list[dict[str, int]] = [{}]
+        out = [False]
+        for needle in self.needles:
+            state = 0
+            for ch in needle:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = goto[state][ch] = len(goto)
+                    goto.append({})
+                    out.append(False)
+                state = nxt
+            out[state] = True
+        # breadth-first, so a state's failure target is final before its
+        # children are linked
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt] = out[nxt] or out[fail[nxt]]
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+        self._delta = [dict(g) for g in goto]
+
+    def __len__(self) -> int:
+        return len(self.needles)
+
+    def _step(self, state: int, ch: str) -> int:
+        goto, fail = self._goto, self._fail
+        s = state
+        while True:
+            nxt = goto[s].get(ch)
+            if nxt is not None:
+                break
+            if not s:
+                nxt = 0
+                break
+            s = fail[s]
+        self._delta[state][ch] = nxt
+        return nxt
+
+    def search(self, text: str) -> bool:
+        """True if any needle occurs in text."""
+        if self._empty:
+            return True
+        delta, out = self._delta, self._out
+        state = 0
+        for ch in text:
+            nxt = delta[state].get(ch)
+            state = self._step(state, ch) if nxt is None else nxt
+            if out[state]:
+                return True
+        return False
+
+
+class PrefixTrie:
+    """
+    Does a string start (suffix=True: end) with any of the given affixes?
+    One dict step per character, stopping at the first complete affix or
+    missing branch, so at most len(text) steps whatever the affix count.
+    """
+
+    __slots__ = ("affixes", "suffix", "_root", "_empty")
+
+    def __init__(self, affixes: Iterable[str], *, suffix: bool = False) -> None:
+        self.affixes = tuple(dict.fromkeys(affixes))
+        self.suffix = suffix
+        self._empty = "" in self.affixes  # every string starts with ''
+        root: dict[str, Any] = {}
+        for affix in self.affixes:
+            node = root
+            for ch in reversed(affix) if suffix else affix:
+                node = node.setdefault(ch, {})
+            node[_END] = True
+        self._root = root
+
+    def __len__(self) -> int:
+        return len(self.affixes)
+
+    def match(self, text: str) -> bool:
+        """True if text starts (or ends) with one of the affixes."""
+        if self._empty:
+            return True
+        node = self._root
+        for ch in reversed(text) if self.suffix else text:
+            node = node.get(ch)
+            if node is None:
+                return False
+            if _END in node:
+                return True
+        return False
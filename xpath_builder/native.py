@@ -0,0 +1,1142 @@
+"""
+Native evaluation: compile a Pred or Path tree into plain Python closures.
+
+When the elements are already parsed (xml.etree or lxml), skipping the XPath
+engine is cheaper than any cached evaluator: attribute tests become el.get()
+calls, token tests and in_() become frozenset lookups, and matches() runs a
+precompiled re pattern.
+
+    keep = compile_pred(Pred.attr("class").contains_tokens.any_of("ad", "ads"))
+    hits = [el for el in root.iter() if keep(el)]
+
+    find = compile_path(STAR.any().where(pred))
+    find(doc)  # same elements as the XPath evaluator, in document order
+
+Covered: attribute and string-value comparisons, and/or/not, contains,
+starts-with, ends-with, matches, token tests, lower-case/upper-case,
+normalize-space, string-length, number, position()/last() in path filters,
+and some/every over @* or literal sequences. Anything else raises
+UnsupportedExpression, so callers can fall back to xpath_builder.engine.
+contains / starts-with / ends-with tests of one operand against many
+literals (contains.any_of, startswith.any_of, ...) read the operand once;
+from MULTI_MATCH_MIN literals on they run through an Aho-Corasick automaton
+or a prefix/suffix trie (xpath_builder.multimatch), so their cost no longer
+grows with the number of literals.
+
+string-values, their normalized and lower-cased forms and token lists are
+read through the active xpath_builder.doccache scope when there is one, so
+predicates evaluated over the same document share them; compiled paths open
+such a scope for each call. In an indexed scope, //test[...] paths whose
+predicate has an attribute token/value/prefix test only check the candidates
+the attribute index returns (see xpath_builder.attrindex).
+"""
+
+import math
+import operator
+import re
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator, Literal
+
+from xpath_builder.attrindex import Lookup, lookup
+from xpath_builder.doccache import DocumentCache, active_cache, document_cache
+from xpath_builder.expr import (
+    And,
+    Arith,
+    Attr,
+    Call,
+    Compare,
+    Context,
+    Expr,
+    Filter,
+    Not,
+    Num,
+    Or,
+    Quantified,
+    Seq,
+    Step,
+    Str,
+    TokenTest,
+    Var,
+    as_expr,
+    flatten,
+    walk,
+)
+from xpath_builder.multimatch import AhoCorasick, PrefixTrie
+
+if TYPE_CHECKING:
+    from xpath_builder.core import Path, Pred
+
+# value kinds, fixed at compile time:
+#   attr  str | None (a single attribute node, or none)
+#   nodes list of elements / _AttrNode
+#   node  the context element
+#   str, num, bool: atomic values
+#   seq   tuple of atomics (literal sequence)
+#   any   decided at run time (variables)
+Kind = Literal["attr", "nodes", "node", "str", "num", "bool", "seq", "any"]
+Fn = Callable[[Any, "_Ctx"], Any]
+
+# literals per operand from which an automaton / trie beats `in`, startswith
+MULTI_MATCH_MIN = 24
+_LITERAL_TESTS = frozenset({"contains", "starts-with", "ends-with"})
+
+_WS = re.compile(r"[ \t\r\n]+")
+_NUMBER = re.compile(r"^[ \t\r\n]*-?(\d+(\.\d*)?|\.\d+)([eE][+-]?\d+)?[ \t\r\n]*$")
+_NAME = re.compile(r"^[A-Za-z_][\w.-]*$")
+_REGEX_FLAGS = {"i": re.IGNORECASE, "s": re.DOTALL, "m": re.MULTILINE, "x": re.VERBOSE}
+_COMPARE = {
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+class UnsupportedExpression(ValueError):
+    """Raised when an expression has no native compilation."""
+
+
+@dataclass(frozen=True, slots=True)
+class _Ctx:
+    position: int = 1
+    size: int = 1
+    vars: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass(frozen=True, slots=True)
+class _AttrNode:
+    name: str
+    value: str
+
+
+_NO_CTX = _Ctx()
+
+
+# ----- value helpers -----
+
+
+def string_value(el: Any) -> str:
+    """XPath string-value of an element: its descendant text, comments excluded."""
+    cache = active_cache()
+    if cache is not None:
+        return cache.string_value(el)
+    if hasattr(el, "getroottree"):
+        return "".join(el.itertext())  # lxml already skips comments and PIs
+    parts: list[str] = []
+    stack: list[tuple[Any, bool]] = [(el, False)]
+    while stack:
+        node, tail = stack.pop()
+        if tail:
+            if node.tail:
+                parts.append(node.tail)
+            continue
+        if isinstance(node.tag, str) and node.text:
+            parts.append(node.text)
+        for child in reversed(node):
+            stack.append((child, True))
+            stack.append((child, False))
+    return "".join(parts)
+
+
+def _normalized(el: Any) -> str:
+    cache = active_cache()
+    if cache is not None:
+        return cache.normalized(el)
+    return _WS.sub(" ", string_value(el)).strip(" ")
+
+
+def _lowered(el: Any) -> str:
+    cache = active_cache()
+    if cache is not None:
+        return cache.lowered(el)
+    return string_value(el).lower()
+
+
+def _normalized_lower(el: Any) -> str:
+    cache = active_cache()
+    if cache is not None:
+        return cache.normalized_lower(el)
+    return _normalized(el).lower()
+
+
+def _context_text(e: Expr) -> str | None:
+    """
+    "string" / "normalized" if e is the context node's string-value, plain or
+    normalize-space()d: forms the document cache memoizes.
+    """
+    if isinstance(e, Context):
+        return "string"
+    if isinstance(e, Call) and len(e.args) <= 1:
+        inner = _context_text(e.args[0]) if e.args else "string"
+        if e.name == "string" and inner == "string":
+            return "string"
+        if e.name == "normalize-space" and inner == "string":
+            return "normalized"
+    return None
+
+
+def _local(name: str) -> str:
+    return name.rpartition("}")[2]
+
+
+def _node_string(n: Any) -> str:
+    return n.value if isinstance(n, _AttrNode) else string_value(n)
+
+
+def _node_name(n: Any) -> str:
+    return _local(n.name if isinstance(n, _AttrNode) else n.tag)
+
+
+def _parse_number(s: str) -> float:
+    return float(s) if _NUMBER.match(s) else math.nan
+
+
+def _number(v: Any) -> float:
+    if isinstance(v, bool):
+        return float(v)
+    if isinstance(v, float):
+        return v
+    if isinstance(v, str):
+        return _parse_number(v)
+    return _parse_number(_string(v))
+
+
+def format_number(v: float) -> str:
+    """
+    string() of a double as XPath 2.0 writes it: integral values without a
+    fraction, INF / -INF / NaN (libxml2's XPath 1.0 says Infinity).
+    """
+    if v != v:
+        return "NaN"
+    if math.isinf(v):
+        return "INF" if v > 0 else "-INF"
+    return str(int(v)) if v == int(v) else repr(v)
+
+
+def _string(v: Any) -> str:
+    """string() of a run-time value (variables bound by some/every)."""
+    if isinstance(v, str):
+        return v
+    if isinstance(v, bool):
+        return "true" if v else "false"
+    if isinstance(v, float):
+        return format_number(v)
+    if v is None:
+        return ""
+    if isinstance(v, (list, tuple)):
+        return _string(v[0]) if v else ""
+    return _node_string(v)
+
+
+def _atoms_of(v: Any) -> tuple:
+    if v is None:
+        return ()
+    if isinstance(v, (list, tuple)):
+        return tuple(x if isinstance(x, (str, float)) else _node_string(x) for x in v)
+    if isinstance(v, (str, float)):
+        return (v,)
+    return (_node_string(v),)
+
+
+def _truthy(v: Any) -> bool:
+    if v is None:
+        return False
+    if isinstance(v, float):
+        return v == v and v != 0
+    if isinstance(v, (str, bool, list, tuple)):
+        return bool(v)
+    return True  # a node
+
+
+def _div(x: float, y: float) -> float:
+    if y == 0:
+        if x == 0 or x != x:
+            return math.nan
+        return math.copysign(math.inf, x) * math.copysign(1.0, y)
+    return x / y
+
+
+def _mod(x: float, y: float) -> float:
+    if y == 0 or math.isinf(x) or x != x or y != y:
+        return math.nan
+    return math.fmod(x, y)
+
+
+_ARITH = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "div": _div,
+    "mod": _mod,
+}
+
+
+def _round(x: float) -> float:
+    return math.floor(x + 0.5) if math.isfinite(x) else x
+
+
+def _substring(s: str, start: float, length: float | None = None) -> str:
+    lo = _round(start)
+    hi = math.inf if length is None else lo + _round(length)
+    if lo != lo or hi != hi:
+        return ""
+    lo, hi = max(lo, 1), min(hi, len(s) + 1)
+    return s[int(lo) - 1 : int(hi) - 1] if hi > lo else ""
+
+
+def _translate_table(src: str, dst: str) -> dict[int, int | None]:
+    table: dict[int, int | None] = {}
+    for i, ch in enumerate(src):
+        table.setdefault(ord(ch), ord(dst[i]) if i < len(dst) else None)
+    return table
+
+
+def _regex(pattern: str, flags: str) -> re.Pattern[str]:
+    if set(flags) - set(_REGEX_FLAGS):
+        raise UnsupportedExpression(f"regex flags {flags!r}")
+    if "-[" in pattern:
+        raise UnsupportedExpression(f"XSD character class subtraction: {pattern!r}")
+    bits = 0
+    for f in flags:
+        bits |= _REGEX_FLAGS[f]
+    source = pattern if "m" in flags else _end_anchored(pattern)
+    try:
+        return re.compile(source, bits)
+    except re.error as exc:
+        raise UnsupportedExpression(f"regex {pattern!r}: {exc}") from None
+
+
+def _end_anchored(pattern: str) -> str:
+    """
+    pattern with each $ anchor as \\Z: outside multi-line mode an XSD $
+    matches only at the very end, a Python $ also before a final newline.
+    """
+    out: list[str] = []
+    in_class = escaped = False
+    for ch in pattern:
+        if escaped:
+            escaped = False
+        elif ch == "\\":
+            escaped = True
+        elif in_class:
+            in_class = ch != "]"
+        elif ch == "[":
+            in_class = True
+        elif ch == "$":
+            ch = "\\Z"
+        out.append(ch)
+    return "".join(out)
+
+
+# ----- coercions -----
+
+
+def _as_bool(fn: Fn, kind: Kind) -> Fn:
+    if kind == "bool":
+        return fn
+    if kind == "attr":
+        return lambda el, ctx: fn(el, ctx) is not None
+    if kind == "node":
+        return lambda el, ctx: True
+    if kind in ("num", "any"):
+        return lambda el, ctx: _truthy(fn(el, ctx))
+    return lambda el, ctx: bool(fn(el, ctx))
+
+
+def _as_str(fn: Fn, kind: Kind) -> Fn:
+    if kind == "str":
+        return fn
+    if kind == "attr":
+        return lambda el, ctx: fn(el, ctx) or ""
+    if kind == "node":
+        return lambda el, ctx: string_value(fn(el, ctx))
+    if kind == "nodes":
+        return lambda el, ctx: _node_string(ns[0]) if (ns := fn(el, ctx)) else ""
+    return lambda el, ctx: _string(fn(el, ctx))
+
+
+def _as_num(fn: Fn, kind: Kind) -> Fn:
+    if kind == "num":
+        return fn
+    if kind == "bool":
+        return lambda el, ctx: float(fn(el, ctx))
+    text = _as_str(fn, kind)
+    return lambda el, ctx: _parse_number(text(el, ctx))
+
+
+def _as_atoms(fn: Fn, kind: Kind) -> Fn:
+    if kind == "seq":
+        return fn
+    if kind in ("str", "num"):
+        return lambda el, ctx: (fn(el, ctx),)
+    if kind == "attr":
+        return lambda el, ctx: () if (v := fn(el, ctx)) is None else (v,)
+    if kind == "node":
+        return lambda el, ctx: (string_value(fn(el, ctx)),)
+    return lambda el, ctx: _atoms_of(fn(el, ctx))
+
+
+def _as_items(fn: Fn, kind: Kind, attr: str | None) -> Fn:
+    """Domain of some/every: a sequence of nodes or atomics."""
+    if kind in ("nodes", "seq"):
+        return fn
+    if kind == "attr" and attr is not None:
+        return lambda el, ctx: (
+            () if (v := fn(el, ctx)) is None else (_AttrNode(attr, v),)
+        )
+    raise UnsupportedExpression(f"quantifier domain of kind {kind}")
+
+
+def _as_node(fn: Fn, kind: Kind) -> Fn:
+    if kind == "node":
+        return fn
+    if kind in ("nodes", "any"):
+
+        def first(el: Any, ctx: _Ctx) -> Any:
+            v = fn(el, ctx)
+            if isinstance(v, list):
+                return v[0] if v else None
+            return v if v is not None and not isinstance(v, (str, float)) else None
+
+        return first
+    raise UnsupportedExpression(f"node expected, got {kind}")
+
+
+# ----- compiler -----
+
+
+def _literal(e: Expr) -> str | float:
+    if isinstance(e, Num):
+        return float(e.value)
+    assert isinstance(e, Str)
+    return e.value
+
+
+def _const(value: Any) -> Fn:
+    return lambda el, ctx: value
+
+
+def _compile(e: Expr, scope: frozenset[str]) -> tuple[Fn, Kind]:
+    if isinstance(e, Str):
+        return _const(e.value), "str"
+    if isinstance(e, Num):
+        return _const(float(e.value)), "num"
+    if isinstance(e, Attr):
+        return _compile_attr(e.name)
+    if isinstance(e, Context):
+        return (lambda el, ctx: el), "node"
+    if isinstance(e, Var):
+        if e.name not in scope:
+            raise UnsupportedExpression(f"unbound variable ${e.name}")
+        name = e.name
+        return (lambda el, ctx: ctx.vars[name]), "any"
+    if isinstance(e, Seq):
+        if not all(isinstance(i, (Str, Num)) for i in e.items):
+            raise UnsupportedExpression(f"non-literal sequence {e.text}")
+        items = tuple(_literal(i) for i in e.items)
+        return _const(items), "seq"
+    if isinstance(e, And):
+        return _all([_bool(op, scope) for op in flatten(e)]), "bool"
+    if isinstance(e, Or):
+        return _compile_or(e, scope), "bool"
+    if isinstance(e, Not):
+        f = _bool(e.operand, scope)
+        return (lambda el, ctx: not f(el, ctx)), "bool"
+    if isinstance(e, Compare):
+        return _compile_compare(e, scope), "bool"
+    if isinstance(e, Arith):
+        return _compile_arith(e, scope), "num"
+    if isinstance(e, TokenTest):
+        return _compile_tokens(e), "bool"
+    if isinstance(e, Quantified):
+        return _compile_quantified(e, scope), "bool"
+    if isinstance(e, Call):
+        return _compile_call(e, scope)
+    raise UnsupportedExpression(f"{type(e).__name__} is not supported: {e.text}")
+
+
+def _bool(e: Expr, scope: frozenset[str]) -> Fn:
+    return _as_bool(*_compile(e, scope))
+
+
+def _str(e: Expr, scope: frozenset[str]) -> Fn:
+    return _as_str(*_compile(e, scope))
+
+
+def _num(e: Expr, scope: frozenset[str]) -> Fn:
+    return _as_num(*_compile(e, scope))
+
+
+def _all(fs: list[Fn]) -> Fn:
+    if len(fs) == 1:
+        return fs[0]
+    if len(fs) == 2:
+        a, b = fs
+        return lambda el, ctx: a(el, ctx) and b(el, ctx)
+
+    def f(el: Any, ctx: _Ctx) -> bool:
+        for g in fs:
+            if not g(el, ctx):
+                return False
+        return True
+
+    return f
+
+
+def _any(fs: list[Fn]) -> Fn:
+    if len(fs) == 1:
+        return fs[0]
+    if len(fs) == 2:
+        a, b = fs
+        return lambda el, ctx: a(el, ctx) or b(el, ctx)
+
+    def f(el: Any, ctx: _Ctx) -> bool:
+        for g in fs:
+            if g(el, ctx):
+                return True
+        return False
+
+    return f
+
+
+def _string_literal(e: Expr) -> str | None:
+    """Value of 'lit', lower-case('lit') or upper-case('lit')."""
+    if isinstance(e, Str):
+        return e.value
+    if isinstance(e, Call) and len(e.args) == 1 and isinstance(e.args[0], Str):
+        if e.name == "lower-case":
+            return e.args[0].value.lower()
+        if e.name == "upper-case":
+            return e.args[0].value.upper()
+    return None
+
+
+def literal_test(e: Expr) -> tuple[str, Expr, str] | None:
+    """(function, operand, literal) for contains/starts-with/ends-with tests."""
+    if isinstance(e, Call) and e.name in _LITERAL_TESTS and len(e.args) == 2:
+        literal = _string_literal(e.args[1])
+        if literal is not None:
+            return e.name, e.args[0], literal
+    return None
+
+
+def literal_groups(e: Or) -> dict[tuple[str, str], list[str]]:
+    """
+    {(function, operand text): literals} over the contains / starts-with /
+    ends-with operands of e, in operand order.
+    """
+    groups: dict[tuple[str, str], list[str]] = {}
+    for op in flatten(e):
+        if (found := literal_test(op)) is not None:
+            groups.setdefault((found[0], found[1].text), []).append(found[2])
+    return groups
+
+
+def _compile_or(e: Or, scope: frozenset[str]) -> Fn:
+    """
+    Like _any, but the contains / starts-with / ends-with tests of one operand
+    against literals become one multi-literal test, placed where the first of
+    them was.
+    """
+    groups = literal_groups(e)
+    fns: list[Fn] = []
+    for op in flatten(e):
+        found = literal_test(op)
+        if found is None:
+            fns.append(_bool(op, scope))
+            continue
+        name, subject, _ = found
+        group = groups.pop((name, subject.text), None)
+        if group is None:
+            continue  # merged into an earlier test
+        if len(group) == 1:
+            fns.append(_bool(op, scope))
+        else:
+            fns.append(_compile_literal_any(name, subject, group, scope))
+    return _any(fns)
+
+
+def uses_multi_match(root: Expr) -> bool:
+    """
+    True if an or in root has MULTI_MATCH_MIN contains / starts-with /
+    ends-with literals on one operand (see xpath_builder.multimatch).
+    """
+    return any(
+        len(literals) >= MULTI_MATCH_MIN
+        for e in walk(root)
+        if isinstance(e, Or)
+        for literals in literal_groups(e).values()
+    )
+
+
+def _compile_literal_any(
+    name: str, subject: Expr, literals: list[str], scope: frozenset[str]
+) -> Fn:
+    s = _str(subject, scope)
+    unique = tuple(dict.fromkeys(literals))
+    if name == "contains":
+        if len(unique) >= MULTI_MATCH_MIN:
+            search = AhoCorasick(unique).search
+            return lambda el, ctx: search(s(el, ctx))
+
+        def contains_any(el: Any, ctx: _Ctx) -> bool:
+            v = s(el, ctx)
+            for needle in unique:
+                if needle in v:
+                    return True
+            return False
+
+        return contains_any
+    if len(unique) >= MULTI_MATCH_MIN:
+        match = PrefixTrie(unique, suffix=name == "ends-with").match
+        return lambda el, ctx: match(s(el, ctx))
+    if name == "starts-with":
+        return lambda el, ctx: s(el, ctx).startswith(unique)
+    return lambda el, ctx: s(el, ctx).endswith(unique)
+
+
+def _compile_attr(name: str) -> tuple[Fn, Kind]:
+    if name == "*":
+        return (
+            lambda el, ctx: [_AttrNode(k, v) for k, v in el.attrib.items()]
+        ), "nodes"
+    if not _NAME.match(name):
+        raise UnsupportedExpression(f"attribute name @{name}")
+    return (lambda el, ctx: el.get(name)), "attr"
+
+
+def _compile_compare(e: Compare, scope: frozenset[str]) -> Fn:
+    pyop = _COMPARE[e.op]
+    lhs, rhs = e.lhs, e.rhs
+    if isinstance(rhs, Attr) and not isinstance(lhs, Attr):
+        lhs, rhs = rhs, lhs
+        pyop = _COMPARE[{"<": ">", "<=": ">=", ">": "<", ">=": "<="}.get(e.op, e.op)]
+    # fast paths: @a = 'x', @a != 'x', @a = ('x', 'y')
+    if isinstance(lhs, Attr) and lhs.name != "*" and _NAME.match(lhs.name):
+        name = lhs.name
+        if isinstance(rhs, Str) and e.op in ("=", "!="):
+            v = rhs.value
+            if e.op == "=":
+                return lambda el, ctx: el.get(name) == v
+            return lambda el, ctx: (x := el.get(name)) is not None and x != v
+        if isinstance(rhs, Seq) and e.op == "=" and all(
+            isinstance(i, Str) for i in rhs.items
+        ):
+            values = frozenset(i.value for i in rhs.items)  # type: ignore[attr-defined]
+            return lambda el, ctx: el.get(name) in values
+
+    lf, lk = _compile(lhs, scope)
+    rf, rk = _compile(rhs, scope)
+    if "bool" in (lk, rk):
+        lb, rb = _as_bool(lf, lk), _as_bool(rf, rk)
+        return lambda el, ctx: pyop(lb(el, ctx), rb(el, ctx))
+    # <, <=, >, >= compare numbers, as in XPath 1.0, even between strings
+    numeric = e.op not in ("=", "!=")
+    if lk == "str" and rk == "str" and not numeric:
+        return lambda el, ctx: pyop(lf(el, ctx), rf(el, ctx))
+    if {lk, rk} <= {"num", "str"}:
+        ln, rn = _as_num(lf, lk), _as_num(rf, rk)
+        return lambda el, ctx: pyop(ln(el, ctx), rn(el, ctx))
+    la, ra = _as_atoms(lf, lk), _as_atoms(rf, rk)
+
+    def general(el: Any, ctx: _Ctx) -> bool:
+        rs = ra(el, ctx)
+        for a in la(el, ctx):
+            for b in rs:
+                if isinstance(a, str) and isinstance(b, str) and not numeric:
+                    if pyop(a, b):
+                        return True
+                elif pyop(_number(a), _number(b)):
+                    return True
+        return False
+
+    return general
+
+
+def _compile_arith(e: Arith, scope: frozenset[str]) -> Fn:
+    if e.op not in _ARITH:
+        raise UnsupportedExpression(f"operator {e.op}")
+    op = _ARITH[e.op]
+    a, b = _num(e.lhs, scope), _num(e.rhs, scope)
+    return lambda el, ctx: op(a(el, ctx), b(el, ctx))
+
+
+def _compile_tokens(e: TokenTest) -> Fn:
+    if not _NAME.match(e.attr):
+        raise UnsupportedExpression(f"token test on @{e.attr}")
+    name, ci = e.attr, e.ci
+    wanted = [t.lower() if ci else t for t in e.tokens]
+    # '' or 'a b' is no single token: like the XPath pattern, find it in
+    # ' normalized value ' (so '' holds when the value is empty or missing)
+    tokens = frozenset(t for t in wanted if t and not _WS.search(t))
+    phrases = tuple(f" {t} " for t in wanted if t not in tokens)
+
+    def has_phrase(el: Any) -> bool:
+        v = el.get(name) or ""
+        text = f" {_WS.sub(' ', v).strip(' ')} "
+        if ci:
+            text = text.lower()
+        return any(p in text for p in phrases)
+
+    def has_token(el: Any, ctx: _Ctx) -> bool:
+        cache = active_cache()
+        if cache is not None:
+            if not tokens.isdisjoint(cache.tokens(el, name, ci)):
+                return True
+        else:
+            v = el.get(name)
+            if v is not None and not tokens.isdisjoint(
+                _WS.split(v.lower() if ci else v)
+            ):
+                return True
+        return bool(phrases) and has_phrase(el)
+
+    return has_token
+
+
+def _compile_quantified(e: Quantified, scope: frozenset[str]) -> Fn:
+    dom_fn, dom_kind = _compile(e.domain, scope)
+    attr = e.domain.name if isinstance(e.domain, Attr) else None
+    items = _as_items(dom_fn, dom_kind, attr)
+    cond = _bool(e.cond, scope | {e.var})
+    var, some = e.var, e.quantifier == "some"
+
+    def quantified(el: Any, ctx: _Ctx) -> bool:
+        for item in items(el, ctx):
+            inner = _Ctx(ctx.position, ctx.size, {**ctx.vars, var: item})
+            if cond(el, inner) == some:
+                return some
+        return not some
+
+    return quantified
+
+
+def _string_arg(args: tuple[Expr, ...], scope: frozenset[str]) -> Fn:
+    """First argument as a string, defaulting to the context node."""
+    if not args:
+        return lambda el, ctx: string_value(el)
+    return _str(args[0], scope)
+
+
+def _compile_call(e: Call, scope: frozenset[str]) -> tuple[Fn, Kind]:
+    name, args = e.name, e.args
+    n = len(args)
+    if name in ("true", "false") and n == 0:
+        return _const(name == "true"), "bool"
+    if name == "not" and n == 1:
+        f = _bool(args[0], scope)
+        return (lambda el, ctx: not f(el, ctx)), "bool"
+    if name == "boolean" and n == 1:
+        return _bool(args[0], scope), "bool"
+    if name == "position" and n == 0:
+        return (lambda el, ctx: float(ctx.position)), "num"
+    if name == "last" and n == 0:
+        return (lambda el, ctx: float(ctx.size)), "num"
+    if name == "string" and n <= 1:
+        return _string_arg(args, scope), "str"
+    if name == "normalize-space" and n <= 1:
+        if _context_text(e) == "normalized":
+            return (lambda el, ctx: _normalized(el)), "str"
+        s = _string_arg(args, scope)
+        return (lambda el, ctx: _WS.sub(" ", s(el, ctx)).strip(" ")), "str"
+    if name == "string-length" and n <= 1:
+        s = _string_arg(args, scope)
+        return (lambda el, ctx: float(len(s(el, ctx)))), "num"
+    if name in ("lower-case", "upper-case") and n == 1:
+        if isinstance(args[0], Str):
+            value = args[0].value
+            folded = value.lower() if name == "lower-case" else value.upper()
+            return _const(folded), "str"
+        text = _context_text(args[0])
+        if name == "lower-case" and text is not None:
+            lowered = _lowered if text == "string" else _normalized_lower
+            return (lambda el, ctx: lowered(el)), "str"
+        s = _str(args[0], scope)
+        if name == "lower-case":
+            return (lambda el, ctx: s(el, ctx).lower()), "str"
+        return (lambda el, ctx: s(el, ctx).upper()), "str"
+    if name in ("contains", "starts-with", "ends-with") and n == 2:
+        return _compile_substring_test(name, args, scope), "bool"
+    if name == "concat" and n >= 2:
+        parts = [_str(a, scope) for a in args]
+        return (lambda el, ctx: "".join(p(el, ctx) for p in parts)), "str"
+    if name == "number" and n <= 1:
+        if not args:
+            return (lambda el, ctx: _parse_number(string_value(el))), "num"
+        return _num(args[0], scope), "num"
+    if name == "substring" and n in (2, 3):
+        s, start = _str(args[0], scope), _num(args[1], scope)
+        if n == 2:
+            return (lambda el, ctx: _substring(s(el, ctx), start(el, ctx))), "str"
+        length = _num(args[2], scope)
+        return (
+            lambda el, ctx: _substring(s(el, ctx), start(el, ctx), length(el, ctx))
+        ), "str"
+    if name == "translate" and n == 3 and all(isinstance(a, Str) for a in args[1:]):
+        s = _str(args[0], scope)
+        src, dst = args[1].value, args[2].value  # type: ignore[attr-defined]
+        table = _translate_table(src, dst)
+        return (lambda el, ctx: s(el, ctx).translate(table)), "str"
+    if name == "matches" and n in (2, 3) and all(isinstance(a, Str) for a in args[1:]):
+        s = _str(args[0], scope)
+        flags = args[2].value if n == 3 else ""  # type: ignore[attr-defined]
+        search = _regex(args[1].value, flags).search  # type: ignore[attr-defined]
+        return (lambda el, ctx: search(s(el, ctx)) is not None), "bool"
+    if name in ("local-name", "name") and n <= 1:
+        if not args:
+            return (lambda el, ctx: _local(el.tag)), "str"
+        node = _as_node(*_compile(args[0], scope))
+        return (
+            lambda el, ctx: "" if (x := node(el, ctx)) is None else _node_name(x)
+        ), "str"
+    if name == "count" and n == 1:
+        f, kind = _compile(args[0], scope)
+        if kind == "attr":
+            return (lambda el, ctx: 0.0 if f(el, ctx) is None else 1.0), "num"
+        if kind in ("nodes", "seq"):
+            return (lambda el, ctx: float(len(f(el, ctx)))), "num"
+    raise UnsupportedExpression(f"{name}() with {n} argument(s) is not supported")
+
+
+def _compile_substring_test(
+    name: str, args: tuple[Expr, ...], scope: frozenset[str]
+) -> Fn:
+    s = _str(args[0], scope)
+    if isinstance(args[1], Str):
+        needle = args[1].value
+        if name == "contains":
+            return lambda el, ctx: needle in s(el, ctx)
+        if name == "starts-with":
+            return lambda el, ctx: s(el, ctx).startswith(needle)
+        return lambda el, ctx: s(el, ctx).endswith(needle)
+    t = _str(args[1], scope)
+    if name == "contains":
+        return lambda el, ctx: t(el, ctx) in s(el, ctx)
+    if name == "starts-with":
+        return lambda el, ctx: s(el, ctx).startswith(t(el, ctx))
+    return lambda el, ctx: s(el, ctx).endswith(t(el, ctx))
+
+
+def _uses_position(e: Expr) -> bool:
+    return isinstance(e, Num) or any(
+        isinstance(n, Call) and n.name in ("position", "last") for n in walk(e)
+    )
+
+
+def _filter_fn(pred: Expr) -> Fn:
+    fn, kind = _compile(pred, frozenset())
+    if kind == "num":
+        # [n] is [position() = n]
+        return lambda el, ctx: ctx.position == fn(el, ctx)
+    return _as_bool(fn, kind)
+
+
+def compile_pred(pred: "Pred | Expr | str") -> Callable[[Any], bool]:
+    """
+    fn(element) -> bool for a context-free predicate.
+    Raises UnsupportedExpression for constructs without a native form,
+    including position()/last(), which only mean something inside a path.
+    """
+    node = as_expr(getattr(pred, "node", pred))
+    if _uses_position(node):
+        raise UnsupportedExpression(f"positional predicate needs a path: {node.text}")
+    fn = _as_bool(*_compile(node, frozenset()))
+    return lambda el: fn(el, _NO_CTX)
+
+
+# ----- paths -----
+
+
+@dataclass(frozen=True)
+class _PathStep:
+    sep: str  # "/" child, "//" descendant
+    test: str
+    preds: tuple[Fn, ...]
+    positional: bool
+
+
+class _Document:
+    """Stands in for the document node above the root element."""
+
+    __slots__ = ("root",)
+
+    def __init__(self, root: Any) -> None:
+        self.root = root
+
+
+def document_root(doc: Any) -> Any:
+    """Root element for an element or element tree (lxml or xml.etree)."""
+    if hasattr(doc, "getroot"):
+        return doc.getroot()
+    if hasattr(doc, "getroottree"):
+        return doc.getroottree().getroot()
+    return doc
+
+
+def _split_path(node: Expr) -> tuple[bool, list[_PathStep]]:
+    """(absolute, steps) for a chain of name-test steps and filters."""
+    steps: list[_PathStep] = []
+    preds: list[Expr] = []
+    while True:
+        if isinstance(node, Filter):
+            preds.append(node.pred)
+            node = node.base
+            continue
+        if not isinstance(node, Step):
+            raise UnsupportedExpression(f"path {node.text} is not a step chain")
+        if node.test != "*" and not _NAME.match(node.test):
+            raise UnsupportedExpression(f"node test {node.test!r}")
+        preds.reverse()
+        sep = "/" if node.sep == "" else node.sep
+        steps.append(
+            _PathStep(
+                sep,
+                node.test,
+                tuple(_filter_fn(p) for p in preds),
+                any(_uses_position(p) for p in preds),
+            )
+        )
+        preds = []
+        if node.base is None:
+            steps.reverse()
+            return node.sep != "", steps
+        if isinstance(node.base, Context):
+            steps.reverse()
+            return False, steps
+        node = node.base
+
+
+def _matches_test(el: Any, test: str) -> bool:
+    tag = el.tag
+    return isinstance(tag, str) and (test == "*" or tag == test)
+
+
+def _iter_test(el: Any, test: str, include_self: bool) -> Any:
+    for d in el.iter() if test == "*" else el.iter(test):
+        if d is el and not include_self:
+            continue
+        if isinstance(d.tag, str):
+            yield d
+
+
+def _children(node: Any, test: str) -> list[Any]:
+    if isinstance(node, _Document):
+        return [node.root] if _matches_test(node.root, test) else []
+    return [c for c in node if _matches_test(c, test)]
+
+
+def _apply_step(contexts: list[Any], step: _PathStep) -> list[Any]:
+    if not step.positional:
+        out: list[Any] = []
+        for c in contexts:
+            if step.sep == "/":
+                cands = _children(c, step.test)
+            elif isinstance(c, _Document):
+                cands = list(_iter_test(c.root, step.test, True))
+            else:
+                cands = list(_iter_test(c, step.test, False))
+            for p in step.preds:
+                cands = [el for el in cands if p(el, _NO_CTX)]
+            out.extend(cands)
+        return out
+
+    groups: list[list[Any]] = []
+    for c in contexts:
+        if step.sep == "/":
+            groups.append(_children(c, step.test))
+            continue
+        if isinstance(c, _Document):
+            groups.append(_children(c, step.test))
+            c = c.root
+        groups.append(_children(c, step.test))
+        groups.extend(_children(d, step.test) for d in _iter_test(c, "*", False))
+    out = []
+    for group in groups:
+        for p in step.preds:
+            size = len(group)
+            group = [
+                el for i, el in enumerate(group, 1) if p(el, _Ctx(i, size))
+            ]
+        out.extend(group)
+    return out
+
+
+def _document_order(nodes: list[Any], root: Any) -> list[Any]:
+    seen = set(nodes)
+    return [el for el in root.iter() if el in seen]
+
+
+def _top_filters(node: Expr) -> Expr:
+    """The predicates filtering node's last step, as one conjunction."""
+    preds: list[Expr] = []
+    while isinstance(node, Filter):
+        preds.append(node.pred)
+        node = node.base
+    return And(tuple(reversed(preds))) if len(preds) > 1 else preds[0]
+
+
+def _index_query(node: Expr, absolute: bool, steps: list[_PathStep]) -> Lookup | None:
+    first = steps[0]
+    if not absolute or len(steps) != 1 or first.sep != "//":
+        return None
+    if first.positional or not first.preds:
+        return None
+    return lookup(_top_filters(node))
+
+
+def index_lookup(path: "Path | Expr | str") -> Lookup | None:
+    """
+    Attribute-index query bounding the matches of an absolute //test[...]
+    path, or None if it has none (see xpath_builder.attrindex).
+    """
+    node = as_expr(getattr(path, "node", path))
+    return _index_query(node, *_split_path(node))
+
+
+_MAX_CHUNK = 512  # matches collected per document_cache() entry in iter()
+
+
+def _scoped(cache: DocumentCache, items: Iterator[Any]) -> Iterator[Any]:
+    """
+    items, advanced inside cache's scope but not while the consumer runs.
+    They are pulled in chunks of 1, 2, 4, ... _MAX_CHUNK, so the first match
+    is yielded as soon as it is found and entering the scope costs little
+    per match on long runs.
+    """
+    size = 1
+    while True:
+        with document_cache(cache):
+            chunk = list(islice(items, size))
+        yield from chunk
+        if len(chunk) < size:
+            return
+        size = min(size * 2, _MAX_CHUNK)
+
+
+class CompiledPath:
+    """
+    A path compiled to closures: fn(doc) -> list of matches in document
+    order; fn.iter(doc) yields the same matches lazily, fn.first(doc) and
+    fn.count(doc) read them without building the list (see compile_path).
+    """
+
+    __slots__ = ("absolute", "steps", "_fast", "_check", "_indexed")
+
+    def __init__(self, node: Expr) -> None:
+        self.absolute, self.steps = _split_path(node)
+        first = self.steps[0]
+        self._fast = len(self.steps) == 1 and not first.positional and first.sep == "//"
+        self._check = _all(list(first.preds)) if first.preds else None
+        self._indexed = _index_query(node, self.absolute, self.steps)
+
+    def __call__(self, doc: Any) -> list[Any]:
+        with document_cache():
+            return self._select(doc)
+
+    def iter(self, doc: Any) -> Iterator[Any]:
+        return _scoped(active_cache() or DocumentCache(), self._iter(doc))
+
+    def first(self, doc: Any) -> Any:
+        """The first match, or None; the walk stops there."""
+        with document_cache():
+            return next(self._iter(doc), None)
+
+    def head(self, doc: Any, limit: int) -> tuple[list[Any], bool] | None:
+        """
+        (matches among the first limit candidate elements, whether those
+        were all the candidates), or None unless the path is a single
+        //test[...] step, whose candidates are walked in document order.
+        """
+        if not self._fast:
+            return None
+        with document_cache():
+            window = list(islice(self._candidates(self._start(doc)), limit))
+            check = self._check
+            if check is not None:
+                hits = [el for el in window if check(el, _NO_CTX)]
+            else:
+                hits = window
+            return hits, len(window) < limit
+
+    def count(self, doc: Any) -> int:
+        """Number of matches."""
+        with document_cache():
+            start = self._start(doc)
+            if not self._fast:
+                return len(self._contexts(start, self.steps))
+            cands, check = self._candidates(start), self._check
+            if check is None:
+                return sum(1 for _ in cands)
+            return sum(1 for el in cands if check(el, _NO_CTX))
+
+    def _start(self, doc: Any) -> Any:
+        start = document_root(doc) if self.absolute else doc
+        return start.getroot() if hasattr(start, "getroot") else start
+
+    def _candidates(self, start: Any) -> Iterator[Any]:
+        """Elements the single // step can match, from the index if active."""
+        cache = active_cache()
+        index = None
+        if self._indexed is not None and cache is not None:
+            index = cache.attribute_index(start)
+        if index is None:
+            return _iter_test(start, self.steps[0].test, self.absolute)
+        test = self.steps[0].test
+        return (el for el in self._indexed(index) if test in ("*", el.tag))
+
+    def _select(self, doc: Any) -> list[Any]:
+        start = self._start(doc)
+        if self._fast:
+            # the tight loop: one iter() over the tree, predicate per element
+            cands, check = self._candidates(start), self._check
+            if check is None:
+                return list(cands)
+            return [el for el in cands if check(el, _NO_CTX)]
+        return self._contexts(start, self.steps)
+
+    def _contexts(self, start: Any, steps: list[_PathStep]) -> list[Any]:
+        contexts: list[Any] = [_Document(start) if self.absolute else start]
+        for i, step in enumerate(steps):
+            contexts = _apply_step(contexts, step)
+            if len(contexts) > 1 and (i or step.positional):
+                contexts = _document_order(contexts, start)
+        return contexts
+
+    def _iter(self, doc: Any) -> Iterator[Any]:
+        start = self._start(doc)
+        if self._fast:
+            check = self._check
+            for el in self._candidates(start):
+                if check is None or check(el, _NO_CTX):
+                    yield el
+            return
+        *head, last = self.steps
+        contexts = self._contexts(start, head)
+        if len(contexts) != 1 or last.positional:
+            yield from self._contexts(start, self.steps)
+            return
+        # one context left: walk the last step lazily
+        c = contexts[0]
+        if last.sep == "/":
+            cands: Iterable[Any] = _children(c, last.test)
+        elif isinstance(c, _Document):
+            cands = _iter_test(c.root, last.test, True)
+        else:
+            cands = _iter_test(c, last.test, False)
+        for el in cands:
+            if all(p(el, _NO_CTX) for p in last.preds):
+                yield el
+
+
+def compile_path(path: "Path | Expr | str") -> CompiledPath:
+    """
+    fn(doc) -> matching elements in document order, for paths made of name
+    tests (//a, a/b, .//a, *) and filters. doc is an element or element tree;
+    relative paths start at it, absolute ones at its document root.
+    fn.iter(doc) yields the matches one at a time, walking the tree only as
+    far as the consumer reads (the last step only, for multi-step paths).
+    """
+    return CompiledPath(as_expr(getattr(path, "node", path)))
@@ -0,0 +1,186 @@
+"""
+Semantics-preserving rewrites of expression trees.
+
+optimize(node) runs every pass below; engine.compile() applies it before
+choosing a backend, and Pred.optimize()/Path.optimize() expose it to callers
+who render the text themselves.
+
+- simplify: folds true()/false(), removes double negation, drops duplicate
+  and subsumed and/or operands (a or (a and b) -> a) and contradictions
+  (a and not(a) -> false()).
+- merge_regex: inside an `or`, token tests on the same attribute and
+  matches() calls on the same operand with the same flags are folded into a
+  single regex, so N alternatives cost one regex compile and one scan per
+  node instead of N.
+- plan: orders and/or operands cheapest first by the static cost model of
+  xpath_builder.planner.
+"""
+
+import re
+
+from xpath_builder.expr import (
+    FALSE,
+    TRUE,
+    And,
+    Arith,
+    Call,
+    Expr,
+    Filter,
+    Not,
+    Num,
+    Or,
+    Raw,
+    Seq,
+    Str,
+    TokenTest,
+    Var,
+    flatten,
+    rewrite,
+)
+from xpath_builder.planner import plan
+
+# \1..\9 refer to groups by number; wrapping alternatives in groups renumbers them
+_BACKREF = re.compile(r"\\[1-9]")
+# functions whose result may be a number; a number in a predicate is a position
+_NUMERIC_FUNCTIONS = frozenset(
+    {
+        "position", "last", "count", "number", "string-length", "sum", "floor",
+        "ceiling", "round", "abs", "avg", "min", "max", "data",
+    }
+)  # fmt: skip
+
+
+def optimize(root: Expr) -> Expr:
+    """Run all optimization passes over root."""
+    return plan(merge_regex(simplify(root)))
+
+
+def simplify(root: Expr) -> Expr:
+    """Boolean simplification and constant folding."""
+    return rewrite(root, _simplify)
+
+
+def _maybe_number(e: Expr) -> bool:
+    """
+    True unless e is known not to be numeric. Only such operands can replace
+    a boolean wrapper in place: [x and true()] -> [x] would turn a number
+    into a position test.
+    """
+    if isinstance(e, Call):
+        return e.name in _NUMERIC_FUNCTIONS
+    return isinstance(e, (Num, Arith, Raw, Var, Seq))
+
+
+def _as_boolean(e: Expr) -> Expr:
+    return Call("boolean", (e,)) if _maybe_number(e) else e
+
+
+def _simplify(e: Expr) -> Expr:
+    if isinstance(e, Raw):
+        text = e.value.replace(" ", "")
+        return TRUE if text == "true()" else FALSE if text == "false()" else e
+    if isinstance(e, (And, Or)):
+        return _simplify_junction(e)
+    if isinstance(e, Not):
+        x = e.operand
+        if x == TRUE or x == FALSE:
+            return FALSE if x == TRUE else TRUE
+        if isinstance(x, Not):
+            return _as_boolean(x.operand)
+        if isinstance(x, Call) and x.name == "boolean" and len(x.args) == 1:
+            return Not(x.args[0])
+        return e
+    if isinstance(e, Call) and e.name == "boolean" and len(e.args) == 1:
+        return _as_boolean(e.args[0])
+    if isinstance(e, Filter) and e.pred == TRUE:
+        return e.base
+    return e
+
+
+def _simplify_junction(e: And | Or) -> Expr:
+    is_and = isinstance(e, And)
+    unit, zero = (TRUE, FALSE) if is_and else (FALSE, TRUE)
+    inner = Or if is_and else And
+    original = flatten(e)
+    # dedup by rendered text, keeping first occurrences
+    operands = list(dict.fromkeys(op for op in original if op != unit))
+    if zero in operands:
+        return zero
+    present = set(operands)
+    if any(isinstance(op, Not) and op.operand in present for op in operands):
+        return zero  # a and not(a), a or not(a)
+    # absorption: a and (a or b) -> a, a or (a and b) -> a
+    operands = [
+        op
+        for op in operands
+        if not (isinstance(op, inner) and any(x in present for x in flatten(op)))
+    ]
+    if not operands:
+        return unit
+    if len(operands) == 1:
+        return _as_boolean(operands[0])
+    if len(operands) == len(original):
+        return e
+    return type(e)(tuple(operands))
+
+
+def merge_regex(root: Expr) -> Expr:
+    """Fold or-ed token tests / matches() calls on one operand into one regex."""
+    return rewrite(root, _merge_or)
+
+
+def _matches_key(e: Expr) -> tuple[str, str] | None:
+    if not (isinstance(e, Call) and e.name == "matches" and len(e.args) in (2, 3)):
+        return None
+    if not all(isinstance(a, Str) for a in e.args[1:]):
+        return None
+    if _BACKREF.search(e.args[1].value):  # type: ignore[attr-defined]
+        return None
+    flags = e.args[2].value if len(e.args) == 3 else ""  # type: ignore[attr-defined]
+    return e.args[0].text, flags
+
+
+def _merge_matches(calls: list[Call]) -> Call:
+    patterns = [c.args[1].value for c in calls]  # type: ignore[attr-defined]
+    merged = "|".join(f"({p})" for p in dict.fromkeys(patterns))
+    return Call("matches", (calls[0].args[0], Str(merged), *calls[0].args[2:]))
+
+
+def _merge_tokens(tests: list[TokenTest]) -> TokenTest:
+    tokens = dict.fromkeys(t for test in tests for t in test.tokens)
+    return TokenTest(tests[0].attr, tuple(tokens), tests[0].ci)
+
+
+def _merge_or(e: Expr) -> Expr:
+    if not isinstance(e, Or):
+        return e
+    operands = flatten(e)
+    keys: list[tuple | None] = []
+    groups: dict[tuple, list] = {}
+    for op in operands:
+        key: tuple | None = None
+        if isinstance(op, TokenTest):
+            key = ("token", op.attr, op.ci)
+        elif (mkey := _matches_key(op)) is not None:
+            key = ("matches", *mkey)
+        keys.append(key)
+        if key is not None:
+            groups.setdefault(key, []).append(op)
+    if all(len(g) == 1 for g in groups.values()):
+        return e
+
+    out: list[Expr] = []
+    for op, key in zip(operands, keys):
+        if key is None:
+            out.append(op)
+            continue
+        group = groups.pop(key, None)
+        if group is None:
+            continue  # already emitted at the group's first position
+        if len(group) == 1:
+            out.append(group[0])
+        elif key[0] == "token":
+            out.append(_merge_tokens(group))
+        else:
+            out.append(_merge_matches(group))
+    return out[0] if len(out) == 1 else Or(tuple(out))
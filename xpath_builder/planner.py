@@ -0,0 +1,200 @@
+"""
+Cost-based ordering of and/or operands.
+
+`and` and `or` short-circuit left to right, so a cheap, selective test placed
+first spares the expensive ones on most elements. plan(node) reorders the
+operands of every and/or by a static cost model:
+
+    existence < equality < contains < token test < regex < string-value
+    < quantifier < sub-path
+
+A Selectivity collected from sample documents refines the order: operands
+of an `and` are ranked by cost / (1 - pass rate), those of an `or` by
+cost / pass rate, which is the order minimizing expected work for
+independent tests. Raw XPath operands are opaque (they may guard one
+another), so nothing is moved across them.
+
+    stats = Selectivity.sample(path, sample_docs)
+    fast = path.plan(stats)
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Iterable, Mapping
+
+from xpath_builder.doccache import document_cache
+from xpath_builder.expr import (
+    And,
+    Arith,
+    Attr,
+    Call,
+    Compare,
+    Context,
+    Expr,
+    Filter,
+    Or,
+    Quantified,
+    Raw,
+    Step,
+    TokenTest,
+    Union,
+    as_expr,
+    flatten,
+    rewrite,
+    walk,
+)
+
+if TYPE_CHECKING:
+    from xpath_builder.core import Path, Pred
+
+DEFAULT_PASS_RATE = 0.5
+
+_NAME_TEST = re.compile(r"^[A-Za-z_][\w.-]*$")
+_WEIGHTS: dict[type, float] = {
+    Attr: 1,
+    Compare: 1,
+    Arith: 1,
+    TokenTest: 6,
+    Raw: 10,
+    Context: 20,  # string-value of the whole subtree
+    Quantified: 40,
+    Filter: 5,
+    Union: 5,
+    Step: 30,
+}
+_CALL_WEIGHTS: dict[str, float] = {
+    "position": 0.5,
+    "last": 0.5,
+    "contains": 3,
+    "starts-with": 3,
+    "ends-with": 3,
+    "matches": 12,
+    "replace": 12,
+    "tokenize": 12,
+}
+# without arguments these read the context node's string-value
+_TEXT_FUNCTIONS = frozenset({"string", "normalize-space", "string-length", "number"})
+
+
+def _weight(e: Expr) -> float:
+    if isinstance(e, Call):
+        if not e.args and e.name in _TEXT_FUNCTIONS:
+            return 20
+        return _CALL_WEIGHTS.get(e.name, 2)
+    return _WEIGHTS.get(type(e), 0)
+
+
+def cost(e: Expr) -> float:
+    """Static evaluation cost estimate of e for one element; memoized."""
+    cached = e.__dict__.get("_cost")
+    if cached is None:
+        cached = sum(_weight(n) for n in walk(e))
+        object.__setattr__(e, "_cost", cached)
+    return cached
+
+
+@dataclass(frozen=True)
+class Selectivity:
+    """
+    Observed pass rates of and/or operands, keyed by rendered text.
+    - rates: {operand text: fraction of sampled elements it was true for}
+    - elements: number of elements sampled
+    """
+
+    rates: Mapping[str, float] = field(default_factory=dict)
+    elements: int = 0
+
+    def rate(self, e: Expr) -> float:
+        return self.rates.get(e.text, DEFAULT_PASS_RATE)
+
+    @classmethod
+    def sample(
+        cls,
+        target: "Path | Pred | Expr | str",
+        documents: Iterable[Any],
+        *,
+        max_elements: int = 10_000,
+    ) -> "Selectivity":
+        """
+        Evaluate every and/or operand of target that compiles natively
+        against up to max_elements elements of documents. For a //test[...]
+        path only <test> elements are sampled.
+        """
+        from xpath_builder import native
+
+        node = as_expr(getattr(target, "node", target))
+        clauses: dict[str, Any] = {}
+        for e in walk(node):
+            if not isinstance(e, (And, Or)):
+                continue
+            for op in flatten(e):
+                if op.text in clauses:
+                    continue
+                try:
+                    clauses[op.text] = native.compile_pred(op)
+                except native.UnsupportedExpression:
+                    clauses[op.text] = None
+        checks = {text: fn for text, fn in clauses.items() if fn is not None}
+        test = _node_test(node)
+        passes = dict.fromkeys(checks, 0)
+        seen = 0
+        for doc in documents:
+            root = native.document_root(doc)
+            with document_cache():
+                for el in root.iter() if test == "*" else root.iter(test):
+                    if seen >= max_elements:
+                        break
+                    if not isinstance(el.tag, str):
+                        continue
+                    seen += 1
+                    for text, fn in checks.items():
+                        passes[text] += fn(el)
+            if seen >= max_elements:
+                break
+        if not seen:
+            return cls({}, 0)
+        return cls({text: n / seen for text, n in passes.items()}, seen)
+
+
+def _node_test(node: Expr) -> str:
+    while isinstance(node, Filter):
+        node = node.base
+    if isinstance(node, Step) and _NAME_TEST.match(node.test):
+        return node.test
+    return "*"
+
+
+def plan(root: Expr, stats: Selectivity | None = None) -> Expr:
+    """Reorder and/or operands of root, cheapest expected work first."""
+    return rewrite(root, lambda e: _reorder(e, stats))
+
+
+def _rank(e: Expr, conjunction: bool, stats: Selectivity | None) -> float:
+    c = cost(e)
+    if stats is None:
+        return c
+    p = stats.rate(e)
+    # and: stop as soon as one fails; or: stop as soon as one passes
+    decisive = 1 - p if conjunction else p
+    return c / decisive if decisive > 0 else float("inf")
+
+
+def _reorder(e: Expr, stats: Selectivity | None) -> Expr:
+    if not isinstance(e, (And, Or)):
+        return e
+    conjunction = isinstance(e, And)
+    operands = flatten(e)
+    out: list[Expr] = []
+    segment: list[Expr] = []
+    for op in (*operands, None):
+        if op is None or isinstance(op, Raw):
+            segment.sort(key=lambda x: _rank(x, conjunction, stats))
+            out.extend(segment)
+            segment = []
+            if op is not None:
+                out.append(op)
+        else:
+            segment.append(op)
+    if all(a is b for a, b in zip(out, operands)):
+        return e
+    return type(e)(tuple(out))
@@ -0,0 +1,319 @@
+"""
+Evaluate many named selectors in one pass over a document.
+
+Selectors of the form //test[pred]... (the usual E(tag).any().where(...) and
+STAR.any().where(...)) are answered by a single walk of the tree: each
+element is checked once against every selector whose node test it passes.
+The check is a native Python closure (see xpath_builder.native) when the
+predicate compiles to one, which works on lxml and xml.etree trees alike,
+and a libxml2 XPath call otherwise (lxml trees only). Selectors are grouped
+by node test into a dispatch table, so an <svg> is only checked against svg
+selectors and '*' selectors. Anything else (positional predicates,
+multi-step paths, unions, predicates with no native or XPath 1.0 form on the
+tree at hand) falls back to its own precompiled evaluator.
+
+With indexed=True, selectors whose predicate has an attribute token, value
+or prefix test (@class tokens, @id = ..., starts-with(@id, ...)) leave the
+scan: their candidates come from a per-document attribute index (see
+xpath_builder.attrindex) built once and shared by all of them.
+"""
+
+import re
+import threading
+from dataclasses import dataclass
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    Iterable,
+    Mapping,
+)
+
+from xpath_builder import engine
+from xpath_builder.adaptive import (
+    DEFAULT_REPLAN_EVERY,
+    AdaptivePredicate,
+    ClauseStats,
+    compile_adaptive,
+    compile_clause,
+)
+from xpath_builder.attrindex import AttributeIndex, Lookup, lookup
+from xpath_builder.core import Path
+from xpath_builder.doccache import document_cache
+from xpath_builder.expr import And, Call, Expr, Filter, Num, Raw, Step, walk
+from xpath_builder.native import UnsupportedExpression, document_root
+
+if TYPE_CHECKING:
+    from xpath_builder.batch import Parser
+
+_NAME_TEST = re.compile(r"^(?:\*|[A-Za-z_][\w.-]*)$")
+_RAW_POSITIONAL = re.compile(r"^\s*[\d.]+\s*$|\b(?:position|last)\s*\(")
+
+
+@dataclass(frozen=True)
+class _Scanned:
+    name: str
+    test: str  # element name or '*'
+    check: Callable[[Any], bool] | None  # None: no predicate
+    lxml_only: bool  # check runs in libxml2
+    lookup: Lookup | None = None  # attribute-index query bounding the matches
+
+
+@dataclass(frozen=True)
+class DispatchStats:
+    """
+    Counters accumulated over evaluate() calls on the tag-dispatched scan.
+    - elements: elements visited
+    - checks: selector checks actually run
+    - skipped: checks avoided by the dispatch table (vs. testing every
+      scanned selector against every element)
+    """
+
+    elements: int
+    checks: int
+    skipped: int
+
+
+def _is_positional(pred: Expr) -> bool:
+    if isinstance(pred, Num):
+        return True
+    for e in walk(pred):
+        if isinstance(e, Call) and e.name in ("position", "last"):
+            return True
+        if isinstance(e, Raw) and _RAW_POSITIONAL.search(e.value):
+            return True
+    return False
+
+
+def scan_shape(node: Expr) -> tuple[str, tuple[Expr, ...]] | None:
+    """
+    (node test, predicates) if node is //test[p1][p2]... with element-local,
+    non-positional predicates; None otherwise.
+    """
+    preds: list[Expr] = []
+    while isinstance(node, Filter):
+        if _is_positional(node.pred):
+            return None
+        preds.append(node.pred)
+        node = node.base
+    if not (isinstance(node, Step) and node.base is None and node.sep == "//"):
+        return None
+    if not _NAME_TEST.match(node.test):
+        return None
+    return node.test, tuple(reversed(preds))
+
+
+class SelectorSet:
+    """
+    A named group of Paths evaluated together:
+
+        sel = SelectorSet({"ads": ad_class_selector, "svg": empty_svg_selector})
+        sel.evaluate(doc)  # {"ads": [...], "svg": [...]}
+    """
+
+    def __init__(
+        self,
+        paths: Mapping[str, Path] | Iterable[tuple[str, Path]],
+        *,
+        adaptive: bool = False,
+        replan_every: int = DEFAULT_REPLAN_EVERY,
+        indexed: bool = False,
+    ) -> None:
+        """
+        adaptive=True instruments the scan checks: each and/or clause is
+        counted and sampled for time, and the clause order is re-planned
+        every replan_every checks (see xpath_builder.adaptive, freeze()),
+        on the first thread to evaluate; other threads should use copy().
+        indexed=True answers attribute-indexable selectors from a
+        per-document attribute index instead of the scan.
+        """
+        self.adaptive = adaptive
+        self.replan_every = replan_every
+        self.indexed = indexed
+        self.paths: dict[str, Path] = dict(paths)
+        self._evaluators = {name: engine.compile(p) for name, p in self.paths.items()}
+        self._scanned: list[_Scanned] = []
+        for name, path in self.paths.items():
+            shape = scan_shape(path.node)
+            if shape is None:
+                continue
+            test, preds = shape
+            if not preds:
+                self._scanned.append(_Scanned(name, test, None, False))
+                continue
+            pred = preds[0] if len(preds) == 1 else And(preds)
+            compiled = self._compile_check(pred, adaptive, replan_every)
+            if compiled is not None:
+                query = lookup(pred) if indexed else None
+                self._scanned.append(_Scanned(name, test, *compiled, query))
+        portable = [s for s in self._scanned if not s.lxml_only]
+        self._lxml = _Plan(self.paths, self._scanned)
+        self._portable = _Plan(self.paths, portable)
+
+        self._stats_lock = threading.Lock()
+        self._elements = 0
+        self._checks = 0
+        self._naive = 0
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def copy(self) -> "SelectorSet":
+        """
+        Independent SelectorSet over the same paths and options, with its own
+        evaluators (from the calling thread's cache) and fresh statistics.
+        """
+        return SelectorSet(
+            self.paths,
+            adaptive=self.adaptive,
+            replan_every=self.replan_every,
+            indexed=self.indexed,
+        )
+
+    @staticmethod
+    def _compile_check(
+        pred: Expr, adaptive: bool, replan_every: int
+    ) -> tuple[Callable[[Any], bool], bool] | None:
+        if adaptive:
+            try:
+                check = compile_adaptive(pred, replan_every=replan_every)
+                return check, check.lxml_only
+            except UnsupportedExpression:
+                pass
+        # None: per-element elementpath calls would be quadratic
+        return compile_clause(pred)
+
+    def _adaptive(self) -> dict[str, AdaptivePredicate]:
+        return {
+            s.name: s.check
+            for s in self._scanned
+            if isinstance(s.check, AdaptivePredicate)
+        }
+
+    def freeze(self, frozen: bool = True) -> None:
+        """Pin (or release) the clause order of every adaptive check."""
+        for check in self._adaptive().values():
+            check.freeze(frozen)
+
+    def clause_stats(self) -> dict[str, list[ClauseStats]]:
+        """{selector name: per-clause counters} for adaptive checks."""
+        return {name: check.stats() for name, check in self._adaptive().items()}
+
+    def plans(self) -> dict[str, str]:
+        """{selector name: current clause order} for adaptive checks."""
+        return {name: check.plan.text for name, check in self._adaptive().items()}
+
+    @property
+    def dispatch_table(self) -> dict[str, list[str]]:
+        """{node test: [selector names]} for the single-pass scan of lxml trees."""
+        return self._lxml.table()
+
+    def stats(self) -> DispatchStats:
+        with self._stats_lock:
+            return DispatchStats(
+                self._elements, self._checks, self._naive - self._checks
+            )
+
+    def reset_stats(self) -> None:
+        with self._stats_lock:
+            self._elements = 0
+            self._checks = 0
+            self._naive = 0
+
+    def evaluate(self, doc: Any) -> dict[str, list[Any]]:
+        """
+        Match every selector against doc: {name: [elements in document order]}.
+        Native checks share one document cache (xpath_builder.doccache), so
+        string-values and token lists are computed once per element.
+        """
+        out: dict[str, list[Any]] = {name: [] for name in self.paths}
+        root = document_root(doc)
+        plan = self._lxml if engine.is_lxml_node(root) else self._portable
+        with document_cache(indexed=self.indexed) as cache:
+            if plan.indexed:
+                index = cache.attribute_index(root)
+                assert index is not None
+                self._lookup(plan, index, out)
+            if plan.size:
+                self._scan(plan, root, out)
+            for name in plan.fallback:
+                out[name] = list(self._evaluators[name](doc))
+        return out
+
+    def astream(
+        self,
+        documents: Iterable[Any] | AsyncIterable[Any],
+        *,
+        parser: "Parser" = "xml",
+    ) -> AsyncIterator[dict[str, list[Any]]]:
+        """
+        evaluate() for each document, on worker threads, for asyncio code:
+        yields one result per document in input order, pulling documents
+        only as fast as they are matched (see xpath_builder.aio).
+        """
+        from xpath_builder import aio
+
+        return aio.stream(self, documents, parser=parser)
+
+    def _lookup(
+        self, plan: "_Plan", index: AttributeIndex, out: dict[str, list[Any]]
+    ) -> None:
+        checks = 0
+        for s in plan.indexed:
+            assert s.lookup is not None and s.check is not None
+            test, check = s.test, s.check
+            hits = out[s.name]
+            for el in s.lookup(index):
+                if test == "*" or el.tag == test:
+                    checks += 1
+                    if check(el):
+                        hits.append(el)
+        with self._stats_lock:
+            self._checks += checks
+            self._naive += len(index) * len(plan.indexed)
+
+    def _scan(self, plan: "_Plan", root: Any, out: dict[str, list[Any]]) -> None:
+        by_tag, star = plan.by_tag, plan.star
+        elements = checks = 0
+        for el in root.iter():
+            tag = el.tag
+            if not isinstance(tag, str):
+                continue  # comments, processing instructions
+            elements += 1
+            for group in (by_tag.get(tag, ()), star):
+                for s in group:
+                    checks += 1
+                    if s.check is None or s.check(el):
+                        out[s.name].append(el)
+        with self._stats_lock:
+            self._elements += elements
+            self._checks += checks
+            self._naive += elements * plan.size
+
+
+class _Plan:
+    """
+    Dispatch table over the scanned selectors usable on one kind of tree, and
+    the selectors answered from the attribute index instead.
+    """
+
+    def __init__(self, paths: Mapping[str, Path], scanned: list[_Scanned]) -> None:
+        names = {s.name for s in scanned}
+        self.fallback = [n for n in paths if n not in names]
+        self.indexed = tuple(s for s in scanned if s.lookup is not None)
+        scanned = [s for s in scanned if s.lookup is None]
+        by_tag: dict[str, list[_Scanned]] = {}
+        for s in scanned:
+            if s.test != "*":
+                by_tag.setdefault(s.test, []).append(s)
+        self.by_tag = {tag: tuple(group) for tag, group in by_tag.items()}
+        self.star = tuple(s for s in scanned if s.test == "*")
+        self.size = len(scanned)
+
+    def table(self) -> dict[str, list[str]]:
+        table = {tag: [s.name for s in group] for tag, group in self.by_tag.items()}
+        if self.star:
+            table["*"] = [s.name for s in self.star]
+        return table
@@ -0,0 +1,187 @@
+"""
+Streaming evaluation over iterparse, for documents too large to load.
+
+    for item in iter_matches(E("item").any().where(pred), "export.xml"):
+        handle(item)
+
+Streamable paths are absolute chains of child (/) and descendant (//)
+name-test steps, like //item, /feed/entry or //a//b[@x]. Predicates are
+compiled natively (see xpath_builder.native) and must not be positional.
+Predicates on the last step may read the element's text, since matches are
+only yielded at its end event, once its subtree is complete. Predicates on
+earlier steps run at the start event, so they may only look at attributes.
+Anything else raises NotStreamable.
+
+Processed elements are cleared and detached as soon as nothing still open
+can match, so memory stays bounded by the largest matched subtree, not the
+document. A yielded element is cleared once the generator resumes, so copy
+what you need before advancing.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Iterator, Literal
+
+from xpath_builder import native
+from xpath_builder.doccache import no_cache
+from xpath_builder.expr import Call, Context, Expr, Filter, Step, as_expr, walk
+from xpath_builder.utils import lxml_etree
+
+if TYPE_CHECKING:
+    from xpath_builder.core import Path
+
+StreamBackend = Literal["auto", "lxml", "etree"]
+
+_NAME_TEST = re.compile(r"^(?:\*|[A-Za-z_][\w.-]*)$")
+# zero-argument forms that read the context node's string-value
+_TEXT_FUNCTIONS = frozenset({"string", "normalize-space", "string-length", "number"})
+
+
+class NotStreamable(ValueError):
+    """Raised when a path is outside the streamable subset."""
+
+
+@dataclass(frozen=True)
+class _StreamStep:
+    sep: str  # "/" or "//"
+    test: str  # element name or '*'
+    check: Callable[[Any], bool] | None
+    reads_text: bool
+
+
+def _reads_text(pred: Expr) -> bool:
+    return any(
+        isinstance(e, Context)
+        or (isinstance(e, Call) and not e.args and e.name in _TEXT_FUNCTIONS)
+        for e in walk(pred)
+    )
+
+
+def _compile_check(preds: list[Expr]) -> Callable[[Any], bool] | None:
+    checks: list[Callable[[Any], bool]] = []
+    for pred in preds:
+        try:
+            checks.append(native.compile_pred(pred))
+        except native.UnsupportedExpression as exc:
+            raise NotStreamable(f"predicate [{pred.text}]: {exc}") from None
+    if not checks:
+        return None
+
+    def check(el: Any) -> bool:
+        # streamed elements are cleared after use: never memoize them
+        with no_cache():
+            return all(c(el) for c in checks)
+
+    return check
+
+
+def stream_steps(node: Expr) -> list[_StreamStep]:
+    """Steps of a streamable path, outermost first; raises NotStreamable."""
+    steps: list[_StreamStep] = []
+    preds: list[Expr] = []
+    while True:
+        if isinstance(node, Filter):
+            preds.append(node.pred)
+            node = node.base
+            continue
+        if not isinstance(node, Step) or node.sep not in ("/", "//"):
+            raise NotStreamable(f"{node.text} is not an absolute step chain")
+        if not _NAME_TEST.match(node.test):
+            raise NotStreamable(f"node test {node.test!r} cannot be streamed")
+        preds.reverse()
+        steps.append(
+            _StreamStep(
+                node.sep,
+                node.test,
+                _compile_check(preds),
+                any(_reads_text(p) for p in preds),
+            )
+        )
+        preds = []
+        if node.base is None:
+            break
+        node = node.base
+    steps.reverse()
+    for step in steps[:-1]:
+        if step.reads_text:
+            raise NotStreamable(
+                f"predicate on inner step {step.test!r} reads text, "
+                "which is not known at its start event"
+            )
+    return steps
+
+
+def is_streamable(path: "Path | Expr | str") -> bool:
+    try:
+        stream_steps(as_expr(getattr(path, "node", path)))
+    except NotStreamable:
+        return False
+    return True
+
+
+def _iterparse(source: Any, backend: StreamBackend) -> Iterator[tuple[str, Any]]:
+    etree = lxml_etree() if backend in ("auto", "lxml") else None
+    if etree is None:
+        if backend == "lxml":
+            raise ImportError("lxml is not installed (pip install lxml)")
+        import xml.etree.ElementTree as etree
+    return etree.iterparse(source, events=("start", "end"))
+
+
+def iter_matches(
+    path: "Path | Expr | str",
+    source: Any,
+    *,
+    backend: StreamBackend = "auto",
+    clear: bool = True,
+) -> Iterator[Any]:
+    """
+    Yield the elements of source (a file name or binary file object) that
+    match path, in document order of their end tags. clear=False keeps the
+    whole tree, for debugging.
+    """
+    steps = stream_steps(as_expr(getattr(path, "node", path)))
+    last = len(steps) - 1
+    final = steps[last]
+    none: frozenset[int] = frozenset()
+    # per open element: (steps it matched, steps an ancestor matched,
+    # is a candidate for the last step, the element)
+    stack: list[tuple[frozenset[int], frozenset[int], bool, Any]] = [
+        (frozenset({-1}), none, False, None)
+    ]
+    pending = 0  # open candidates; their subtrees must be kept
+
+    for event, el in _iterparse(source, backend):
+        if event == "start":
+            matched_p, above_p, _, _ = stack[-1]
+            above = above_p | matched_p if matched_p else above_p
+            matched: set[int] = set()
+            candidate = False
+            tag = el.tag
+            for i, step in enumerate(steps):
+                prev = i - 1
+                if not (prev in matched_p if step.sep == "/" else prev in above):
+                    continue
+                if step.test != "*" and step.test != tag:
+                    continue
+                if i == last:
+                    candidate = (
+                        step.check is None or step.reads_text or step.check(el)
+                    )
+                elif step.check is None or step.check(el):
+                    matched.add(i)
+            state = frozenset(matched) if matched else none
+            stack.append((state, above, candidate, el))
+            pending += candidate
+            continue
+
+        _, _, candidate, _ = stack.pop()
+        if candidate:
+            pending -= 1
+            if not final.reads_text or final.check(el):  # type: ignore[misc]
+                yield el
+        if clear and not pending:
+            el.clear()
+            parent = stack[-1][3]
+            if parent is not None:
+                parent.remove(el)
@@ -1,42 +1,95 @@
 from __future__ import annotations
 
-_elementpath_available = False
-_lxml_available = False
+import threading
+from functools import cache, lru_cache
+from types import ModuleType
+from typing import Any, Iterable
 
-try:
-    # pip install elementpath
-    import elementpath  # type: ignore[import]
 
-    _elementpath_available = True
-except Exception:
-    pass
+@cache
+def elementpath_module() -> ModuleType | None:
+    """Import elementpath on first use; None if it is not installed."""
+    try:
+        # pip install elementpath
+        import elementpath  # type: ignore[import]
 
-try:
-    # pip install lxml
-    from lxml.etree import XPath as _XPath  # type: ignore[import]
+        return elementpath
+    except Exception:
+        return None
 
-    _lxml_available = True
-except Exception:
-    pass
 
+@cache
+def lxml_etree() -> ModuleType | None:
+    """Import lxml.etree on first use; None if it is not installed."""
+    try:
+        # pip install lxml
+        from lxml import etree  # type: ignore[import]
 
-def validate_xpath(expr: str) -> None:
-    if _elementpath_available:
+        return etree
+    except Exception:
+        return None
+
+
+_VALIDATION_CACHE_SIZE = 65536
+
+_local = threading.local()
+
+
+def _parser(elementpath: ModuleType) -> Any:
+    """One elementpath parser per thread; parse() resets its state each call."""
+    parser = getattr(_local, "parser", None)
+    if parser is None:
+        parser = elementpath.XPath2Parser()
+        _local.parser = parser
+    return parser
+
+
+@lru_cache(maxsize=_VALIDATION_CACHE_SIZE)
+def _check_xpath(expr: str) -> str | None:
+    """Error message for expr, or None if it is valid. Failures are cached too."""
+    elementpath = elementpath_module()
+    if elementpath is not None:
         try:
-            parser = elementpath.XPath2Parser()  # type: ignore[call-arg]
-            parser.parse(expr)  # type: ignore
-            return
+            _parser(elementpath).parse(expr)
+            return None
         except Exception as e:
-            raise SyntaxError(f"XPath (elementpath) syntax error: {e}") from e
+            return f"XPath (elementpath) syntax error: {e}"
 
-    if _lxml_available:
+    etree = lxml_etree()
+    if etree is not None:
         try:
-            _XPath(expr)  # type: ignore[call-arg]
-            return
+            etree.XPath(expr)
+            return None
         except Exception as e:
             # Note: lxml is 1.0-only, so 2.0 featurs may fail here spuriously.
             # We still surface the error to catch obvious typos.
-            raise SyntaxError(f"XPath (lxml) syntax error: {e}") from e
+            return f"XPath (lxml) syntax error: {e}"
+
+    return None
+
+
+def validate_xpath(expr: str) -> None:
+    error = _check_xpath(expr)
+    if error is not None:
+        raise SyntaxError(error)
+
+
+def validate_many(exprs: Iterable[str]) -> dict[str, SyntaxError | None]:
+    """
+    Validate a batch of expressions, reusing the cached parser and results.
+    Returns {expr: error or None} in input order; duplicates are checked once.
+    """
+    out: dict[str, SyntaxError | None] = {}
+    for expr in exprs:
+        if expr in out:
+            continue
+        error = _check_xpath(expr)
+        out[expr] = None if error is None else SyntaxError(error)
+    return out
+
+
+def clear_validation_cache() -> None:
+    _check_xpath.cache_clear()
 
 
 def quote(s: str) -> str:
@@ -60,3 +113,30 @@ def re_escape_xsd(lit: str) -> str:
         else:
             out.append(ch)
     return "".join(out)
+
+
+def regex_trie(literals: Iterable[str]) -> str:
+    """
+    XML Schema regex matching exactly the given literals, with shared
+    prefixes factored out: ("ad", "ads", "advert") -> "ad(s|vert)?".
+    Uses plain groups only, since XSD regex has no (?:...).
+    """
+    trie: dict[str, dict] = {}
+    for lit in literals:
+        node = trie
+        for ch in lit:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def emit(node: dict[str, dict]) -> str:
+        optional = "" in node
+        alts = [re_escape_xsd(ch) + emit(child) for ch, child in node.items() if ch]
+        if not alts:
+            return ""
+        if len(alts) == 1 and not optional:
+            return alts[0]
+        if len(alts) == 1 and len(alts[0]) == 1:
+            return alts[0] + "?"
+        return "(" + "|".join(alts) + ")" + ("?" if optional else "")
+
+    return emit(trie)